@@ -1,10 +1,15 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
     QLineEdit, QSpinBox, QDoubleSpinBox, QTextEdit, QMessageBox,
-    QScrollArea, QFrame, QGridLayout, QDialog
+    QFrame, QGridLayout, QDialog
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QThread
-from network_worker import NetworkWorker, API_URL  # <-- Corregido: import desde network_worker (evita circular)
+from PyQt6.QtCore import Qt, pyqtSignal
+from network_worker import API_URL  # <-- Corregido: import desde network_worker (evita circular)
+from request_executor import submit
+from qt_models import ProductListModel, ProductCardDelegate, ProductGridView
+
+# Productos por página en la grilla del panel
+PRODUCTS_PAGE_SIZE = 60
 
 class VentanaAdminProductos(QWidget):
     """Panel de administración de productos."""
@@ -13,8 +18,6 @@ class VentanaAdminProductos(QWidget):
     def __init__(self):
         super().__init__()
         self.api_token = None
-        self.thread = None
-        self.worker = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -65,47 +68,22 @@ class VentanaAdminProductos(QWidget):
         
         main_layout.addWidget(form_frame)
         
-        # Lista de Productos
-        self.products_area = QScrollArea()
-        self.products_area.setWidgetResizable(True)
-        self.products_widget = QWidget()
-        self.products_layout = QVBoxLayout(self.products_widget)
-        self.products_area.setWidget(self.products_widget)
-        main_layout.addWidget(self.products_area)
+        # Lista de Productos (grilla modelo/vista: solo se pintan las tarjetas visibles)
+        self.products_model = ProductListModel(page_size=PRODUCTS_PAGE_SIZE, parent=self)
+        self.products_model.load_failed.connect(self.on_fetch_failure)
+        self.products_delegate = ProductCardDelegate(mode="admin", parent=self)
+        self.products_delegate.action_triggered.connect(self.on_product_action)
+        self.products_view = ProductGridView(self.products_model, self.products_delegate)
+        main_layout.addWidget(self.products_view)
         
     def set_token(self, token: str):
         self.api_token = token
         self.fetch_products()
         
     def fetch_products(self):
-        """Obtiene la lista de productos (usa la ruta pública protegida /api/products)."""
-        # Limpieza de la lista visual
-        while self.products_layout.count():
-            child = self.products_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        # Configura el hilo y el worker
-        self.thread = QThread()
-        # Usar la ruta correcta: GET /api/products (protegida) — no /api/admin/products
-        self.worker = NetworkWorker(
-            f"{API_URL}/api/products",
-            "GET_AUTH",
-            token=self.api_token
-        )
-        self.worker.moveToThread(self.thread)
-
-        # Conecta señales
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_fetch_success)
-        self.worker.failure.connect(self.on_fetch_failure)
-
-        # Limpieza
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
+        """Recarga la grilla desde /api/products/page (con un 304 se conserva tal cual)."""
+        self.products_model.set_token(self.api_token)
+        self.products_model.reload()
         
     def handle_add_product(self):
         """Envía un nuevo producto a la API."""
@@ -117,59 +95,21 @@ class VentanaAdminProductos(QWidget):
             "imagen_url": self.imagen_input.text()
         }
         
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/admin/products",
             "POST_AUTH",
             data=producto,
             token=self.api_token
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_add_success)
-        self.worker.failure.connect(self.on_add_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.thread.start()
-
-    def create_product_widget(self, product: dict) -> QFrame:
-        """Crea un widget para mostrar un producto con botones de editar/eliminar."""
-        frame = QFrame()
-        frame.setFrameStyle(QFrame.Shape.Box)
-        layout = QVBoxLayout(frame)
-        
-        info = QLabel(
-            f"<b>{product['nombre']}</b><br>"
-            f"Precio: ${product['precio']:.2f}<br>"
-            f"Stock: {product['stock']}<br>"
-            f"Descripción: {product['descripcion']}"
-        )
-        layout.addWidget(info)
-        
-        buttons = QHBoxLayout()
-        edit_btn = QPushButton("Editar")
-        delete_btn = QPushButton("Eliminar")
-        buttons.addWidget(edit_btn)
-        buttons.addWidget(delete_btn)
-        layout.addLayout(buttons)
-        
-        # Conectar botones
-        edit_btn.clicked.connect(lambda: self.edit_product(product))
-        delete_btn.clicked.connect(lambda: self.delete_product(product['id']))
-        
-        return frame
+        request.success.connect(self.on_add_success)
+        request.failure.connect(self.on_add_failure)
 
-    def on_fetch_success(self, products_list: list):
-        """Procesa la lista de productos recibida."""
-        # Limpia la lista actual
-        while self.products_layout.count():
-            child = self.products_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-                
-        # Crea widgets para cada producto
-        for product in products_list:
-            product_widget = self.create_product_widget(product)
-            self.products_layout.addWidget(product_widget)
+    def on_product_action(self, action: str, product: dict, _cantidad: int):
+        """Clic en 'Editar' o 'Eliminar' de una tarjeta de la grilla."""
+        if action == "edit":
+            self.edit_product(product)
+        elif action == "delete":
+            self.delete_product(product['id'])
 
     def on_fetch_failure(self, error_message: str):
         QMessageBox.critical(self, "Error", f"Error al cargar productos: {error_message}")
@@ -200,18 +140,13 @@ class VentanaAdminProductos(QWidget):
         ) != QMessageBox.StandardButton.Yes:
             return
 
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/admin/products/{product_id}",
             "DELETE_AUTH",
             token=self.api_token
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(lambda _: self.on_delete_success(product_id))
-        self.worker.failure.connect(self.on_delete_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.thread.start()
+        request.success.connect(lambda _: self.on_delete_success(product_id))
+        request.failure.connect(self.on_delete_failure)
 
     def on_delete_success(self, product_id: int):
         QMessageBox.information(self, "Éxito", "Producto eliminado correctamente")
@@ -229,19 +164,14 @@ class VentanaAdminProductos(QWidget):
 
     def update_product(self, product_id: int, data: dict):
         """Envía actualización de producto a la API."""
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/admin/products/{product_id}",
             "PUT_AUTH",
             data=data,
             token=self.api_token
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_update_success)
-        self.worker.failure.connect(self.on_update_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.thread.start()
+        request.success.connect(self.on_update_success)
+        request.failure.connect(self.on_update_failure)
 
     def on_update_success(self, updated_product: dict):
         QMessageBox.information(self, "Éxito", "Producto actualizado correctamente")
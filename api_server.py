@@ -1,21 +1,47 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr, field_validator
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel, EmailStr, TypeAdapter, field_validator
 from sqlalchemy.orm import Session # Para interactuar con la DB
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from datetime import timedelta
+import asyncio
+import logging
+import migrations
 import models
+import os
 import security   
-from database import SessionLocal, engine # Importa la config de DB
-from typing import List
+from database import SessionLocal, engine, pool_status, date_bucket # Importa la config de DB
+from typing import List, Literal
 from security import oauth2_scheme, verify_token_payload
-from sqlalchemy.orm import joinedload # ¡NUEVO! Para optimizar la consulta
-from datetime import datetime
+from sqlalchemy.orm import selectinload # ¡NUEVO! Para optimizar la consulta
+from sqlalchemy import DateTime, and_, bindparam, case, delete, func, insert, or_, select, text, update
+from datetime import date, datetime
+import reservations
+from reservations import adjust_reservations, hold_until, renew_holds, reserve_for_add
+from rollups import record_sale
+from cache import catalog_cache, make_etag, user_cache
+from search_index import product_index
+from metrics import MetricsMiddleware, instrument_engine, render_prometheus
+from dataclasses import dataclass
+import secrets
+import time
+
+# Logs propios de la API (loggers "tienda.*"); los de uvicorn van por su lado
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+logging.getLogger("tienda").addHandler(_log_handler)
+logging.getLogger("tienda").setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger("tienda.api")
 
 # --- 1. Creación de las Tablas ---
-# Esta línea le dice a SQLAlchemy que cree todas las tablas
-# definidas en models.py (en este caso, la tabla 'users')
-# si es que no existen ya.
-models.Base.metadata.create_all(bind=engine)
+# El esquema lo crean y actualizan las migraciones de migrations.py. Por
+# defecto se aplican al arrancar (lifespan); con AUTO_MIGRATE=0 hay que
+# correr 'python -m migrations' al desplegar.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1").strip().lower() in ("1", "true", "yes", "on")
 
 
 # --- 2. Modelos Pydantic (Validación de entrada) ---
@@ -79,12 +105,38 @@ class ProductSchema(BaseModel):
     precio: float
     stock: int
     imagen_url: str | None = None
+    # Unidades apartadas en carritos y lo que queda para vender (stock - reservado).
+    # Solo invalidan la caché del catálogo los cambios de stock/precio (CRUD
+    # del admin y checkout). Las reservas no: 'disponible' puede tardar hasta
+    # CATALOG_CACHE_TTL en reflejarlas, y es solo informativo (add_to_cart y
+    # el checkout reservan/descuentan con UPDATEs condicionales igual).
+    reservado: int = 0
+    disponible: int | None = None
     
     # Esto le dice a Pydantic que puede leer
     # el modelo desde un objeto SQLAlchemy (modo ORM)
     class Config:
         from_attributes = True
 
+class ProductPageSchema(BaseModel):
+    """
+    Página de productos (paginación por cursor sobre 'id').
+    'next_cursor' es el valor a mandar en 'after' para pedir la
+    siguiente página; es None cuando ya no hay más productos.
+    """
+    items: List[ProductSchema] = []
+    next_cursor: int | None = None
+    limit: int
+
+class ProductSearchSchema(BaseModel):
+    """Resultado de /api/products/search: los productos más relevantes primero."""
+    items: List[ProductSchema] = []
+    q: str
+    limit: int
+
+# Serializador reutilizable para la lista completa del catálogo
+products_adapter = TypeAdapter(List[ProductSchema])
+
 # ... (clase UserRegister) ...
 
 # ... (clase ProductSchema) ...
@@ -113,6 +165,41 @@ class VentaSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class SalesPageSchema(BaseModel):
+    """
+    Página de ventas (paginación por cursor sobre (fecha, id), por defecto más nuevas primero).
+    'next_cursor' se manda tal cual en 'cursor' para pedir la siguiente página.
+    """
+    items: List[VentaSchema] = []
+    next_cursor: str | None = None
+    limit: int
+
+class SalesTotalsSchema(BaseModel):
+    """Totales agregados de un conjunto de ventas."""
+    ventas: int = 0
+    ingresos: float = 0.0
+    unidades: int = 0
+
+class SalesBucketSchema(SalesTotalsSchema):
+    """Totales de un periodo (día, semana o mes)."""
+    periodo: str
+
+class SalesDaySchema(SalesTotalsSchema):
+    """Totales de un día (de toda la tienda o de un producto)."""
+    fecha: date
+
+class TopProductSchema(BaseModel):
+    product_id: int
+    nombre: str | None = None
+    unidades: int
+    ingresos: float
+
+class SalesSummarySchema(BaseModel):
+    """Resumen de ventas leído de los resúmenes diarios (para el panel de administración)."""
+    totales: SalesTotalsSchema
+    buckets: List[SalesBucketSchema] = []
+    top_productos: List[TopProductSchema] = []
+
 class ProfileSchema(BaseModel):
     """Schema Pydantic para DEVOLVER el perfil del usuario."""
     id: int
@@ -197,7 +284,8 @@ class CartItemSchema(BaseModel):
     # Agregamos datos del producto para facilitar el front (opcional)
     nombre: str | None = None
     imagen_url: str | None = None
-    stock: int | None = None  # <-- NEW: stock disponible
+    stock: int | None = None  # <-- NEW: stock disponible (para este carrito: incluye lo que ya tiene reservado)
+    reservado_hasta: datetime | None = None  # vencimiento de la reserva de esta línea (None = sin reservar)
 
     class Config:
         from_attributes = True
@@ -209,16 +297,101 @@ class CartSchema(BaseModel):
     class Config:
         from_attributes = True
 
+class CartBatchOp(BaseModel):
+    """Una operación del lote: add suma, set reemplaza la cantidad, remove quita la línea."""
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    cantidad: int = 0
+
+class CartBatchRequest(BaseModel):
+    ops: List[CartBatchOp]
+    # True: todo o nada (la primera operación inválida cancela el lote)
+    # False: se aplican las válidas y 'results' dice cuáles fallaron
+    atomic: bool = True
+
+class CartBatchOpResult(BaseModel):
+    index: int
+    product_id: int
+    ok: bool
+    error: str | None = None
+
+class CartBatchResponse(BaseModel):
+    cart: CartSchema
+    results: List[CartBatchOpResult]
+
 
 
 
 # --- 3. Instancia de la App ---
+
+# Los endpoints que usan la DB son funciones normales ('def'): SQLAlchemy es
+# síncrono, así que FastAPI los ejecuta en su pool de hilos y el event loop
+# queda libre. Este valor es el tamaño de ese pool (anyio usa 40 por defecto);
+# conviene que no supere el tamaño del pool de conexiones de la DB.
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "40"))
+
+# Cada cuántos segundos se reconstruye el índice de búsqueda desde la DB.
+# Con un solo worker no hace falta (0 = nunca): los endpoints de admin lo
+# actualizan al momento. Con varios workers, acota cuánto tarda cada uno en
+# ver los cambios hechos en otro.
+SEARCH_INDEX_REFRESH = float(os.getenv("SEARCH_INDEX_REFRESH", "0"))
+
+def rebuild_search_index():
+    """Arma el índice de búsqueda con todos los productos (solo lee id, nombre y descripción)."""
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        product_index.build(db.execute(
+            select(models.Product.id, models.Product.nombre, models.Product.descripcion)
+        ).tuples())
+        logger.info("Índice de búsqueda: %d productos en %.2fs", len(product_index), time.perf_counter() - start)
+    finally:
+        db.close()
+
+async def refresh_search_index(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await to_thread.run_sync(rebuild_search_index)
+        except Exception:
+            logger.exception("Error reconstruyendo el índice de búsqueda")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+    if AUTO_MIGRATE:
+        await to_thread.run_sync(migrations.upgrade, engine)
+    # Índice de búsqueda de productos: se arma antes de empezar a atender
+    await to_thread.run_sync(rebuild_search_index)
+    tasks = [
+        # Libera en segundo plano las reservas de stock vencidas (ver reservations.py)
+        asyncio.create_task(reservations.run_sweeper()),
+    ]
+    if SEARCH_INDEX_REFRESH > 0:
+        tasks.append(asyncio.create_task(refresh_search_index(SEARCH_INDEX_REFRESH)))
+    yield
+    for task in tasks:
+        task.cancel()
+
 app = FastAPI(
     title="API de Tienda E-Commerce",
     description="La API REST para la aplicación de tienda de ropa.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
+# Comprime con gzip las respuestas grandes (catálogo, ventas) cuando el
+# cliente lo acepta. Las respuestas chicas no valen el costo de comprimir.
+# El cliente de escritorio reutiliza conexiones (keep-alive): conviene correr
+# uvicorn con '--timeout-keep-alive 30' o similar para que no se cierren a los 5 s.
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Latencia, códigos de estado y consultas SQL por ruta (ver metrics.py y GET /metrics).
+# Va al final para ser el middleware más externo y medir también el gzip.
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware)
+
 # --- 4. Dependencia de Base de Datos ---
 # Esto es "Inyección de Dependencias".
 # FastAPI creará una nueva sesión (SessionLocal) por cada request
@@ -231,14 +404,53 @@ def get_db():
     finally:
         db.close()
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    Copia ligera (y desconectada de la sesión) del usuario autenticado.
+    Es lo que devuelve 'get_current_user'; para modificar al usuario hay
+    que cargar el modelo con db.get(models.User, current_user.id).
+    """
+    id: int
+    email: str
+    nombre_completo: str | None
+    is_admin: bool
+    direccion: str | None = None
+    ciudad: str | None = None
+    estado: str | None = None
+    codigo_postal: str | None = None
+    pais: str | None = None
+    telefono: str | None = None
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            nombre_completo=user.nombre_completo,
+            is_admin=bool(user.is_admin),
+            direccion=user.direccion,
+            ciudad=user.ciudad,
+            estado=user.estado,
+            codigo_postal=user.codigo_postal,
+            pais=user.pais,
+            telefono=user.telefono,
+        )
+
 def get_current_user(
     token: str = Depends(oauth2_scheme), 
     db: Session = Depends(get_db)
-) -> models.User:
+) -> CurrentUser:
     """
-    Dependencia que valida el token y devuelve el
-    objeto de usuario de la base de datos.
+    Dependencia que valida el token y devuelve el usuario.
+    El resultado se guarda en 'user_cache' (clave: el token) hasta que
+    expire el token o el TTL de la caché, así que un mismo usuario no
+    se vuelve a consultar en la DB en cada petición.
     """
+    cached = user_cache.get(token)
+    if cached is not None:
+        return cached
+
     payload = verify_token_payload(token)
     email: str = payload.get("sub")
     
@@ -248,13 +460,22 @@ def get_current_user(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Usuario no encontrado"
         )
-    return user
+    snapshot = CurrentUser.from_model(user)
+    # Nunca guardamos el usuario más allá de la expiración del token
+    ttl = min(user_cache.ttl, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        user_cache.set(token, snapshot, ttl=ttl)
+    return snapshot
+
+def invalidate_cached_user(user_id: int):
+    """Olvida los usuarios cacheados (todos sus tokens) tras modificar al usuario."""
+    user_cache.remove_where(lambda snapshot: snapshot.id == user_id)
 
 def get_current_admin_user(
         
 
-    current_user: models.User = Depends(get_current_user)
-) -> models.User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     """
     Dependencia que verifica que el usuario actual
     sea un administrador.
@@ -265,6 +486,29 @@ def get_current_admin_user(
             detail="Acceso denegado: Se requieren permisos de administrador."
         )
     return current_user
+
+# --- Respuestas condicionales (ETag / If-None-Match) ---
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Compara el header If-None-Match con nuestro ETag (comparación débil, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def conditional_json(request: Request, body: bytes, etag: str | None = None) -> Response:
+    """
+    Devuelve 'body' como JSON con su ETag, o un 304 vacío si el cliente
+    ya tiene esa misma versión (header If-None-Match).
+    """
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # --- 5. Endpoints de la API ---
 
 @app.get("/")
@@ -272,15 +516,25 @@ async def root():
     return {"message": "¡Bienvenido a la API de la Tienda!"}
 
 
+def find_user_by_email(db: Session, email: str) -> models.User | None:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+def save_new_user(db: Session, new_db_user: models.User):
+    db.add(new_db_user)  # Añade el objeto a la sesión
+    db.commit()         # Confirma la transacción (guarda en la DB)
+    db.refresh(new_db_user) # Refresca el objeto (para obtener el ID creado)
+
 @app.post("/api/register", status_code=status.HTTP_201_CREATED)
 async def register_user(user: UserRegister, db: Session = Depends(get_db)):
     """
     Endpoint para registrar un nuevo usuario.
     Ahora guarda en la base de datos MySQL.
+    Es 'async' porque espera al pool de bcrypt; las consultas a la DB
+    se mandan al pool de hilos para no bloquear el event loop.
     """
     
     # A. Verificar si el email ya existe
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await run_in_threadpool(find_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -288,7 +542,7 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
         )
     
     # B. Hashear la contraseña
-    hashed_password = security.get_password_hash(user.password)
+    hashed_password = await security.get_password_hash_async(user.password)
     
     # C. Crear el nuevo objeto de usuario para la DB (incluye datos de dirección)
     new_db_user = models.User(
@@ -304,10 +558,8 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
         # is_admin se queda como False (valor por defecto)
     )
     
-    # D. Guardar en la base de datos
-    db.add(new_db_user)  # Añade el objeto a la sesión
-    db.commit()         # Confirma la transacción (guarda en la DB)
-    db.refresh(new_db_user) # Refresca el objeto (para obtener el ID creado)
+    # D. Guardar en la base de datos (en el pool de hilos)
+    await run_in_threadpool(save_new_user, db, new_db_user)
 
     return {
         "message": "Usuario creado exitosamente",
@@ -329,10 +581,10 @@ async def login_for_access_token(
     
     # 1. Buscar al usuario por email
     # Usamos form_data.username porque OAuth2 usa "username" en lugar de "email"
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+    user = await run_in_threadpool(find_user_by_email, db, form_data.username)
     
     # 2. Verificar si el usuario existe Y si la contraseña es correcta
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    if not user or not await security.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
@@ -363,73 +615,375 @@ async def login_for_access_token(
 
 # ... (tu endpoint /api/login) ...
 
-@app.get("/api/products", response_model=List[ProductSchema])
-async def get_all_products(
+def catalog_read_version(db: Session) -> int:
+    """
+    Versión con la que se guarda en caché lo que se va a leer del catálogo.
+
+    Se toma ANTES de leer los productos y en una transacción nueva: la
+    sesión puede venir con una transacción abierta (p.ej. la consulta del
+    usuario en get_current_user) y en MySQL REPEATABLE READ su snapshot
+    puede ser anterior a un cambio cuyo bump() ya se ve en la versión.
+    """
+    version = catalog_cache.version
+    db.rollback()
+    return version
 
+@app.get("/api/products", response_model=List[ProductSchema])
+def get_all_products(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user) # ¡Protegido!
+    current_user: CurrentUser = Depends(get_current_user) # ¡Protegido!
 ):
     """
     Obtiene todos los productos de la tienda.
     Esta ruta está protegida: solo usuarios logueados pueden verla.
     """
-    print(f"El usuario {current_user.email} está pidiendo los productos.")
-    
-    products = db.query(models.Product).all()
-    return products
+    logger.debug("El usuario %s está pidiendo los productos.", current_user.email)
+
+    # El catálogo solo cambia por los endpoints de admin y el checkout,
+    # así que servimos los bytes ya serializados mientras no cambie la versión.
+    cached = catalog_cache.get("all")
+    if cached is None:
+        version = catalog_read_version(db)
+        products = db.query(models.Product).all()
+        body = products_adapter.dump_json(
+            products_adapter.validate_python(products, from_attributes=True)
+        )
+        cached = catalog_cache.set("all", body, version)
+    return conditional_json(request, cached.body, cached.etag)
+
+@app.get("/api/products/page", response_model=ProductPageSchema)
+def get_products_page(
+    request: Request,
+    limit: int = Query(50, ge=1, le=200),
+    after: int | None = Query(None, ge=0, description="Cursor: id del último producto recibido"),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    in_stock: bool = False,
+    q: str | None = Query(None, max_length=100, description="Prefijo del nombre"),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Devuelve una página del catálogo ordenada por 'id'.
+    Todos los filtros se aplican en SQL y se usa paginación por cursor
+    (WHERE id > :after ... LIMIT :limit) en lugar de OFFSET, así que el
+    costo depende del tamaño de la página y no del tamaño del catálogo.
+    """
+    variant = ("page", limit, after, min_price, max_price, in_stock, (q or "").strip())
+    cached = catalog_cache.get(variant)
+    if cached is not None:
+        return conditional_json(request, cached.body, cached.etag)
+    version = catalog_read_version(db)
+
+    query = db.query(models.Product)
+    if after is not None:
+        query = query.filter(models.Product.id > after)
+    if min_price is not None:
+        query = query.filter(models.Product.precio >= min_price)
+    if max_price is not None:
+        query = query.filter(models.Product.precio <= max_price)
+    if in_stock:
+        query = query.filter(models.Product.stock > 0)
+    if q and q.strip():
+        # startswith() escapa '%' y '_' para que el prefijo sea literal
+        query = query.filter(models.Product.nombre.startswith(q.strip(), autoescape=True))
+
+    # Pedimos un elemento de más para saber si existe una página siguiente
+    rows = query.order_by(models.Product.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    items = rows[:limit]
+
+    page = ProductPageSchema.model_validate({
+        "items": items,
+        "next_cursor": items[-1].id if has_more else None,
+        "limit": limit
+    }, from_attributes=True)
+    cached = catalog_cache.set(variant, page.model_dump_json().encode(), version)
+    return conditional_json(request, cached.body, cached.etag)
+
+@app.get("/api/products/search", response_model=ProductSearchSchema)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Texto a buscar (la última palabra vale como prefijo)"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Busca productos por nombre y descripción con el índice invertido en
+    memoria (search_index.py), ordenados por relevancia (BM25). Sin
+    importar mayúsculas ni acentos: "pantalon" encuentra "Pantalón".
+    Solo se va a la DB para traer por id los productos del resultado.
+    """
+    if not product_index.ready:
+        rebuild_search_index()
+    hits = product_index.search(q, limit)
+    if not hits:
+        return {"items": [], "q": q, "limit": limit}
+    rows = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_([pid for pid, _ in hits]))
+    }
+    return {"items": [rows[pid] for pid, _ in hits if pid in rows], "q": q, "limit": limit}
+
+def encode_sales_cursor(fecha: datetime, venta_id: int) -> str:
+    """Cursor de la paginación de ventas: '<fecha ISO>,<id>' de la última venta recibida."""
+    return f"{fecha.isoformat()},{venta_id}"
+
+def decode_sales_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        fecha, venta_id = cursor.rsplit(",", 1)
+        return datetime.fromisoformat(fecha), int(venta_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor de ventas inválido")
+
+# Ventas por lote en el modo streaming (filas que se leen del cursor en cada vuelta)
+SALES_STREAM_CHUNK = int(os.getenv("SALES_STREAM_CHUNK", "500"))
+
+def stream_sales_ndjson(filters: list, ordering: tuple):
+    """
+    Generador NDJSON (una venta por línea) para GET /api/admin/sales?format=ndjson.
 
-@app.get("/api/admin/sales", response_model=List[VentaSchema])
-async def get_all_sales(
+    Corre después de que el endpoint ya devolvió la respuesta, así que abre
+    su propia conexión para las ventas (cursor del lado del servidor, se leen
+    SALES_STREAM_CHUNK filas por vez) y una sesión aparte para los items de
+    cada lote (una sola consulta IN por lote). La memoria no depende de
+    cuántas ventas haya en el rango.
+    """
+    ventas_query = (
+        select(models.Venta.id, models.Venta.fecha, models.Venta.total, models.Venta.user_id)
+        .where(*filters)
+        .order_by(*ordering)
+    )
+    db = SessionLocal()
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=SALES_STREAM_CHUNK).execute(ventas_query)
+            for chunk in result.partitions():
+                items_by_venta = {row.id: [] for row in chunk}
+                item_rows = db.execute(
+                    select(
+                        models.VentaItem.id,
+                        models.VentaItem.venta_id,
+                        models.VentaItem.cantidad,
+                        models.VentaItem.precio_unitario,
+                        models.VentaItem.product_id,
+                    )
+                    .where(models.VentaItem.venta_id.in_(list(items_by_venta)))
+                    .order_by(models.VentaItem.id)
+                ).all()
+                for item in item_rows:
+                    items_by_venta[item.venta_id].append(VentaItemSchema.model_validate(item))
+
+                lines = [
+                    VentaSchema(
+                        id=row.id, fecha=row.fecha, total=row.total, user_id=row.user_id,
+                        items=items_by_venta[row.id]
+                    ).model_dump_json()
+                    for row in chunk
+                ]
+                yield ("\n".join(lines) + "\n").encode()
+    finally:
+        db.close()
 
+@app.get("/api/admin/sales", response_model=SalesPageSchema)
+def get_all_sales(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = Query(None, description="Cursor: 'next_cursor' de la página anterior"),
+    date_from: datetime | None = Query(None, alias="from", description="Desde (incluido)"),
+    date_to: datetime | None = Query(None, alias="to", description="Hasta (excluido)"),
+    user_id: int | None = Query(None, ge=1),
+    order: Literal["desc", "asc"] = "desc",
+    output: Literal["json", "ndjson"] = Query("json", alias="format"),
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user) # ¡Protegido!
+    admin_user: CurrentUser = Depends(get_current_admin_user) # ¡Protegido!
 ):
     """
-    Obtiene TODAS las ventas de la base de datos.
+    Obtiene las ventas, de la más nueva a la más vieja (order=asc al revés).
     Ruta protegida: solo para administradores.
+
+    - Por defecto devuelve una página de 'limit' ventas con paginación por
+      cursor sobre (fecha, id): WHERE (fecha, id) < (cursor) ... LIMIT. Con el
+      índice de 'ventas.fecha' no hace falta ordenar toda la tabla.
+    - Con format=ndjson devuelve TODAS las ventas del rango como NDJSON
+      (una por línea) a medida que se leen de la DB; ahí 'limit' se ignora.
     """
-    print(f"El admin {admin_user.email} está pidiendo todas las ventas.")
-    
-    # Consultamos las ventas.
-    # Usamos 'joinedload' para "traer" los items de cada venta
-    # en la misma consulta (Eager Loading). Esto es mucho más eficiente
-    # que hacer una consulta separada por cada venta (N+1 problem).
+    logger.debug("El admin %s está pidiendo las ventas.", admin_user.email)
+
+    filters = []
+    if date_from is not None:
+        filters.append(models.Venta.fecha >= date_from)
+    if date_to is not None:
+        filters.append(models.Venta.fecha < date_to)
+    if user_id is not None:
+        filters.append(models.Venta.user_id == user_id)
+    if cursor:
+        cursor_fecha, cursor_id = decode_sales_cursor(cursor)
+        # Escrito con OR en lugar de tuple_() para que MySQL use el índice de 'fecha'
+        if order == "desc":
+            filters.append(or_(
+                models.Venta.fecha < cursor_fecha,
+                and_(models.Venta.fecha == cursor_fecha, models.Venta.id < cursor_id),
+            ))
+        else:
+            filters.append(or_(
+                models.Venta.fecha > cursor_fecha,
+                and_(models.Venta.fecha == cursor_fecha, models.Venta.id > cursor_id),
+            ))
+    if order == "desc":
+        ordering = (models.Venta.fecha.desc(), models.Venta.id.desc())
+    else:
+        ordering = (models.Venta.fecha.asc(), models.Venta.id.asc())
+
+    if output == "ndjson":
+        return StreamingResponse(stream_sales_ndjson(filters, ordering), media_type="application/x-ndjson")
+
+    # Los items se cargan con 'selectinload' (una consulta IN para toda la página):
+    # 'joinedload' + LIMIT cortaría la página por filas de items y no por ventas.
+    # Pedimos una venta de más para saber si existe una página siguiente.
     ventas = db.query(models.Venta).options(
-        joinedload(models.Venta.items)
-    ).order_by(models.Venta.fecha.desc()).all()
-    
-    return ventas
+        selectinload(models.Venta.items)
+    ).filter(*filters).order_by(*ordering).limit(limit + 1).all()
+
+    has_more = len(ventas) > limit
+    ventas = ventas[:limit]
+    return {
+        "items": ventas,
+        "next_cursor": encode_sales_cursor(ventas[-1].fecha, ventas[-1].id) if has_more else None,
+        "limit": limit
+    }
+
+@app.get("/api/admin/sales/summary", response_model=SalesSummarySchema)
+def get_sales_summary(
+    date_from: date | None = Query(None, alias="from", description="Desde (día incluido)"),
+    date_to: date | None = Query(None, alias="to", description="Hasta (día excluido)"),
+    bucket: Literal["day", "week", "month"] | None = None,
+    top: int = Query(5, ge=0, le=50),
+    db: Session = Depends(get_db),
+    admin_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """
+    Resumen de ventas: número de ventas, ingresos y unidades vendidas,
+    opcionalmente agrupados por día/semana/mes, y los 'top' productos más
+    vendidos. Ruta protegida: solo administradores.
+
+    Lee solo los resúmenes diarios (rollups.py), nunca ventas/venta_items:
+    el costo depende de los días del rango, no de cuántas ventas hay. Por
+    eso el rango va en días enteros.
+    """
+    Dia, Producto = models.VentaDiaria, models.VentaDiariaProducto
+    filters = []
+    if date_from is not None:
+        filters.append(Dia.fecha >= date_from)
+    if date_to is not None:
+        filters.append(Dia.fecha < date_to)
+
+    aggregates = (
+        func.coalesce(func.sum(Dia.pedidos), 0).label("ventas"),
+        func.coalesce(func.sum(Dia.ingresos), 0).label("ingresos"),
+        func.coalesce(func.sum(Dia.unidades), 0).label("unidades"),
+    )
+
+    row = db.execute(select(*aggregates).where(*filters)).one()
+    summary = {
+        "totales": {"ventas": int(row.ventas), "ingresos": float(row.ingresos), "unidades": int(row.unidades)},
+        "buckets": [],
+        "top_productos": [],
+    }
+
+    if bucket:
+        periodo = date_bucket(Dia.fecha, bucket, db.get_bind().dialect.name).label("periodo")
+        rows = db.execute(select(periodo, *aggregates).where(*filters).group_by(periodo).order_by(periodo)).all()
+        summary["buckets"] = [
+            {"periodo": r.periodo, "ventas": int(r.ventas), "ingresos": float(r.ingresos), "unidades": int(r.unidades)}
+            for r in rows
+        ]
+
+    if top:
+        product_filters = [Producto.fecha >= date_from] if date_from is not None else []
+        if date_to is not None:
+            product_filters.append(Producto.fecha < date_to)
+        unidades = func.sum(Producto.unidades).label("unidades")
+        ranking = (
+            select(Producto.product_id, unidades, func.sum(Producto.ingresos).label("ingresos"))
+            .where(*product_filters)
+            .group_by(Producto.product_id)
+            .order_by(unidades.desc(), Producto.product_id)
+            .limit(top)
+            .subquery()
+        )
+        # El nombre se busca solo para los 'top' (y puede faltar si el producto se borró)
+        rows = db.execute(
+            select(ranking, models.Product.nombre)
+            .outerjoin(models.Product, models.Product.id == ranking.c.product_id)
+            .order_by(ranking.c.unidades.desc(), ranking.c.product_id)
+        ).all()
+        summary["top_productos"] = [
+            {"product_id": r.product_id, "nombre": r.nombre, "unidades": int(r.unidades), "ingresos": float(r.ingresos)}
+            for r in rows
+        ]
+
+    return summary
+
+@app.get("/api/admin/sales/daily", response_model=List[SalesDaySchema])
+def get_sales_daily(
+    date_from: date | None = Query(None, alias="from", description="Desde (día incluido)"),
+    date_to: date | None = Query(None, alias="to", description="Hasta (día excluido)"),
+    product_id: int | None = Query(None, description="Solo las ventas de este producto"),
+    db: Session = Depends(get_db),
+    admin_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """
+    Serie diaria de ventas (solo días con ventas), de toda la tienda o de un
+    producto, leída de los resúmenes diarios. Ruta protegida: solo administradores.
+    """
+    table = models.VentaDiaria if product_id is None else models.VentaDiariaProducto
+    query = select(table.fecha, table.pedidos.label("ventas"), table.unidades, table.ingresos)
+    if product_id is not None:
+        query = query.where(table.product_id == product_id)
+    if date_from is not None:
+        query = query.where(table.fecha >= date_from)
+    if date_to is not None:
+        query = query.where(table.fecha < date_to)
+    return [row._asdict() for row in db.execute(query.order_by(table.fecha))]
 
 @app.get("/api/profile", response_model=ProfileSchema)
-async def get_user_profile(
-    current_user: models.User = Depends(get_current_user)
+def get_user_profile(
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Obtiene el perfil del usuario actualmente logueado.
+    Responde 304 si el cliente ya tiene esta misma versión del perfil.
     """
     # La dependencia 'get_current_user' ya hizo todo el trabajo
-    # de buscar al usuario en la DB a partir del token.
-    return current_user
+    # de buscar al usuario (en la caché o en la DB) a partir del token.
+    body = ProfileSchema.model_validate(current_user).model_dump_json().encode()
+    return conditional_json(request, body)
 
 
 @app.put("/api/profile", response_model=ProfileSchema)
-async def update_user_profile(
+def update_user_profile(
     update_data: ProfileUpdateSchema,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Actualiza el perfil (nombre, email y datos de dirección) del usuario logueado.
     """
+    # 'current_user' es una copia en caché: cargamos el modelo para modificarlo
+    user = db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
     user_updated = False # Para saber si necesitamos hacer commit
 
     # 1. Actualizar Nombre (si se proporcionó)
-    if update_data.nombre_completo is not None and update_data.nombre_completo != current_user.nombre_completo:
-        current_user.nombre_completo = update_data.nombre_completo
+    if update_data.nombre_completo is not None and update_data.nombre_completo != user.nombre_completo:
+        user.nombre_completo = update_data.nombre_completo
         user_updated = True
 
     # 2. Actualizar Email (si se proporcionó)
-    if update_data.email is not None and update_data.email != current_user.email:
+    if update_data.email is not None and update_data.email != user.email:
         # ¡IMPORTANTE! Verificar que el nuevo email no esté ya en uso
         existing_user = db.query(models.User).filter(models.User.email == update_data.email).first()
         if existing_user:
@@ -437,43 +991,77 @@ async def update_user_profile(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="El nuevo email ya está registrado por otro usuario."
             )
-        current_user.email = update_data.email
+        user.email = update_data.email
         user_updated = True
 
     # 3. Campos de dirección (si se proporcionaron)
     addr_fields = ["direccion", "ciudad", "estado", "codigo_postal", "pais", "telefono"]
     for field in addr_fields:
         val = getattr(update_data, field)
-        if val is not None and getattr(current_user, field) != val:
-            setattr(current_user, field, val)
+        if val is not None and getattr(user, field) != val:
+            setattr(user, field, val)
             user_updated = True
     
     # 4. Guardar cambios en la DB (si hubo alguno)
     if user_updated:
         db.commit()
-        db.refresh(current_user)
+        db.refresh(user)
+        # Los tokens de este usuario ya no deben servir la copia vieja
+        invalidate_cached_user(user.id)
     
-    return current_user
+    return user
+
+@app.get("/api/admin/cache")
+async def get_cache_stats(
+    admin_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Estadísticas de las cachés del catálogo y de usuarios (aciertos, fallos...)."""
+    return {"catalog": catalog_cache.stats(), "users": user_cache.stats()}
+
+@app.get("/api/admin/db-pool")
+async def get_db_pool_stats(
+    admin_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """
+    Estado del pool de conexiones de este worker: conexiones en uso,
+    overflow, y tiempos de espera para obtener una conexión.
+    """
+    return pool_status()
+
+# Si está definido, /metrics pide 'Authorization: Bearer <METRICS_TOKEN>'
+# (el scraper de Prometheus no tiene un usuario de la tienda).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    """Métricas de este worker en formato de texto de Prometheus (ver metrics.py)."""
+    if METRICS_TOKEN:
+        expected = f"Bearer {METRICS_TOKEN}"
+        if not secrets.compare_digest(request.headers.get("authorization", "").encode(), expected.encode()):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    return PlainTextResponse(render_prometheus(pool_status()), media_type="text/plain; version=0.0.4")
 
 @app.post("/api/admin/products", response_model=ProductSchema)
-async def create_product(
+def create_product(
     product: ProductCreate,
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user)
+    admin_user: CurrentUser = Depends(get_current_admin_user)
 ):
     """Crea un nuevo producto (solo admin)."""
     db_product = models.Product(**product.dict())
     db.add(db_product)
     db.commit()
+    catalog_cache.bump()
     db.refresh(db_product)
+    product_index.add(db_product.id, db_product.nombre, db_product.descripcion)
     return db_product
 
 @app.put("/api/admin/products/{product_id}", response_model=ProductSchema)
-async def update_product(
+def update_product(
     product_id: int,
     product: ProductCreate,
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user)
+    admin_user: CurrentUser = Depends(get_current_admin_user)
 ):
     """Actualiza un producto existente (solo admin)."""
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -484,14 +1072,16 @@ async def update_product(
         setattr(db_product, key, value)
     
     db.commit()
+    catalog_cache.bump()
     db.refresh(db_product)
+    product_index.add(db_product.id, db_product.nombre, db_product.descripcion)
     return db_product
 
 @app.delete("/api/admin/products/{product_id}")
-async def delete_product(
+def delete_product(
     product_id: int,
     db: Session = Depends(get_db),
-    admin_user: models.User = Depends(get_current_admin_user)
+    admin_user: CurrentUser = Depends(get_current_admin_user)
 ):
     """Elimina un producto (solo admin)."""
     db_product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -500,162 +1090,490 @@ async def delete_product(
     
     db.delete(db_product)
     db.commit()
+    catalog_cache.bump()
+    product_index.remove(product_id)
     return {"message": "Producto eliminado"}
 
+def load_cart(db: Session, user_id: int) -> dict:
+    """
+    Carga el carrito del usuario en UNA sola consulta:
+    cart_items LEFT JOIN products, proyectando solo las columnas que usa
+    CartItemSchema, y con el total calculado en SQL (SUM(...) OVER ()).
+
+    'stock' es lo que este carrito puede tener del producto: lo disponible
+    (stock - reservado) más lo que la propia línea ya tiene reservado.
+    """
+    line_total = models.CartItem.cantidad * models.CartItem.precio_unitario
+    own_hold = case((models.CartItem.reservado_hasta.isnot(None), models.CartItem.cantidad), else_=0)
+    rows = db.execute(
+        select(
+            models.CartItem.id,
+            models.CartItem.product_id,
+            models.CartItem.cantidad,
+            models.CartItem.precio_unitario,
+            models.Product.nombre,
+            models.Product.imagen_url,
+            (models.Product.disponible + own_hold).label("stock"),
+            models.CartItem.reservado_hasta,
+            func.sum(line_total).over().label("cart_total"),
+        )
+        .outerjoin(models.Product, models.Product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    ).all()
+    items = [
+        {
+            "id": row.id,
+            "product_id": row.product_id,
+            "cantidad": row.cantidad,
+            "precio_unitario": row.precio_unitario,
+            "nombre": row.nombre,
+            "imagen_url": row.imagen_url,
+            "stock": row.stock,
+            "reservado_hasta": row.reservado_hasta,
+        }
+        for row in rows
+    ]
+    return {"items": items, "total": float(rows[0].cart_total) if rows else 0.0}
+
+def cart_with_items(items: list) -> dict:
+    """Rearma la respuesta del carrito después de modificar 'items' en memoria."""
+    return {"items": items, "total": sum(i["cantidad"] * i["precio_unitario"] for i in items)}
+
+def find_cart_line(cart: dict, product_id: int) -> dict | None:
+    return next((i for i in cart["items"] if i["product_id"] == product_id), None)
+
+def held_quantity(line: dict | None) -> int:
+    """Unidades que la línea tiene reservadas ahora (0 si no existe o su reserva venció)."""
+    return line["cantidad"] if line and line["reservado_hasta"] is not None else 0
+
 @app.get("/api/cart", response_model=CartSchema)
-async def get_cart(
+def get_cart(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Devuelve el carrito del usuario actual."""
-    cart_items = db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).all()
-    items_out = []
-    total = 0.0
-    for ci in cart_items:
-        nombre = ci.producto.nombre if ci.producto else None
-        imagen = ci.producto.imagen_url if ci.producto else None
-        stock = ci.producto.stock if ci.producto else None  # <-- NEW: incluir stock
-        items_out.append({
-            "id": ci.id,
-            "product_id": ci.product_id,
-            "cantidad": ci.cantidad,
-            "precio_unitario": ci.precio_unitario,
-            "nombre": nombre,
-            "imagen_url": imagen,
-            "stock": stock
-        })
-        total += ci.cantidad * ci.precio_unitario
-    return {"items": items_out, "total": total}
+    """
+    Devuelve el carrito del usuario actual.
+    Responde 304 si el cliente ya tiene esta misma versión del carrito.
+    """
+    cart = CartSchema.model_validate(load_cart(db, current_user.id))
+    return conditional_json(request, cart.model_dump_json().encode())
+
+# Las mutaciones del carrito leen el carrito una vez (load_cart), validan
+# contra esa lectura, escriben, y devuelven la misma lectura parcheada en
+# memoria, en lugar de volver a cargar todo el carrito después del commit.
+# La excepción es add_to_cart, que escribe sin leer (upsert) y lee al final.
+# Antes de leer renuevan las reservas del usuario (renew_holds) y cada
+# línea que tocan queda reservada por RESERVATION_TTL_MINUTES más. No
+# invalidan el catálogo cacheado (ver el comentario de ProductSchema).
+
+# Upsert de una línea del carrito sobre el índice único uq_cart_items_user_product.
+# Va como texto y no con los insert() de sqlalchemy.dialects: esos no entran en
+# la caché de sentencias compiladas y se recompilaban en cada alta (~2 ms).
+_CART_UPSERT_SELECT = (
+    "INSERT INTO cart_items (user_id, product_id, cantidad, precio_unitario, reservado_hasta) "
+    "SELECT :user_id, id, :cantidad, precio, :reservado_hasta FROM products WHERE id = :product_id "
+)
+_CART_UPSERT = {
+    "sqlite": _CART_UPSERT_SELECT + (
+        "ON CONFLICT (user_id, product_id) DO UPDATE SET "
+        "cantidad = cart_items.cantidad + excluded.cantidad, reservado_hasta = excluded.reservado_hasta"
+    ),
+    "mysql": _CART_UPSERT_SELECT + (
+        "ON DUPLICATE KEY UPDATE "
+        "cantidad = cart_items.cantidad + VALUES(cantidad), reservado_hasta = VALUES(reservado_hasta)"
+    ),
+}
+_CART_UPSERT = {
+    dialect: text(sql).bindparams(bindparam("reservado_hasta", type_=DateTime()))
+    for dialect, sql in _CART_UPSERT.items()
+}
+
+def upsert_cart_line(db: Session, user_id: int, product_id: int, cantidad: int, reservado_hasta: datetime):
+    """
+    Suma 'cantidad' a la línea (user_id, product_id) del carrito, o la crea,
+    en UNA sentencia: INSERT ... SELECT (el precio sale de products) con ON
+    DUPLICATE KEY UPDATE en MySQL u ON CONFLICT DO UPDATE en SQLite. La suma
+    la hace la base, así que dos altas en paralelo no pierden un incremento
+    ni crean dos líneas. La línea queda reservada hasta 'reservado_hasta'.
+    """
+    dialect = db.get_bind().dialect.name
+    db.execute(_CART_UPSERT["sqlite" if dialect == "sqlite" else "mysql"], {
+        "user_id": user_id, "product_id": product_id,
+        "cantidad": cantidad, "reservado_hasta": reservado_hasta,
+    })
 
 @app.post("/api/cart/add", response_model=CartSchema)
-async def add_to_cart(
+def add_to_cart(
     item: CartItemCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Añade un producto al carrito (o actualiza la cantidad)."""
-    product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    """
+    Añade un producto al carrito (o suma a la cantidad que ya tenía) y reserva las unidades.
+
+    No lee antes de escribir: la reserva es un UPDATE condicional sobre el
+    producto (reserve_for_add) y la línea se escribe con un upsert
+    (upsert_cart_line). Solo si la reserva falla se consulta qué pasó.
+    """
+    def product_missing():
+        # Solo en los caminos de error: un producto inexistente es 404 antes que cualquier 400
+        return db.execute(select(models.Product.id).where(models.Product.id == item.product_id)).first() is None
+
     if item.cantidad <= 0:
+        if product_missing():
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
         raise HTTPException(status_code=400, detail="Cantidad debe ser mayor que 0")
-    if product.stock < item.cantidad:
+    now = datetime.now()
+    renew_holds(db, current_user.id, now)
+    if not reserve_for_add(db, current_user.id, item.product_id, item.cantidad):
+        if product_missing():
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
+        in_cart = db.execute(
+            select(models.CartItem.id).where(
+                models.CartItem.user_id == current_user.id,
+                models.CartItem.product_id == item.product_id
+            )
+        ).first()
+        if in_cart:
+            raise HTTPException(status_code=400, detail="Cantidad total excede stock disponible")
         raise HTTPException(status_code=400, detail="No hay stock suficiente")
 
-    cart_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id,
-        models.CartItem.product_id == item.product_id
-    ).first()
-    if cart_item:
-        new_cant = cart_item.cantidad + item.cantidad
-        if new_cant > product.stock:
-            raise HTTPException(status_code=400, detail="Cantidad total excede stock disponible")
-        cart_item.cantidad = new_cant
-    else:
-        cart_item = models.CartItem(
-            user_id=current_user.id,
-            product_id=item.product_id,
-            cantidad=item.cantidad,
-            precio_unitario=product.precio
-        )
-        db.add(cart_item)
+    upsert_cart_line(db, current_user.id, item.product_id, item.cantidad, hold_until(now))
+    # Se lee dentro de la misma transacción: devuelve exactamente lo que queda al hacer commit
+    cart = load_cart(db, current_user.id)
     db.commit()
-
-    # Devolver carrito actualizado
-    return await get_cart(db, current_user)
+    return cart
 
 @app.put("/api/cart/update/{product_id}", response_model=CartSchema)
-async def update_cart_item(
+def update_cart_item(
     product_id: int,
     item: CartItemCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Actualiza cantidad de un item del carrito (reemplaza cantidad)."""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    """Actualiza cantidad de un item del carrito (reemplaza cantidad y ajusta su reserva)."""
+    now = datetime.now()
+    renew_holds(db, current_user.id, now)
+    cart = load_cart(db, current_user.id)
+    line = find_cart_line(cart, product_id)
+    if line is None or line["stock"] is None:
+        # Solo en el camino de error: distinguir "no existe el producto" de "no está en el carrito"
+        exists = db.execute(select(models.Product.id).where(models.Product.id == product_id)).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Producto no encontrado")
     if item.cantidad <= 0:
         raise HTTPException(status_code=400, detail="Cantidad debe ser mayor que 0")
-    if product.stock < item.cantidad:
+    if line is None:
+        raise HTTPException(status_code=404, detail="Item en carrito no existe")
+    if line["stock"] < item.cantidad:
+        raise HTTPException(status_code=400, detail="No hay stock suficiente")
+    if not adjust_reservations(db, {product_id: item.cantidad - held_quantity(line)}):
         raise HTTPException(status_code=400, detail="No hay stock suficiente")
 
-    cart_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id,
-        models.CartItem.product_id == product_id
-    ).first()
-    if not cart_item:
-        raise HTTPException(status_code=404, detail="Item en carrito no existe")
-    cart_item.cantidad = item.cantidad
+    reservado_hasta = hold_until(now)
+    db.execute(
+        update(models.CartItem).where(models.CartItem.id == line["id"])
+        .values(cantidad=item.cantidad, reservado_hasta=reservado_hasta)
+    )
     db.commit()
-    return await get_cart(db, current_user)
+    line["cantidad"] = item.cantidad
+    line["reservado_hasta"] = reservado_hasta
+    return cart_with_items(cart["items"])
 
 @app.delete("/api/cart/remove/{product_id}", response_model=CartSchema)
-async def remove_cart_item(
+def remove_cart_item(
     product_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Elimina un item del carrito."""
-    cart_item = db.query(models.CartItem).filter(
-        models.CartItem.user_id == current_user.id,
-        models.CartItem.product_id == product_id
-    ).first()
-    if cart_item:
-        db.delete(cart_item)
+    """Elimina un item del carrito (y libera su reserva)."""
+    renew_holds(db, current_user.id)
+    cart = load_cart(db, current_user.id)
+    line = find_cart_line(cart, product_id)
+    if line is None:
         db.commit()
-    return await get_cart(db, current_user)
+        return cart
+    adjust_reservations(db, {product_id: -held_quantity(line)})
+    db.execute(
+        delete(models.CartItem).where(
+            models.CartItem.user_id == current_user.id,
+            models.CartItem.product_id == product_id
+        )
+    )
+    db.commit()
+    return cart_with_items([i for i in cart["items"] if i["product_id"] != product_id])
+
+# Máximo de operaciones por lote en /api/cart/batch
+CART_BATCH_MAX_OPS = int(os.getenv("CART_BATCH_MAX_OPS", "100"))
+
+def apply_cart_op(lines: dict, products: dict, op: CartBatchOp) -> tuple | None:
+    """
+    Aplica 'op' sobre las líneas del carrito en memoria (product_id -> línea).
+    'products' trae por producto el stock que este carrito puede usar.
+    Devuelve (status, detalle) si la operación no es válida; en ese caso no toca 'lines'.
+    """
+    if op.op == "remove":
+        lines.pop(op.product_id, None)
+        return None
+    product = products.get(op.product_id)
+    if product is None:
+        return 404, "Producto no encontrado"
+    if op.cantidad <= 0:
+        return 400, "Cantidad debe ser mayor que 0"
+    if product["stock"] < op.cantidad:
+        return 400, "No hay stock suficiente"
+
+    line = lines.get(op.product_id)
+    if op.op == "set":
+        if line is None:
+            return 404, "Item en carrito no existe"
+        line["cantidad"] = op.cantidad
+    elif line is not None:
+        new_cant = line["cantidad"] + op.cantidad
+        if new_cant > product["stock"]:
+            return 400, "Cantidad total excede stock disponible"
+        line["cantidad"] = new_cant
+    else:
+        lines[op.product_id] = {
+            "id": None,  # línea nueva: se inserta al guardar
+            "product_id": op.product_id,
+            "cantidad": op.cantidad,
+            "precio_unitario": product["precio"],
+            "nombre": product["nombre"],
+            "imagen_url": product["imagen_url"],
+            "stock": product["stock"],
+            "reservado_hasta": None,
+        }
+    return None
+
+@app.post("/api/cart/batch", response_model=CartBatchResponse)
+def cart_batch(
+    batch: CartBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    Aplica varias operaciones sobre el carrito en una sola petición
+    (restaurar un carrito guardado, añadir un combo, sincronizar cambios del cliente).
+
+    Las operaciones se aplican en orden sobre el carrito en memoria: una
+    consulta para el carrito, una para el stock de todos los productos
+    afectados, y después un UPDATE de reservas, un DELETE, un UPDATE y un
+    INSERT como mucho, en una sola transacción. Las líneas que tocan las
+    operaciones quedan reservadas. Devuelve el carrito resultante y el
+    resultado de cada operación.
+    """
+    if not batch.ops:
+        raise HTTPException(status_code=400, detail="El lote no tiene operaciones")
+    if len(batch.ops) > CART_BATCH_MAX_OPS:
+        raise HTTPException(status_code=400, detail=f"Máximo {CART_BATCH_MAX_OPS} operaciones por lote")
+
+    now = datetime.now()
+    renew_holds(db, current_user.id, now)
+    cart = load_cart(db, current_user.id)
+    lines = {i["product_id"]: dict(i) for i in cart["items"]}
+    original = {product_id: (line["id"], line["cantidad"]) for product_id, line in lines.items()}
+    held = {product_id: held_quantity(line) for product_id, line in lines.items()}
+
+    # Stock de todos los productos que se añaden o modifican, en una sola consulta
+    product_ids = {op.product_id for op in batch.ops if op.op != "remove"}
+    products = {}
+    if product_ids:
+        products = {
+            row.id: {**row._asdict(), "stock": row.disponible + held.get(row.id, 0)}
+            for row in db.execute(
+                select(models.Product.id, models.Product.nombre, models.Product.precio,
+                       models.Product.disponible, models.Product.imagen_url)
+                .where(models.Product.id.in_(product_ids))
+            )
+        }
+
+    results = []
+    touched = set()
+    for index, op in enumerate(batch.ops):
+        error = apply_cart_op(lines, products, op)
+        if error and batch.atomic:
+            raise HTTPException(status_code=error[0], detail=f"Operación {index} (producto {op.product_id}): {error[1]}")
+        if error is None:
+            touched.add(op.product_id)
+        results.append({"index": index, "product_id": op.product_id, "ok": error is None, "error": error[1] if error else None})
+
+    # Reservas: las líneas tocadas quedan reservadas con su cantidad final
+    # (las quitadas liberan lo suyo), todo en un UPDATE condicional
+    reservado_hasta = hold_until(now)
+    deltas = {}
+    for product_id in touched:
+        final = lines[product_id]["cantidad"] if product_id in lines else 0
+        if final - held.get(product_id, 0):
+            deltas[product_id] = final - held.get(product_id, 0)
+        if product_id in lines:
+            lines[product_id]["reservado_hasta"] = reservado_hasta
+    if not adjust_reservations(db, deltas):
+        raise HTTPException(status_code=409, detail="El stock cambió mientras se aplicaba el lote, inténtalo de nuevo")
+
+    # Diferencias contra lo que había en la base de datos.
+    # Una línea quitada y vuelta a añadir en el mismo lote se borra y se inserta de nuevo.
+    removed = [pid for pid, (line_id, _) in original.items() if pid not in lines or lines[pid]["id"] is None]
+    changed = {
+        line["id"]: line["cantidad"]
+        for pid, line in lines.items()
+        if line["id"] is not None and (line["cantidad"] != original[pid][1] or pid in touched)
+    }
+    new_lines = [line for line in lines.values() if line["id"] is None]
+
+    if removed:
+        db.execute(
+            delete(models.CartItem).where(
+                models.CartItem.user_id == current_user.id,
+                models.CartItem.product_id.in_(removed)
+            )
+        )
+    if changed:
+        db.execute(
+            update(models.CartItem)
+            .where(models.CartItem.id.in_(changed))
+            .values(cantidad=case(changed, value=models.CartItem.id), reservado_hasta=reservado_hasta)
+            .execution_options(synchronize_session=False)
+        )
+    if new_lines:
+        # Un solo INSERT con todas las líneas (executemany) y una consulta para sus ids
+        db.execute(insert(models.CartItem), [
+            {
+                "user_id": current_user.id,
+                "product_id": line["product_id"],
+                "cantidad": line["cantidad"],
+                "precio_unitario": line["precio_unitario"],
+                "reservado_hasta": reservado_hasta,
+            }
+            for line in new_lines
+        ])
+        new_ids = dict(db.execute(
+            select(models.CartItem.product_id, models.CartItem.id).where(
+                models.CartItem.user_id == current_user.id,
+                models.CartItem.product_id.in_([line["product_id"] for line in new_lines])
+            )
+        ).all())
+        for line in new_lines:
+            line["id"] = new_ids[line["product_id"]]
+    db.commit()
+
+    return {"cart": cart_with_items(list(lines.values())), "results": results}
+
+def checkout_stock_error(db: Session, needed: dict, held: dict) -> HTTPException:
+    """Explica por qué falló el UPDATE de stock del checkout (solo se usa en el camino de error)."""
+    rows = {
+        row.id: row
+        for row in db.execute(
+            select(models.Product.id, models.Product.nombre, models.Product.disponible)
+            .where(models.Product.id.in_(needed))
+        )
+    }
+    for product_id, cantidad in needed.items():
+        prod = rows.get(product_id)
+        if not prod:
+            return HTTPException(status_code=404, detail=f"Producto {product_id} no encontrado")
+        if prod.disponible + held.get(product_id, 0) < cantidad:
+            return HTTPException(status_code=400, detail=f"No hay stock suficiente para {prod.nombre}")
+    return HTTPException(status_code=409, detail="El stock cambió durante la compra, inténtalo de nuevo")
 
 @app.post("/api/cart/checkout", response_model=VentaSchema)
-async def checkout_cart(
+def checkout_cart(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     Finaliza la compra:
     - Valida stock
     - Crea Venta y VentaItems
-    - Resta stock de productos
+    - Resta stock de productos (y convierte las reservas del carrito en venta)
     - Limpia el carrito del usuario
+    - Suma la venta a los resúmenes diarios (rollups.py)
+
+    Todo ocurre en UNA transacción y con operaciones por conjunto. Solo se
+    bloquean las líneas del propio carrito (para que el barrido de reservas
+    no las libere a mitad de la compra); los productos no se bloquean con
+    SELECT ... FOR UPDATE: un único UPDATE condicional descuenta el stock,
+    y las unidades que el carrito ya tenía reservadas cuentan como propias.
     """
-    cart_items = db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).all()
-    if not cart_items:
+    cart_lines = db.execute(
+        select(models.CartItem.product_id, models.CartItem.cantidad, models.CartItem.precio_unitario,
+               models.CartItem.reservado_hasta)
+        .where(models.CartItem.user_id == current_user.id)
+        .order_by(models.CartItem.id)
+        .with_for_update()
+    ).all()
+    if not cart_lines:
         raise HTTPException(status_code=400, detail="Carrito vacío")
-    total = 0.0
-    # Validar stock primero
-    for ci in cart_items:
-        prod = db.query(models.Product).filter(models.Product.id == ci.product_id).with_for_update().first()
-        if not prod:
-            raise HTTPException(status_code=404, detail=f"Producto {ci.product_id} no encontrado")
-        if prod.stock < ci.cantidad:
-            raise HTTPException(status_code=400, detail=f"No hay stock suficiente para {prod.nombre}")
+
+    # Cantidad total pedida por producto (por si un producto aparece en varias líneas)
+    # y cuánto de eso ya está reservado por este carrito
+    needed, held = {}, {}
+    for line in cart_lines:
+        needed[line.product_id] = needed.get(line.product_id, 0) + line.cantidad
+        if line.reservado_hasta is not None:
+            held[line.product_id] = held.get(line.product_id, 0) + line.cantidad
+
+    # Descontar stock y reservas en un solo UPDATE (el IN se recorre por la
+    # clave primaria, así dos checkouts toman los locks de fila en el mismo orden):
+    #   SET stock = stock - pedido, reservado = reservado - reservado_por_mí
+    #   WHERE stock - reservado + reservado_por_mí >= pedido
+    cantidad_por_id = case(needed, value=models.Product.id)
+    reservado_por_id = case(held, value=models.Product.id, else_=0) if held else 0
+    result = db.execute(
+        update(models.Product)
+        .where(
+            models.Product.id.in_(needed),
+            models.Product.stock - models.Product.reservado + reservado_por_id >= cantidad_por_id
+        )
+        .values(stock=models.Product.stock - cantidad_por_id, reservado=models.Product.reservado - reservado_por_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(needed):
+        db.rollback()
+        raise checkout_stock_error(db, needed, held)
 
     # Crear venta
-    venta = models.Venta(user_id=current_user.id, total=0.0)
+    fecha = datetime.now()
+    total = sum(line.cantidad * line.precio_unitario for line in cart_lines)
+    venta = models.Venta(user_id=current_user.id, total=total, fecha=fecha)
     db.add(venta)
     db.flush()  # obtener id de venta
-
-    for ci in cart_items:
-        prod = db.query(models.Product).filter(models.Product.id == ci.product_id).first()
-        line_total = ci.cantidad * ci.precio_unitario
-        total += line_total
-        venta_item = models.VentaItem(
-            venta_id=venta.id,
-            product_id=ci.product_id,
-            cantidad=ci.cantidad,
-            precio_unitario=ci.precio_unitario
-        )
-        db.add(venta_item)
-        # Descontar stock
-        prod.stock = prod.stock - ci.cantidad
-
-    venta.total = total
+    venta_id = venta.id
+
+    db.execute(insert(models.VentaItem), [
+        {
+            "venta_id": venta_id,
+            "product_id": line.product_id,
+            "cantidad": line.cantidad,
+            "precio_unitario": line.precio_unitario,
+        }
+        for line in cart_lines
+    ])
+
+    # Limpiar carrito (misma transacción)
+    db.execute(delete(models.CartItem).where(models.CartItem.user_id == current_user.id))
+    # Resúmenes diarios al final: la fila del día es la más disputada y queda bloqueada hasta el commit
+    record_sale(db, fecha, total, ((line.product_id, line.cantidad, line.precio_unitario) for line in cart_lines))
     db.commit()
-
-    # Limpiar carrito
-    db.query(models.CartItem).filter(models.CartItem.user_id == current_user.id).delete()
-    db.commit()
-
-    # Refrescar venta para devolverla
-    db.refresh(venta)
-    return venta
\ No newline at end of file
+    # El stock cambió: el catálogo cacheado ya no es válido
+    catalog_cache.bump()
+
+    items = db.execute(
+        select(
+            models.VentaItem.id,
+            models.VentaItem.cantidad,
+            models.VentaItem.precio_unitario,
+            models.VentaItem.product_id,
+        )
+        .where(models.VentaItem.venta_id == venta_id)
+        .order_by(models.VentaItem.id)
+    ).all()
+    return {
+        "id": venta_id,
+        "fecha": fecha,
+        "total": total,
+        "user_id": current_user.id,
+        "items": [row._asdict() for row in items],
+    }
@@ -28,10 +28,13 @@ CREATE TABLE `cart_items` (
   `product_id` int NOT NULL,
   `cantidad` int NOT NULL,
   `precio_unitario` float NOT NULL,
+  `reservado_hasta` datetime DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `user_id` (`user_id`),
   KEY `product_id` (`product_id`),
   KEY `ix_cart_items_id` (`id`),
+  KEY `ix_cart_items_reservado_hasta` (`reservado_hasta`),
+  UNIQUE KEY `uq_cart_items_user_product` (`user_id`,`product_id`),
   CONSTRAINT `cart_items_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
   CONSTRAINT `cart_items_ibfk_2` FOREIGN KEY (`product_id`) REFERENCES `products` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=17 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -60,8 +63,11 @@ CREATE TABLE `products` (
   `precio` float NOT NULL,
   `stock` int DEFAULT NULL,
   `imagen_url` varchar(255) DEFAULT NULL,
+  `reservado` int NOT NULL DEFAULT '0',
   PRIMARY KEY (`id`),
-  KEY `ix_products_id` (`id`)
+  KEY `ix_products_id` (`id`),
+  KEY `ix_products_nombre` (`nombre`),
+  KEY `ix_products_precio` (`precio`)
 ) ENGINE=InnoDB AUTO_INCREMENT=9 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -71,7 +77,7 @@ CREATE TABLE `products` (
 
 LOCK TABLES `products` WRITE;
 /*!40000 ALTER TABLE `products` DISABLE KEYS */;
-INSERT INTO `products` VALUES (1,'Camisa de Lino Blanca','Camisa fresca de lino, ideal para verano.',45.99,39,'https://tse4.mm.bing.net/th/id/OIP.r7yu4kWSRmm6PCecz7h7MwHaLG?rs=1&pid=ImgDetMain&o=7&rm=3'),(2,'Pantalón Vaquero Clásico','Pantalón vaquero (jean) de corte recto.',70,22,'https://m.media-amazon.com/images/I/71caydI6MYL._AC_SL1500_.jpg'),(3,'Tenis Skechers','Cómodas para correr o caminar.',89.5,71,'https://tse4.mm.bing.net/th/id/OIP.jxyYLK45BKWIL6HKPj5SVwHaGj?rs=1&pid=ImgDetMain&o=7&rm=3'),(4,'Camisa Polo','Camisa Polo de Calidad',200,6,'https://i5.walmartimages.com.mx/samsmx/images/product-images/img_large/981010395l.jpg?odnHeight=612&odnWidth=612&odnBg=FFFFFF'),(5,'Pantalón Furor','Pantalón Furor para Hombre, de Gabardina Khaki Talla 34',250,4,'https://i5.walmartimages.com.mx/mg/gm/3pp/asr/44325502-7047-48cd-8724-8a3254b43d2c.55385f68622a7e9c8fb2f784525d9162.jpeg?odnHeight=612&odnWidth=612&odnBg=FFFFFF'),(6,'nike tenis','confort pa tus pies',200,0,'https://tse4.mm.bing.net/th/id/OIP.WLbsWsMjC6TVNyDqdQDnIQHaF7?rs=1&pid=ImgDetMain&o=7&rm=3');
+INSERT INTO `products` VALUES (1,'Camisa de Lino Blanca','Camisa fresca de lino, ideal para verano.',45.99,39,'https://tse4.mm.bing.net/th/id/OIP.r7yu4kWSRmm6PCecz7h7MwHaLG?rs=1&pid=ImgDetMain&o=7&rm=3',0),(2,'Pantalón Vaquero Clásico','Pantalón vaquero (jean) de corte recto.',70,22,'https://m.media-amazon.com/images/I/71caydI6MYL._AC_SL1500_.jpg',0),(3,'Tenis Skechers','Cómodas para correr o caminar.',89.5,71,'https://tse4.mm.bing.net/th/id/OIP.jxyYLK45BKWIL6HKPj5SVwHaGj?rs=1&pid=ImgDetMain&o=7&rm=3',0),(4,'Camisa Polo','Camisa Polo de Calidad',200,6,'https://i5.walmartimages.com.mx/samsmx/images/product-images/img_large/981010395l.jpg?odnHeight=612&odnWidth=612&odnBg=FFFFFF',0),(5,'Pantalón Furor','Pantalón Furor para Hombre, de Gabardina Khaki Talla 34',250,4,'https://i5.walmartimages.com.mx/mg/gm/3pp/asr/44325502-7047-48cd-8724-8a3254b43d2c.55385f68622a7e9c8fb2f784525d9162.jpeg?odnHeight=612&odnWidth=612&odnBg=FFFFFF',0),(6,'nike tenis','confort pa tus pies',200,0,'https://tse4.mm.bing.net/th/id/OIP.WLbsWsMjC6TVNyDqdQDnIQHaF7?rs=1&pid=ImgDetMain&o=7&rm=3',0);
 /*!40000 ALTER TABLE `products` ENABLE KEYS */;
 UNLOCK TABLES;
 
@@ -157,6 +163,8 @@ CREATE TABLE `ventas` (
   PRIMARY KEY (`id`),
   KEY `user_id` (`user_id`),
   KEY `ix_ventas_id` (`id`),
+  KEY `ix_ventas_fecha` (`fecha`),
+  KEY `ix_ventas_user_fecha` (`user_id`,`fecha`),
   CONSTRAINT `ventas_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=8 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -170,6 +178,59 @@ LOCK TABLES `ventas` WRITE;
 INSERT INTO `ventas` VALUES (1,'2025-10-27 10:30:00',115.99,1),(2,'2025-10-28 14:15:00',89.5,1),(3,'2025-11-02 13:39:57',997.42,3),(4,'2025-11-02 15:36:03',294.99,4),(5,'2025-11-02 18:20:58',629.5,1),(6,'2025-11-02 18:24:49',250,1),(7,'2025-11-03 13:32:24',301.98,1);
 /*!40000 ALTER TABLE `ventas` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Table structure for table `ventas_diarias`
+--
+
+DROP TABLE IF EXISTS `ventas_diarias`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `ventas_diarias` (
+  `fecha` date NOT NULL,
+  `pedidos` int NOT NULL,
+  `unidades` int NOT NULL,
+  `ingresos` float NOT NULL,
+  PRIMARY KEY (`fecha`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `ventas_diarias`
+--
+
+LOCK TABLES `ventas_diarias` WRITE;
+/*!40000 ALTER TABLE `ventas_diarias` DISABLE KEYS */;
+INSERT INTO `ventas_diarias` VALUES ('2025-10-27',1,2,115.99),('2025-10-28',1,1,89.5),('2025-11-02',4,23,2171.91),('2025-11-03',1,5,301.98);
+/*!40000 ALTER TABLE `ventas_diarias` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `ventas_diarias_productos`
+--
+
+DROP TABLE IF EXISTS `ventas_diarias_productos`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `ventas_diarias_productos` (
+  `fecha` date NOT NULL,
+  `product_id` int NOT NULL,
+  `pedidos` int NOT NULL,
+  `unidades` int NOT NULL,
+  `ingresos` float NOT NULL,
+  PRIMARY KEY (`fecha`,`product_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `ventas_diarias_productos`
+--
+
+LOCK TABLES `ventas_diarias_productos` WRITE;
+/*!40000 ALTER TABLE `ventas_diarias_productos` DISABLE KEYS */;
+INSERT INTO `ventas_diarias_productos` VALUES ('2025-10-27',1,1,1,45.99),('2025-10-27',2,1,1,70),('2025-10-28',3,1,1,89.5),('2025-11-02',1,2,9,413.91),('2025-11-02',2,3,5,350),('2025-11-02',3,3,4,358),('2025-11-02',4,2,4,800),('2025-11-02',5,1,1,250),('2025-11-03',1,1,2,91.98),('2025-11-03',2,1,3,210);
+/*!40000 ALTER TABLE `ventas_diarias_productos` ENABLE KEYS */;
+UNLOCK TABLES;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1 @@
+"""Benchmarks de la API. Se ejecutan desde la raíz del repo: python -m benchmarks.<nombre>"""
@@ -0,0 +1,230 @@
+"""
+Prueba de concurrencia de add_to_cart: cientos de "añadir al carrito" en
+paralelo del MISMO usuario sobre pocos productos.
+
+Compara dos escenarios, cada uno en un subproceso con su propia base:
+  - leer_modificar_escribir: el add_to_cart anterior (lee el carrito,
+    suma en Python y hace UPDATE / INSERT de la línea). Está reproducido
+    aquí mismo como referencia.
+  - upsert: el add_to_cart actual (reserva con un UPDATE condicional y
+    escribe la línea con INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE).
+
+Al final verifica que:
+  - haya una sola línea por producto,
+  - la cantidad de cada línea sea la suma de las altas que respondieron OK
+    (ningún incremento perdido),
+  - products.reservado coincida con lo reservado en los carritos.
+Reporta también errores (500 / de DB), latencia y sentencias SQL por alta.
+Sale con código 1 si el escenario 'upsert' viola algo de lo anterior.
+
+En SQLite las transacciones que escriben van de a una (lock de toda la
+base), así que el escenario viejo tampoco pierde incrementos: ahí solo se
+compara el costo. La carrera se ve con --database-url apuntando a un
+MySQL de pruebas, donde los locks son por fila.
+
+Uso:
+    python -m benchmarks.bench_cart_add --adds 500 --concurrency 64 --products 2
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_login import percentile
+
+SCENARIOS = ("leer_modificar_escribir", "upsert")
+
+
+def _legacy_add(api_server, models, db, user, product_id: int, cantidad: int):
+    """add_to_cart de antes: lee el carrito, calcula la cantidad nueva en Python y la escribe."""
+    from datetime import datetime
+    from fastapi import HTTPException
+    from sqlalchemy import select, update
+    from reservations import adjust_reservations, hold_until, renew_holds
+
+    now = datetime.now()
+    renew_holds(db, user.id, now)
+    cart = api_server.load_cart(db, user.id)
+    line = api_server.find_cart_line(cart, product_id)
+    product = db.execute(
+        select(models.Product.precio, models.Product.disponible).where(models.Product.id == product_id)
+    ).first()
+    new_cant = (line["cantidad"] if line else 0) + cantidad
+    if not adjust_reservations(db, {product_id: new_cant - api_server.held_quantity(line)}):
+        raise HTTPException(status_code=400, detail="No hay stock suficiente")
+    if line:
+        db.execute(
+            update(models.CartItem).where(models.CartItem.id == line["id"])
+            .values(cantidad=new_cant, reservado_hasta=hold_until(now))
+        )
+    else:
+        db.add(models.CartItem(user_id=user.id, product_id=product_id, cantidad=cantidad,
+                               precio_unitario=product.precio, reservado_hasta=hold_until(now)))
+    db.commit()
+
+
+def _run_child(scenario: str, adds: int, concurrency: int, products: int, stock: int, seed: int) -> dict:
+    from fastapi import HTTPException
+    from sqlalchemy import event, func, select
+    from sqlalchemy.exc import DBAPIError
+    import api_server
+    import migrations
+    import models
+    from database import SessionLocal, engine
+
+    migrations.drop_all(engine)
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    items = [models.Product(nombre=f"Producto {i}", precio=10.0, stock=stock) for i in range(products)]
+    buyer = models.User(email="comprador@example.com", nombre_completo="Comprador", hashed_password="x")
+    db.add_all(items + [buyer])
+    db.commit()
+    product_ids = [p.id for p in items]
+    user = api_server.CurrentUser(id=buyer.id, email=buyer.email, nombre_completo=None, is_admin=False)
+    db.close()
+
+    statements = {"n": 0}
+    counter_lock = threading.Lock()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        with counter_lock:
+            statements["n"] += 1
+
+    rng = random.Random(seed)
+    plan = [rng.choice(product_ids) for _ in range(adds)]
+    start = threading.Barrier(min(concurrency, adds))
+
+    def one_add(index: int) -> dict:
+        product_id = plan[index]
+        if index < concurrency:
+            start.wait()   # la primera tanda sale toda junta
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        try:
+            if scenario == "upsert":
+                api_server.add_to_cart(api_server.CartItemCreate(product_id=product_id, cantidad=1), db, user)
+            else:
+                _legacy_add(api_server, models, db, user, product_id, 1)
+            result = "ok"
+        except HTTPException:
+            db.rollback()
+            result = "rechazado"
+        except DBAPIError as e:
+            db.rollback()
+            result = "error_db:" + type(e.orig).__name__
+        finally:
+            db.close()
+        return {"product_id": product_id, "result": result, "seconds": time.perf_counter() - t0}
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one_add, range(adds)))
+    elapsed = time.perf_counter() - t0
+    total_statements = statements["n"]
+
+    db = SessionLocal()
+    lines = db.execute(
+        select(models.CartItem.product_id, func.count(), func.sum(models.CartItem.cantidad))
+        .where(models.CartItem.user_id == user.id)
+        .group_by(models.CartItem.product_id)
+    ).all()
+    reserved = dict(db.execute(select(models.Product.id, models.Product.reservado)).all())
+    held = dict(db.execute(
+        select(models.CartItem.product_id, func.sum(models.CartItem.cantidad))
+        .where(models.CartItem.reservado_hasta.isnot(None))
+        .group_by(models.CartItem.product_id)
+    ).all())
+    db.close()
+
+    ok_per_product = {}
+    counts = {}
+    for o in outcomes:
+        counts[o["result"]] = counts.get(o["result"], 0) + 1
+        if o["result"] == "ok":
+            ok_per_product[o["product_id"]] = ok_per_product.get(o["product_id"], 0) + 1
+    in_cart = {product_id: int(total) for product_id, _, total in lines}
+    duplicate_lines = sum(n - 1 for _, n, _ in lines)
+    lost = sum(max(0, ok_per_product.get(pid, 0) - in_cart.get(pid, 0)) for pid in product_ids)
+    reservation_mismatch = sum(1 for pid in product_ids if reserved.get(pid, 0) != int(held.get(pid, 0) or 0))
+    latencies = [o["seconds"] * 1000 for o in outcomes]
+    errors = sum(n for result, n in counts.items() if result.startswith("error_db"))
+    return {
+        "scenario": scenario,
+        "database": engine.dialect.name,
+        "adds": adds,
+        "concurrency": concurrency,
+        "ok": counts.get("ok", 0),
+        "rejected": counts.get("rechazado", 0),
+        "db_errors": errors,
+        "error_kinds": {r: n for r, n in counts.items() if r.startswith("error_db")},
+        "duplicate_lines": duplicate_lines,
+        "lost_increments": lost,
+        "reservation_mismatches": reservation_mismatch,
+        "statements_per_add": round(total_statements / adds, 2),
+        "adds_per_s": round(adds / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--adds", type=int, default=500, help="Altas en total (todas del mismo usuario)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--products", type=int, default=2, help="Productos distintos entre los que se reparten")
+    parser.add_argument("--stock", type=int, default=100_000, help="Stock de cada producto (de sobra por defecto)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database-url", default=None,
+                        help="Base de pruebas (por defecto un SQLite temporal); se borran sus tablas")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_child(args.child, args.adds, args.concurrency, args.products, args.stock, args.seed)))
+        return
+
+    results = []
+    for scenario in args.scenarios:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ)
+            env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            env["DB_POOL_SIZE"] = str(args.concurrency)
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_cart_add", "--child", scenario,
+                 "--adds", str(args.adds), "--concurrency", str(args.concurrency),
+                 "--products", str(args.products), "--stock", str(args.stock), "--seed", str(args.seed)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps({"results": results}, indent=2))
+    else:
+        print(f"Altas: {args.adds} del mismo usuario  concurrencia: {args.concurrency}  "
+              f"productos: {args.products}  DB: {results[0]['database']}")
+        print(f"{'escenario':>24} {'ok':>5} {'rech.':>5} {'err db':>6} {'dup.':>5} {'perdidos':>8} "
+              f"{'reserva mal':>11} {'sql/alta':>8} {'altas/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for r in results:
+            print(f"{r['scenario']:>24} {r['ok']:>5} {r['rejected']:>5} {r['db_errors']:>6} {r['duplicate_lines']:>5} "
+                  f"{r['lost_increments']:>8} {r['reservation_mismatches']:>11} {r['statements_per_add']:>8} "
+                  f"{r['adds_per_s']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8}")
+            if r["error_kinds"]:
+                print(f"{'':>24} errores: {r['error_kinds']}")
+
+    broken = [r for r in results if r["scenario"] == "upsert" and (
+        r["db_errors"] or r["duplicate_lines"] or r["lost_increments"] or r["reservation_mismatches"])]
+    if broken:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+Benchmark de contención en el checkout: compradores en paralelo sobre pocos productos "calientes".
+
+Compara dos escenarios, cada uno en un subproceso con su propia base:
+  - sin_reservas: el flujo anterior (el stock se mira al añadir, pero
+    solo se aparta en el checkout, con SELECT ... FOR UPDATE + UPDATE).
+    Está reproducido aquí mismo como referencia.
+  - reservas: el flujo actual de api_server (add_to_cart reserva con un
+    UPDATE condicional y checkout_cart convierte la reserva en venta).
+
+Cada comprador (un hilo) añade 'items' productos calientes al carrito,
+espera 'think' segundos y hace checkout. Se reporta:
+  - rechazados al añadir (se enteran enseguida de que no hay stock)
+  - fallos en checkout (ya tenían el carrito armado y fallan al pagar)
+  - errores de DB (p.ej. 'database is locked' en SQLite)
+  - latencia del checkout y tiempo del checkout dentro de sentencias que
+    toman locks (INSERT / UPDATE / DELETE / SELECT ... FOR UPDATE), que
+    incluye la espera por esos locks. En SQLite el lock es de toda la base
+    (un escritor a la vez); en MySQL son locks de fila.
+
+Por defecto usa un SQLite temporal. Con --database-url se puede apuntar a
+un MySQL local de pruebas (¡se borran y crean las tablas!).
+
+Uso:
+    python -m benchmarks.bench_checkout --buyers 200 --concurrency 32 --products 3 --stock 40
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_login import percentile
+
+SCENARIOS = ("sin_reservas", "reservas")
+
+
+def _legacy_add(db, models, user_id: int, product_id: int):
+    """add_to_cart de antes: valida contra 'stock' y no aparta nada."""
+    from fastapi import HTTPException
+    product = db.get(models.Product, product_id)
+    if product.stock < 1:
+        raise HTTPException(status_code=400, detail="No hay stock suficiente")
+    db.add(models.CartItem(user_id=user_id, product_id=product_id, cantidad=1, precio_unitario=product.precio))
+    db.commit()
+
+
+def _legacy_checkout(db, models, user_id: int):
+    """checkout_cart de antes: bloquea los productos con FOR UPDATE, valida y descuenta."""
+    from datetime import datetime
+    from fastapi import HTTPException
+    from sqlalchemy import case, delete, insert, select, update
+    lines = db.execute(
+        select(models.CartItem.product_id, models.CartItem.cantidad, models.CartItem.precio_unitario)
+        .where(models.CartItem.user_id == user_id)
+    ).all()
+    needed = {}
+    for line in lines:
+        needed[line.product_id] = needed.get(line.product_id, 0) + line.cantidad
+    locked = {
+        row.id: row for row in db.execute(
+            select(models.Product.id, models.Product.stock)
+            .where(models.Product.id.in_(needed)).order_by(models.Product.id).with_for_update()
+        )
+    }
+    for product_id, cantidad in needed.items():
+        if locked[product_id].stock < cantidad:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="No hay stock suficiente")
+    venta = models.Venta(user_id=user_id, total=sum(l.cantidad * l.precio_unitario for l in lines), fecha=datetime.now())
+    db.add(venta)
+    db.flush()
+    db.execute(insert(models.VentaItem), [
+        {"venta_id": venta.id, "product_id": l.product_id, "cantidad": l.cantidad, "precio_unitario": l.precio_unitario}
+        for l in lines
+    ])
+    cantidad_por_id = case(needed, value=models.Product.id)
+    result = db.execute(
+        update(models.Product)
+        .where(models.Product.id.in_(needed), models.Product.stock >= cantidad_por_id)
+        .values(stock=models.Product.stock - cantidad_por_id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(needed):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="El stock cambió durante la compra")
+    db.execute(delete(models.CartItem).where(models.CartItem.user_id == user_id))
+    db.commit()
+
+
+def _run_child(scenario: str, buyers: int, concurrency: int, products: int, stock: int,
+               items: int, think: float, seed: int) -> dict:
+    from fastapi import HTTPException
+    from sqlalchemy import event, func, select
+    from sqlalchemy.exc import OperationalError
+    import api_server
+    import migrations
+    import models
+    from database import SessionLocal, engine
+
+    migrations.drop_all(engine)
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    hot = [models.Product(nombre=f"Producto caliente {i}", precio=10.0, stock=stock) for i in range(products)]
+    users = [models.User(email=f"comprador{i}@example.com", nombre_completo=f"Comprador {i}", hashed_password="x")
+             for i in range(buyers)]
+    db.add_all(hot + users)
+    db.commit()
+    hot_ids = [p.id for p in hot]
+    user_ids = [u.id for u in users]
+    db.close()
+
+    # Tiempo dentro de las sentencias que toman locks, por comprador (hilo)
+    local = threading.local()
+    locking = ("INSERT", "UPDATE", "DELETE")
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["bench_t0"] = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        text = statement.lstrip().upper()
+        if text.startswith(locking) or "FOR UPDATE" in text:
+            local.lock_time = getattr(local, "lock_time", 0.0) + time.perf_counter() - conn.info.pop("bench_t0", time.perf_counter())
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+    def buyer(index: int) -> dict:
+        rng = random.Random(seed + index)
+        user_id = user_ids[index]
+        user = api_server.CurrentUser(id=user_id, email=f"comprador{index}@example.com",
+                                      nombre_completo=None, is_admin=False)
+        picks = rng.sample(hot_ids, min(items, len(hot_ids)))
+        local.lock_time = 0.0
+        db = SessionLocal()
+        try:
+            try:
+                for product_id in picks:
+                    if scenario == "reservas":
+                        api_server.add_to_cart(api_server.CartItemCreate(product_id=product_id, cantidad=1), db, user)
+                    else:
+                        _legacy_add(db, models, user_id, product_id)
+            except HTTPException:
+                db.rollback()
+                return {"result": "rechazado_al_anadir"}
+            time.sleep(think)
+            local.lock_time = 0.0
+            t0 = time.perf_counter()
+            try:
+                if scenario == "reservas":
+                    api_server.checkout_cart(db, user)
+                else:
+                    _legacy_checkout(db, models, user_id)
+                result = "ok"
+            except HTTPException:
+                db.rollback()
+                result = "fallo_checkout"
+            return {"result": result, "checkout_s": time.perf_counter() - t0, "lock_s": local.lock_time}
+        except OperationalError:
+            db.rollback()
+            return {"result": "error_db"}
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(buyer, range(buyers)))
+    elapsed = time.perf_counter() - t0
+
+    db = SessionLocal()
+    sold = db.execute(select(func.coalesce(func.sum(models.VentaItem.cantidad), 0))).scalar()
+    min_stock = db.execute(select(func.min(models.Product.stock))).scalar()
+    db.close()
+
+    counts = {}
+    for o in outcomes:
+        counts[o["result"]] = counts.get(o["result"], 0) + 1
+    checkouts = [o for o in outcomes if "checkout_s" in o]
+    checkout_ms = [o["checkout_s"] * 1000 for o in checkouts]
+    lock_ms = [o["lock_s"] * 1000 for o in checkouts]
+    reached = len(checkouts)
+    return {
+        "scenario": scenario,
+        "database": engine.dialect.name,
+        "buyers": buyers,
+        "concurrency": concurrency,
+        "stock_total": stock * products,
+        "items_per_cart": items,
+        "ok": counts.get("ok", 0),
+        "rejected_at_add": counts.get("rechazado_al_anadir", 0),
+        "failed_checkouts": counts.get("fallo_checkout", 0),
+        "db_errors": counts.get("error_db", 0),
+        "failed_checkout_rate": round(counts.get("fallo_checkout", 0) / reached, 4) if reached else 0.0,
+        "units_sold": int(sold),
+        "oversold": min_stock is not None and min_stock < 0,
+        "elapsed_s": round(elapsed, 3),
+        "checkouts_per_s": round(counts.get("ok", 0) / elapsed, 2),
+        "checkout_p50_ms": round(percentile(checkout_ms, 50), 2),
+        "checkout_p99_ms": round(percentile(checkout_ms, 99), 2),
+        "lock_ms_total": round(sum(lock_ms), 2),
+        "lock_p99_ms": round(percentile(lock_ms, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--products", type=int, default=3, help="Productos calientes")
+    parser.add_argument("--stock", type=int, default=40, help="Stock inicial de cada producto caliente")
+    parser.add_argument("--items", type=int, default=1, help="Productos distintos por carrito")
+    parser.add_argument("--think", type=float, default=0.01, help="Segundos entre armar el carrito y pagar")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database-url", default=None,
+                        help="Base de pruebas (por defecto un SQLite temporal); se borran sus tablas")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_child(args.child, args.buyers, args.concurrency, args.products, args.stock,
+                                    args.items, args.think, args.seed)))
+        return
+
+    results = []
+    for scenario in args.scenarios:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ)
+            env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            # Que el pool no sea el cuello de botella y que las reservas no venzan durante la corrida
+            env["DB_POOL_SIZE"] = str(args.concurrency)
+            env["RESERVATION_TTL_MINUTES"] = "15"
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_checkout", "--child", scenario,
+                 "--buyers", str(args.buyers), "--concurrency", str(args.concurrency),
+                 "--products", str(args.products), "--stock", str(args.stock),
+                 "--items", str(args.items), "--think", str(args.think), "--seed", str(args.seed)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps({"results": results}, indent=2))
+        return
+
+    print(f"Compradores: {args.buyers}  concurrencia: {args.concurrency}  "
+          f"stock total: {args.stock * args.products}  items/carrito: {args.items}  DB: {results[0]['database']}")
+    print(f"{'escenario':>13} {'ok':>5} {'rech.add':>8} {'fallo pago':>10} {'% fallo pago':>12} {'err db':>6} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'lock total ms':>13} {'lock p99':>9} {'sobreventa':>10}")
+    for r in results:
+        print(f"{r['scenario']:>13} {r['ok']:>5} {r['rejected_at_add']:>8} {r['failed_checkouts']:>10} "
+              f"{r['failed_checkout_rate'] * 100:>11.1f}% {r['db_errors']:>6} {r['checkout_p50_ms']:>8} "
+              f"{r['checkout_p99_ms']:>8} {r['lock_ms_total']:>13} {r['lock_p99_ms']:>9} {str(r['oversold']):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Planes de consulta antes y después de los índices de la migración 0003.
+
+Siembra una base (benchmarks/seed.py) y carritos de unas líneas por
+usuario, quita los índices de 0003 (como estaba el esquema antes) y para
+cada consulta típica de la API muestra el plan (EXPLAIN QUERY PLAN en
+SQLite, EXPLAIN en MySQL) y la mediana de tiempo. Después aplica las
+migraciones pendientes (migrations.upgrade) y repite.
+
+Uso:
+    python -m benchmarks.bench_indexes --users 20000 --products 20000 --sales 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+
+NEW_INDEXES = [
+    ("cart_items", "uq_cart_items_user_product"),
+    ("ventas", "ix_ventas_user_fecha"),
+    ("products", "ix_products_nombre"),
+    ("products", "ix_products_precio"),
+]
+
+# Consultas como las que hace api_server (mismas columnas en WHERE / ORDER BY)
+QUERIES = {
+    "linea_carrito": (
+        "SELECT id, cantidad FROM cart_items WHERE user_id = :user_id AND product_id = :product_id"
+    ),
+    "cargar_carrito": (
+        "SELECT cart_items.id, cart_items.cantidad, products.nombre, products.stock - products.reservado "
+        "FROM cart_items JOIN products ON products.id = cart_items.product_id "
+        "WHERE cart_items.user_id = :user_id ORDER BY cart_items.id"
+    ),
+    "ventas_cliente": (
+        "SELECT id, fecha, total FROM ventas WHERE user_id = :user_id "
+        "ORDER BY fecha DESC, id DESC LIMIT 100"
+    ),
+    "ventas_cliente_rango": (
+        "SELECT id, fecha, total FROM ventas WHERE user_id = :user_id "
+        "AND fecha >= :date_from AND fecha < :date_to ORDER BY fecha DESC, id DESC LIMIT 100"
+    ),
+    "productos_prefijo": (
+        "SELECT id, nombre FROM products WHERE nombre LIKE :prefix ORDER BY id LIMIT 51"
+    ),
+    "productos_precio": (
+        "SELECT id, precio FROM products WHERE precio >= :min_price AND precio <= :max_price ORDER BY id LIMIT 51"
+    ),
+}
+
+
+def _params(name: str, rng: random.Random, users: int, products: int, carts: dict) -> dict:
+    user_id = rng.randint(2, users + 1)
+    if name == "linea_carrito":
+        return {"user_id": user_id, "product_id": rng.choice(carts[user_id])}
+    if name in ("cargar_carrito", "ventas_cliente"):
+        return {"user_id": user_id}
+    if name == "ventas_cliente_rango":
+        start = datetime.now() - timedelta(days=rng.randint(30, 365))
+        return {"user_id": user_id, "date_from": start, "date_to": start + timedelta(days=30)}
+    if name == "productos_prefijo":
+        return {"prefix": rng.choice(["Camisa", "Pantal", "Chaqueta", "Vestido", "Botas"]) + "%"}
+    low = round(rng.uniform(5, 145), 2)
+    return {"min_price": low, "max_price": low + 0.5}
+
+
+def explain(conn, sql: str, params: dict) -> str:
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+        return " | ".join(row[-1] for row in rows)
+    rows = conn.execute(text("EXPLAIN " + sql), params).mappings().all()
+    return " | ".join(
+        f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} {row['Extra'] or ''}".strip()
+        for row in rows
+    )
+
+
+def measure(engine, args, carts: dict) -> dict:
+    results = {}
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE" if conn.dialect.name == "sqlite" else "ANALYZE TABLE cart_items, ventas, products"))
+        for name, sql in QUERIES.items():
+            rng = random.Random(args.seed)
+            plan = explain(conn, sql, _params(name, rng, args.users, args.products, carts))
+            times = []
+            for _ in range(args.repeat):
+                params = _params(name, rng, args.users, args.products, carts)
+                t0 = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                times.append((time.perf_counter() - t0) * 1000)
+            results[name] = {"plan": plan, "median_ms": round(statistics.median(times), 3)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--sales", type=int, default=100_000)
+    parser.add_argument("--cart-lines", type=int, default=3, help="Líneas de carrito por usuario")
+    parser.add_argument("--repeat", type=int, default=200, help="Ejecuciones de cada consulta")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", default=None,
+                        help="Base de pruebas (por defecto un SQLite temporal); ¡se borran sus tablas!")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        import migrations
+        import models
+        from benchmarks.seed import seed
+        from database import engine
+
+        seed(engine, args.users, args.products, args.sales, seed_value=args.seed)
+        rng = random.Random(args.seed)
+        carts = {}
+        rows = []
+        for user_id in range(2, args.users + 2):
+            carts[user_id] = rng.sample(range(1, args.products + 1), args.cart_lines)
+            rows += [{"user_id": user_id, "product_id": product_id, "cantidad": 1, "precio_unitario": 10.0}
+                     for product_id in carts[user_id]]
+        with engine.begin() as conn:
+            for start in range(0, len(rows), 5000):
+                conn.execute(insert(models.CartItem), rows[start:start + 5000])
+
+            # Esquema "antes": sin los índices de 0003 y con la migración pendiente
+            for table, index in NEW_INDEXES:
+                if engine.dialect.name == "sqlite":
+                    conn.execute(text(f"DROP INDEX {index}"))
+                else:
+                    conn.execute(text(f"DROP INDEX {index} ON {table}"))
+            conn.execute(migrations.schema_migrations.delete()
+                         .where(migrations.schema_migrations.c.version == "0003_secondary_indexes"))
+
+        before = measure(engine, args, carts)
+        t0 = time.perf_counter()
+        migrations.upgrade(engine)
+        migration_s = time.perf_counter() - t0
+        after = measure(engine, args, carts)
+        dialect = engine.dialect.name
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps({"database": dialect, "migration_s": round(migration_s, 3),
+                          "before": before, "after": after}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"DB: {dialect}  usuarios: {args.users}  productos: {args.products}  ventas: {args.sales}  "
+          f"migración 0003: {migration_s:.2f}s")
+    for name in QUERIES:
+        old, new = before[name], after[name]
+        speedup = old["median_ms"] / new["median_ms"] if new["median_ms"] else float("inf")
+        print(f"\n{name}: {old['median_ms']} ms -> {new['median_ms']} ms (x{speedup:.1f})")
+        print(f"  antes:   {old['plan']}")
+        print(f"  después: {new['plan']}")
+
+
+if __name__ == "__main__":
+    main()
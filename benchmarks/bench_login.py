@@ -0,0 +1,139 @@
+"""
+Benchmark de login: throughput de /api/login según el tamaño del pool de bcrypt.
+
+Para cada valor de PASSWORD_WORKERS lanza un subproceso que:
+  1. crea una base SQLite temporal con un usuario,
+  2. levanta 'api_server.app' en memoria (httpx + ASGITransport),
+  3. dispara N logins concurrentes y, a la vez, pings a GET / para medir
+     cuánto tarda el event loop en atender otras peticiones.
+
+Uso:
+    python -m benchmarks.bench_login --logins 64 --concurrency 32 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(pct / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+async def _run_child(logins: int, concurrency: int) -> dict:
+    import httpx
+    import api_server
+    import migrations
+    import models
+    import security
+    from database import SessionLocal, engine
+
+    migrations.upgrade(engine)
+    db = SessionLocal()
+    db.add(models.User(
+        email="bench@example.com",
+        nombre_completo="Bench",
+        hashed_password=security.get_password_hash("bench-password"),
+    ))
+    db.commit()
+    db.close()
+
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+        statuses = {}
+        login_latencies = []
+
+        async def one_login():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/api/login", data={"username": "bench@example.com", "password": "bench-password"})
+                login_latencies.append(time.perf_counter() - t0)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+        ping_latencies = []
+        done = asyncio.Event()
+
+        async def pinger():
+            # Una petición barata: si el loop está bloqueado por bcrypt, esto se dispara
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await client.get("/")
+                ping_latencies.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.01)
+
+        ping_task = asyncio.create_task(pinger())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await ping_task
+
+    return {
+        "password_workers": security.PASSWORD_WORKERS,
+        "logins": logins,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(logins / elapsed, 2),
+        "login_p50_ms": round(percentile(login_latencies, 50) * 1000, 1),
+        "login_p99_ms": round(percentile(login_latencies, 99) * 1000, 1),
+        "ping_p50_ms": round(percentile(ping_latencies, 50) * 1000, 2),
+        "ping_max_ms": round(max(ping_latencies, default=0) * 1000, 2),
+        "ping_mean_ms": round(statistics.mean(ping_latencies) * 1000, 2) if ping_latencies else 0.0,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="Tamaños de pool a probar (por defecto 1, 2, 4... hasta los núcleos)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_run_child(args.logins, args.concurrency))))
+        return
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** i for i in range(1, 6) if 2 ** i <= cores], cores})
+    results = []
+    for n in workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ)
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            env["PASSWORD_WORKERS"] = str(n)
+            # Cola suficiente para que el benchmark mida throughput y no 503
+            env["PASSWORD_QUEUE_LIMIT"] = str(max(args.concurrency, args.logins))
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_login", "--child",
+                 "--logins", str(args.logins), "--concurrency", str(args.concurrency)],
+                env=env, capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps({"cores": cores, "results": results}, indent=2))
+        return
+
+    print(f"Núcleos: {cores}")
+    print(f"{'workers':>8} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'ping p50':>9} {'ping max':>9}  status")
+    for r in results:
+        print(f"{r['password_workers']:>8} {r['logins_per_s']:>10} {r['login_p50_ms']:>8} {r['login_p99_ms']:>8} "
+              f"{r['ping_p50_ms']:>9} {r['ping_max_ms']:>9}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Resumen de ventas del panel de admin: consulta sobre ventas/venta_items
+(como era antes) contra los resúmenes diarios (rollups.py).
+
+Para cada tamaño de histórico siembra una base (benchmarks/seed.py),
+reconstruye los resúmenes con rollups.backfill (y lo cronometra) y mide la
+mediana de:
+  - escaneo: el resumen anterior, reproducido aquí (JOIN + GROUP BY sobre
+    todas las ventas del rango),
+  - rollups: get_sales_summary de la API, que lee solo los resúmenes,
+para los totales de todo el histórico (lo que muestra el panel de admin), y
+para todo el histórico y los últimos 30 días con buckets por mes y top 5
+productos. El top de un rango recorre una fila por día y producto vendido:
+escala con los días del rango y la variedad de productos, no con las ventas.
+
+Después hace compras reales con checkout_cart y verifica que los resúmenes
+mantenidos en cada compra sigan dando lo mismo que el escaneo (totales,
+días y top de productos). Sale con código 1 si algo no coincide.
+
+Uso:
+    python -m benchmarks.bench_rollups --sales 10000 100000 --days 1095
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+
+def _scan_summary(db, date_from, date_to, bucket, top):
+    """get_sales_summary de antes: todo desde ventas/venta_items."""
+    from sqlalchemy import func, select
+    import models
+    from database import date_bucket
+
+    filters = []
+    if date_from is not None:
+        filters.append(models.Venta.fecha >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        filters.append(models.Venta.fecha < datetime.combine(date_to, datetime.min.time()))
+    units = (
+        select(models.VentaItem.venta_id, func.sum(models.VentaItem.cantidad).label("unidades"))
+        .group_by(models.VentaItem.venta_id)
+        .subquery()
+    )
+    aggregates = (
+        func.count(models.Venta.id).label("ventas"),
+        func.coalesce(func.sum(models.Venta.total), 0).label("ingresos"),
+        func.coalesce(func.sum(units.c.unidades), 0).label("unidades"),
+    )
+
+    def totals_query(*columns):
+        return (
+            select(*columns, *aggregates)
+            .select_from(models.Venta)
+            .outerjoin(units, units.c.venta_id == models.Venta.id)
+            .where(*filters)
+        )
+
+    row = db.execute(totals_query()).one()
+    summary = {"totales": {"ventas": row.ventas, "ingresos": float(row.ingresos), "unidades": int(row.unidades)},
+               "buckets": [], "top_productos": []}
+    if bucket:
+        periodo = date_bucket(models.Venta.fecha, bucket, db.get_bind().dialect.name).label("periodo")
+        summary["buckets"] = [
+            {"periodo": r.periodo, "ventas": r.ventas, "ingresos": float(r.ingresos), "unidades": int(r.unidades)}
+            for r in db.execute(totals_query(periodo).group_by(periodo).order_by(periodo)).all()
+        ]
+    if not top:
+        return summary
+    unidades = func.sum(models.VentaItem.cantidad).label("unidades")
+    summary["top_productos"] = [
+        {"product_id": r.product_id, "unidades": int(r.unidades), "ingresos": float(r.ingresos)}
+        for r in db.execute(
+            select(
+                models.VentaItem.product_id,
+                unidades,
+                func.sum(models.VentaItem.cantidad * models.VentaItem.precio_unitario).label("ingresos"),
+            )
+            .join(models.Venta, models.Venta.id == models.VentaItem.venta_id)
+            .where(*filters)
+            .group_by(models.VentaItem.product_id)
+            .order_by(unidades.desc(), models.VentaItem.product_id)
+            .limit(top)
+        ).all()
+    ]
+    return summary
+
+
+def _rollup_summary(db, admin, date_from, date_to, bucket, top):
+    import api_server
+    return api_server.get_sales_summary(date_from, date_to, bucket, top, db, admin)
+
+
+def _differences(scan: dict, rolled: dict) -> list:
+    """Qué no coincide entre los dos resúmenes (los ingresos con tolerancia de centavos por redondeo)."""
+    def same(a, b):
+        return all(abs(a[k] - b[k]) < 0.01 if k == "ingresos" else a[k] == b[k] for k in a if k != "nombre")
+
+    problems = []
+    if not same(scan["totales"], rolled["totales"]):
+        problems.append(f"totales {scan['totales']} != {rolled['totales']}")
+    if len(scan["buckets"]) != len(rolled["buckets"]) or not all(
+            same(a, b) for a, b in zip(scan["buckets"], rolled["buckets"])):
+        problems.append("buckets distintos")
+    if not all(same(a, b) for a, b in zip(scan["top_productos"], rolled["top_productos"])):
+        problems.append("top de productos distinto")
+    return problems
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def _checkouts(n: int, users: int, products: int, seed_value: int) -> int:
+    """n compras de 1 a 3 productos por la API (add_to_cart + checkout_cart). Devuelve cuántas salieron."""
+    from fastapi import HTTPException
+    import api_server
+    from database import SessionLocal
+
+    rng = random.Random(seed_value)
+    done = 0
+    for _ in range(n):
+        user = api_server.CurrentUser(id=rng.randint(2, users + 1), email="", nombre_completo=None, is_admin=False)
+        db = SessionLocal()
+        try:
+            for product_id in rng.sample(range(1, products + 1), rng.randint(1, 3)):
+                api_server.add_to_cart(api_server.CartItemCreate(product_id=product_id, cantidad=rng.randint(1, 3)),
+                                       db, user)
+            api_server.checkout_cart(db, user)
+            done += 1
+        except HTTPException:
+            db.rollback()
+        finally:
+            db.close()
+    return done
+
+
+def run(sales: int, args) -> dict:
+    from benchmarks.seed import seed
+    import api_server
+    import rollups
+    from database import SessionLocal, engine
+
+    seed(engine, args.users, args.products, sales, days=args.days, seed_value=args.seed)
+    t0 = time.perf_counter()
+    days_with_sales = rollups.backfill(engine, batch_days=args.batch_days)
+    backfill_s = time.perf_counter() - t0
+
+    admin = api_server.CurrentUser(id=1, email="", nombre_completo=None, is_admin=True)
+    today = date.today()
+    last_30 = (today - timedelta(days=30), today + timedelta(days=1))
+    # caso: (desde, hasta, bucket, top); 'panel' es lo que pide main.py (solo totales)
+    cases = {
+        "panel": (None, None, None, 0),
+        "todo": (None, None, "month", 5),
+        "30_dias": (*last_30, "month", 5),
+    }
+    db = SessionLocal()
+    timings, problems = {}, []
+    try:
+        for name, params in cases.items():
+            scan = lambda: _scan_summary(db, *params)
+            rolled = lambda: _rollup_summary(db, admin, *params)
+            timings[name] = {"escaneo_ms": _median_ms(scan, args.repeat), "rollups_ms": _median_ms(rolled, args.repeat)}
+            problems += [f"{name}: {p}" for p in _differences(scan(), rolled())]
+    finally:
+        db.close()
+
+    # Compras nuevas: los resúmenes se mantienen en cada checkout
+    bought = _checkouts(args.checkouts, args.users, args.products, args.seed)
+    db = SessionLocal()
+    try:
+        for name, (date_from, date_to) in {"todo": (None, None), "30_dias": last_30}.items():
+            scan = _scan_summary(db, date_from, date_to, "day", 5)
+            rolled = _rollup_summary(db, admin, date_from, date_to, "day", 5)
+            problems += [f"{name} tras {bought} compras: {p}" for p in _differences(scan, rolled)]
+    finally:
+        db.close()
+    return {"sales": sales, "days_with_sales": days_with_sales, "backfill_s": round(backfill_s, 2),
+            "timings": timings, "checkouts": bought, "problems": problems}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sales", type=int, nargs="+", default=[10_000, 100_000], help="Tamaños de histórico")
+    parser.add_argument("--days", type=int, default=1095, help="Las ventas se reparten en los últimos N días")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--batch-days", type=int, default=31, help="Días por transacción del backfill")
+    parser.add_argument("--checkouts", type=int, default=50, help="Compras por la API antes de la verificación final")
+    parser.add_argument("--repeat", type=int, default=20, help="Ejecuciones de cada resumen")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", default=None,
+                        help="Base de pruebas (por defecto un SQLite temporal); ¡se borran sus tablas!")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        from database import engine
+
+        results = [run(sales, args) for sales in args.sales]
+        dialect = engine.dialect.name
+        engine.dispose()
+
+    if args.json:
+        print(json.dumps({"database": dialect, "results": results}, indent=2, ensure_ascii=False))
+    else:
+        print(f"DB: {dialect}  días de histórico: {args.days}  productos: {args.products}")
+        print(f"{'ventas':>8} {'backfill s':>10} {'caso':>8} {'escaneo ms':>11} {'rollups ms':>11} {'x':>7}")
+        for r in results:
+            for name, t in r["timings"].items():
+                speedup = t["escaneo_ms"] / t["rollups_ms"] if t["rollups_ms"] else float("inf")
+                print(f"{r['sales']:>8} {r['backfill_s']:>10} {name:>8} {t['escaneo_ms']:>11} "
+                      f"{t['rollups_ms']:>11} {speedup:>7.1f}")
+            status = "OK" if not r["problems"] else "; ".join(r["problems"])
+            print(f"{'':>8} {r['checkouts']} compras por la API, resúmenes vs escaneo: {status}")
+
+    if any(r["problems"] for r in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
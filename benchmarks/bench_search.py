@@ -0,0 +1,142 @@
+"""
+Benchmark del índice de búsqueda de productos (search_index.py).
+
+Genera un catálogo sintético de N productos de ropa (nombres y
+descripciones en español, con acentos), arma el índice y mide la latencia
+de una mezcla de consultas: palabra exacta, prefijo mientras se escribe,
+varias palabras y sin acentos. Con --compare-like mide también las mismas
+consultas como LIKE '%...%' sobre una tabla SQLite en memoria.
+
+Uso:
+    python -m benchmarks.bench_search --products 100000 --repeat 200 --compare-like
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+
+from benchmarks.bench_login import percentile
+
+PRENDAS = ["Camisa", "Camiseta", "Pantalón", "Pantaloneta", "Falda", "Vestido", "Chaqueta", "Chamarra",
+           "Suéter", "Sudadera", "Blusa", "Short", "Bermuda", "Abrigo", "Gabardina", "Chaleco",
+           "Polo", "Jersey", "Cárdigan", "Overol", "Leggings", "Pijama", "Bufanda", "Gorra",
+           "Calcetines", "Tenis", "Zapatos", "Botas", "Sandalias", "Cinturón"]
+MATERIALES = ["algodón", "lino", "lana", "mezclilla", "poliéster", "seda", "cuero", "pana",
+              "franela", "gamuza", "licra", "nylon", "viscosa", "terciopelo", "punto"]
+COLORES = ["blanca", "negra", "azul", "roja", "verde", "gris", "beige", "café", "morada",
+           "rosa", "amarilla", "naranja", "turquesa", "vino", "marino", "crema", "mostaza",
+           "oliva", "coral", "lavanda"]
+ESTILOS = ["clásica", "casual", "deportiva", "slim", "oversize", "vintage", "básica", "elegante",
+           "urbana", "térmica", "impermeable", "ligera", "acolchada", "estampada", "lisa"]
+MARCAS = [f"Marca{i}" for i in range(200)]
+FRASES = ["ideal para verano", "perfecta para el invierno", "cómoda para todos los días",
+          "corte moderno y ajuste cómodo", "tela suave y transpirable", "fácil de combinar",
+          "resistente al uso diario", "diseño exclusivo de temporada", "lavable en lavadora",
+          "confort para tus pies", "acabado premium", "edición limitada"]
+
+QUERIES = [
+    "camisa",               # palabra exacta (muy común)
+    "pantalon",             # sin acento
+    "pant",                 # prefijo mientras se escribe
+    "c",                    # prefijo de una letra (muchas expansiones)
+    "chaqueta azul",        # dos palabras
+    "camisa lino blanca",   # tres palabras
+    "sueter lana gr",       # prefijo al final
+    "marca17",              # término raro
+    "mezclilla slim negra",
+    "invierno",             # solo en descripción
+]
+
+
+def generate_products(n: int, seed: int = 1):
+    rng = random.Random(seed)
+    for product_id in range(1, n + 1):
+        nombre = f"{rng.choice(PRENDAS)} {rng.choice(ESTILOS)} de {rng.choice(MATERIALES)} {rng.choice(COLORES)} {rng.choice(MARCAS)}"
+        descripcion = f"{rng.choice(PRENDAS)} de {rng.choice(MATERIALES)}, {rng.choice(FRASES)}. {rng.choice(FRASES).capitalize()}."
+        yield product_id, nombre, descripcion
+
+
+def bench_index(products: list, queries: list, repeat: int, limit: int) -> dict:
+    from search_index import ProductSearchIndex
+
+    index = ProductSearchIndex()
+    t0 = time.perf_counter()
+    index.build(products)
+    build_s = time.perf_counter() - t0
+
+    per_query = {}
+    for q in queries:
+        index.search(q, limit)  # primera vez: ordena las listas que use (queda en caché)
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            hits = index.search(q, limit)
+            times.append((time.perf_counter() - t0) * 1000)
+        per_query[q] = {"hits": len(hits), "p50_ms": round(percentile(times, 50), 3),
+                        "p99_ms": round(percentile(times, 99), 3)}
+
+    # Actualizaciones incrementales (como los endpoints de admin)
+    t0 = time.perf_counter()
+    for product_id, nombre, descripcion in products[:1000]:
+        index.add(product_id, nombre + " edición", descripcion)
+    update_ms = (time.perf_counter() - t0) * 1000 / 1000
+    return {"build_s": round(build_s, 3), "update_ms_avg": round(update_ms, 4), "queries": per_query}
+
+
+def bench_like(products: list, queries: list, repeat: int, limit: int) -> dict:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, nombre TEXT, descripcion TEXT)")
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?)", products)
+    per_query = {}
+    for q in queries:
+        # Lo que haría un buscador con LIKE: cada palabra en nombre o descripción
+        words = q.split()
+        where = " AND ".join("(nombre LIKE ? OR descripcion LIKE ?)" for _ in words)
+        params = [p for w in words for p in (f"%{w}%", f"%{w}%")]
+        sql = f"SELECT id FROM products WHERE {where} LIMIT {limit}"
+        times = []
+        for _ in range(max(1, repeat // 10)):
+            t0 = time.perf_counter()
+            rows = conn.execute(sql, params).fetchall()
+            times.append((time.perf_counter() - t0) * 1000)
+        per_query[q] = {"hits": len(rows), "p50_ms": round(percentile(times, 50), 3),
+                        "p99_ms": round(percentile(times, 99), 3)}
+    conn.close()
+    return {"queries": per_query}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200, help="Repeticiones de cada consulta")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--compare-like", action="store_true", help="Medir también LIKE '%%...%%' en SQLite")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+
+    products = list(generate_products(args.products))
+    results = {"products": args.products, "limit": args.limit, "index": bench_index(products, QUERIES, args.repeat, args.limit)}
+    if args.compare_like:
+        results["like"] = bench_like(products, QUERIES, args.repeat, args.limit)
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    index = results["index"]
+    print(f"Productos: {args.products}  índice armado en {index['build_s']}s  "
+          f"actualización: {index['update_ms_avg']} ms/producto")
+    header = f"{'consulta':>24} {'hits':>5} {'p50 ms':>8} {'p99 ms':>8}"
+    if args.compare_like:
+        header += f" {'LIKE p50 ms':>12}"
+    print(header)
+    for q, r in index["queries"].items():
+        line = f"{q:>24} {r['hits']:>5} {r['p50_ms']:>8} {r['p99_ms']:>8}"
+        if args.compare_like:
+            line += f" {results['like']['queries'][q]['p50_ms']:>12}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compara dos resultados de benchmarks.load_test (--output) y marca las regresiones.
+
+Por operación muestra p50/p95/p99, req/s y consultas por request de antes
+y después. Es regresión si:
+  - el p95 o el p99 empeora más de --threshold por ciento (y más de
+    --min-ms milisegundos, para no saltar por ruido en lo que ya es rápido),
+  - aumentan las consultas SQL por request (un N+1 nuevo), o
+  - aparecen errores 5xx que antes no estaban.
+
+Sale con código 1 si hay alguna regresión (para usarlo en CI / antes de desplegar).
+
+Uso:
+    python -m benchmarks.compare antes.json despues.json --threshold 15
+"""
+import argparse
+import json
+import sys
+
+
+def _pct(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(before: dict, after: dict, threshold: float, min_ms: float) -> tuple:
+    """Devuelve (filas para la tabla, lista de regresiones)."""
+    rows, regressions = [], []
+    names = list(before["endpoints"]) + [n for n in after["endpoints"] if n not in before["endpoints"]]
+    for name in names:
+        old = before["endpoints"].get(name)
+        new = after["endpoints"].get(name)
+        if old is None or new is None:
+            rows.append((name, old, new, {}))
+            continue
+        deltas = {key: _pct(old[key], new[key]) for key in ("p50_ms", "p95_ms", "p99_ms", "rps")}
+        for key in ("p95_ms", "p99_ms"):
+            if deltas[key] is not None and deltas[key] > threshold and new[key] - old[key] > min_ms:
+                regressions.append(f"{name}: {key} {old[key]} -> {new[key]} (+{deltas[key]:.0f}%)")
+        old_q, new_q = old.get("queries_per_request"), new.get("queries_per_request")
+        if old_q is not None and new_q is not None and new_q > old_q + 0.5:
+            regressions.append(f"{name}: consultas por request {old_q} -> {new_q}")
+        if new["errors_5xx"] and not old["errors_5xx"]:
+            regressions.append(f"{name}: {new['errors_5xx']} errores 5xx (antes 0)")
+        rows.append((name, old, new, deltas))
+    return rows, regressions
+
+
+def _fmt(value, delta=None):
+    if value is None:
+        return "-"
+    text = f"{value}"
+    if delta is not None:
+        text += f" ({delta:+.0f}%)"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=15, help="Porcentaje de empeoramiento tolerado en p95/p99")
+    parser.add_argument("--min-ms", type=float, default=2, help="Diferencia mínima en ms para contar como regresión")
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    for label, result in (("antes", before), ("después", after)):
+        meta = result.get("meta", {})
+        print(f"{label:>8}: commit {meta.get('commit')}  {meta.get('database')}/{meta.get('mode')}  "
+              f"concurrencia {meta.get('concurrency')}  {result['rps']} req/s")
+    if before.get("meta", {}).get("concurrency") != after.get("meta", {}).get("concurrency"):
+        print("¡Ojo! Las corridas no usan la misma concurrencia: la comparación no es directa.")
+
+    rows, regressions = compare(before, after, args.threshold, args.min_ms)
+    print(f"{'operación':>12} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'req/s':>16} {'consultas':>12}")
+    for name, old, new, deltas in rows:
+        if old is None or new is None:
+            print(f"{name:>12}  solo en {'después' if old is None else 'antes'}")
+            continue
+        queries = f"{_fmt(old.get('queries_per_request'))}->{_fmt(new.get('queries_per_request'))}"
+        print(f"{name:>12} {_fmt(new['p50_ms'], deltas['p50_ms']):>18} {_fmt(new['p95_ms'], deltas['p95_ms']):>18} "
+              f"{_fmt(new['p99_ms'], deltas['p99_ms']):>18} {_fmt(new['rps'], deltas['rps']):>16} {queries:>12}")
+
+    if regressions:
+        print("\nRegresiones:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\nSin regresiones.")
+
+
+if __name__ == "__main__":
+    main()
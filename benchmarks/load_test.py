@@ -0,0 +1,384 @@
+"""
+Prueba de carga de la API con una mezcla de operaciones realista.
+
+1. Siembra una base de pruebas (benchmarks/seed.py): por defecto un SQLite
+   temporal; con --database-url, p.ej. un MySQL local de pruebas (¡se
+   borran sus tablas!).
+2. Levanta 'api_server.app' contra esa base:
+     - en este mismo proceso (httpx + ASGITransport, con el lifespan), o
+     - con --spawn, un uvicorn aparte (HTTP de verdad, --workers N).
+   Con --url se usa un servidor que ya está corriendo (no se siembra nada:
+   tiene que apuntar a una base sembrada con benchmarks.seed).
+3. 'concurrency' usuarios virtuales (cada uno con su login) repiten
+   operaciones elegidas al azar según --mix durante --duration segundos:
+   login, catálogo, página, búsqueda, añadir/cambiar en el carrito,
+   checkout y ventas del admin.
+
+Reporta throughput, p50/p95/p99 por operación y las consultas SQL por
+request (leídas de GET /metrics antes y después). Con --output guarda el
+JSON para compararlo entre commits con benchmarks.compare.
+
+Uso:
+    python -m benchmarks.load_test --users 500 --products 2000 --sales 20000 \\
+        --concurrency 32 --duration 30 --output resultados.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.bench_login import percentile
+from benchmarks.seed import ADMIN_EMAIL, BENCH_PASSWORD, user_email
+
+# Operación -> (método, plantilla de la ruta en /metrics)
+OPERATIONS = {
+    "login": ("POST", "/api/login"),
+    "catalog": ("GET", "/api/products"),
+    "page": ("GET", "/api/products/page"),
+    "search": ("GET", "/api/products/search"),
+    "cart_add": ("POST", "/api/cart/add"),
+    "cart_update": ("PUT", "/api/cart/update/{product_id}"),
+    "checkout": ("POST", "/api/cart/checkout"),
+    "admin_sales": ("GET", "/api/admin/sales"),
+}
+DEFAULT_MIX = "login=3,catalog=20,page=15,search=10,cart_add=20,cart_update=12,checkout=10,admin_sales=10"
+SEARCH_WORDS = ["camisa", "pant", "chaqueta azul", "sueter", "lino", "vestido negro", "bot", "algodon blanca"]
+
+_METRIC_RE = re.compile(r'^(http_request_db_queries|http_request_db_seconds_total)(_sum|_count)?'
+                        r'\{method="([^"]*)",route="([^"]*)"\} ([0-9.eE+-]+)$')
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise SystemExit(f"Operación desconocida en --mix: {name!r} (válidas: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_db_metrics(text: str) -> dict:
+    """{(método, ruta): {"queries": suma, "requests": cantidad, "db_s": segundos}} desde GET /metrics."""
+    data = {}
+    for line in text.splitlines():
+        match = _METRIC_RE.match(line)
+        if not match:
+            continue
+        name, suffix, method, route, value = match.groups()
+        entry = data.setdefault((method, route), {"queries": 0.0, "requests": 0.0, "db_s": 0.0})
+        if name == "http_request_db_seconds_total":
+            entry["db_s"] = float(value)
+        elif suffix == "_sum":
+            entry["queries"] = float(value)
+        elif suffix == "_count":
+            entry["requests"] = float(value)
+    return data
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.statuses = {name: {} for name in OPERATIONS}
+        self.exceptions = {name: 0 for name in OPERATIONS}
+        self.recording = False
+
+    def record(self, name: str, seconds: float, status: int | None):
+        if not self.recording:
+            return
+        if status is None:
+            self.exceptions[name] += 1
+            return
+        self.latencies[name].append(seconds)
+        self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+
+
+class VirtualUser:
+    """Un cliente: su propio token y lo que cree que tiene en el carrito."""
+
+    def __init__(self, client, index: int, products: int, admin_headers: dict, stats: Stats, rng: random.Random):
+        self.client = client
+        self.email = user_email(index)
+        self.products = products
+        self.admin_headers = admin_headers
+        self.stats = stats
+        self.rng = rng
+        self.headers = {}
+        self.cart = set()
+
+    async def call(self, name: str, method: str, url: str, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.stats.record(name, time.perf_counter() - t0, None)
+            return None
+        self.stats.record(name, time.perf_counter() - t0, response.status_code)
+        return response
+
+    async def login(self):
+        response = await self.call("login", "POST", "/api/login",
+                                   data={"username": self.email, "password": BENCH_PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def run(self, name: str):
+        if name == "login" or not self.headers:
+            await self.login()
+        elif name == "catalog":
+            await self.call(name, "GET", "/api/products", headers=self.headers)
+        elif name == "page":
+            params = {"limit": 50}
+            if self.rng.random() < 0.5:
+                params["after"] = self.rng.randint(1, self.products)
+            await self.call(name, "GET", "/api/products/page", params=params, headers=self.headers)
+        elif name == "search":
+            await self.call(name, "GET", "/api/products/search",
+                            params={"q": self.rng.choice(SEARCH_WORDS)}, headers=self.headers)
+        elif name == "cart_add" or (name in ("cart_update", "checkout") and not self.cart):
+            product_id = self.rng.randint(1, self.products)
+            response = await self.call("cart_add", "POST", "/api/cart/add", headers=self.headers,
+                                       json={"product_id": product_id, "cantidad": 1})
+            if response is not None and response.status_code == 200:
+                self.cart.add(product_id)
+        elif name == "cart_update":
+            product_id = self.rng.choice(sorted(self.cart))
+            await self.call(name, "PUT", f"/api/cart/update/{product_id}", headers=self.headers,
+                            json={"product_id": product_id, "cantidad": self.rng.randint(1, 3)})
+        elif name == "checkout":
+            response = await self.call(name, "POST", "/api/cart/checkout", headers=self.headers)
+            if response is not None and response.status_code == 200:
+                self.cart.clear()
+        elif name == "admin_sales":
+            await self.call(name, "GET", "/api/admin/sales", params={"limit": 100}, headers=self.admin_headers)
+
+
+async def drive(client, args, mix: dict) -> dict:
+    """Corre la carga sobre 'client' y devuelve los resultados."""
+    stats = Stats()
+    names, weights = list(mix), list(mix.values())
+
+    response = await client.post("/api/login", data={"username": ADMIN_EMAIL, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    admin_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    metrics_headers = {"Authorization": f"Bearer {os.environ['METRICS_TOKEN']}"} if os.getenv("METRICS_TOKEN") else {}
+
+    vus = [VirtualUser(client, i % max(args.users, 1), args.products, admin_headers, stats,
+                       random.Random(args.seed + i)) for i in range(args.concurrency)]
+    await asyncio.gather(*(vu.login() for vu in vus))
+
+    async def loop(vu: VirtualUser, until: float):
+        while time.perf_counter() < until:
+            await vu.run(vu.rng.choices(names, weights)[0])
+
+    if args.warmup > 0:
+        until = time.perf_counter() + args.warmup
+        await asyncio.gather(*(loop(vu, until) for vu in vus))
+
+    before = parse_db_metrics((await client.get("/metrics", headers=metrics_headers)).text)
+    stats.recording = True
+    t0 = time.perf_counter()
+    until = t0 + args.duration
+    await asyncio.gather(*(loop(vu, until) for vu in vus))
+    elapsed = time.perf_counter() - t0
+    stats.recording = False
+    after = parse_db_metrics((await client.get("/metrics", headers=metrics_headers)).text)
+
+    endpoints = {}
+    total_requests = 0
+    for name, (method, route) in OPERATIONS.items():
+        latencies = [s * 1000 for s in stats.latencies[name]]
+        statuses = stats.statuses[name]
+        count = len(latencies) + stats.exceptions[name]
+        if not count:
+            continue
+        total_requests += count
+        new = after.get((method, route), {"queries": 0.0, "requests": 0.0, "db_s": 0.0})
+        old = before.get((method, route), {"queries": 0.0, "requests": 0.0, "db_s": 0.0})
+        served = new["requests"] - old["requests"]
+        endpoints[name] = {
+            "method": method,
+            "route": route,
+            "requests": count,
+            "rps": round(count / elapsed, 2),
+            "ok": sum(n for status, n in statuses.items() if status < 400),
+            "rejected_4xx": sum(n for status, n in statuses.items() if 400 <= status < 500),
+            "errors_5xx": sum(n for status, n in statuses.items() if status >= 500) + stats.exceptions[name],
+            "statuses": {str(status): n for status, n in sorted(statuses.items())},
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies, default=0.0), 2),
+            # Con varios workers de uvicorn /metrics es de uno solo: es una muestra, igual sirve el promedio
+            "queries_per_request": round((new["queries"] - old["queries"]) / served, 2) if served else None,
+            "db_ms_per_request": round((new["db_s"] - old["db_s"]) * 1000 / served, 3) if served else None,
+        }
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": total_requests,
+        "rps": round(total_requests / elapsed, 2),
+        "errors_5xx": sum(e["errors_5xx"] for e in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+
+async def run_in_process(args, mix: dict) -> dict:
+    import httpx
+    import api_server
+
+    app = api_server.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await drive(client, args, mix)
+
+
+async def run_remote(args, mix: dict, url: str) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        return await drive(client, args, mix)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_server(url: str, process: subprocess.Popen, timeout: float = 60):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("uvicorn terminó antes de arrancar")
+        try:
+            httpx.get(f"{url}/", timeout=1).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit("uvicorn no respondió a tiempo")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict):
+    meta = results["meta"]
+    print(f"Commit {meta['commit']}  DB: {meta['database']}  modo: {meta['mode']}  "
+          f"concurrencia: {meta['concurrency']}  duración: {results['elapsed_s']}s")
+    print(f"Total: {results['requests']} requests, {results['rps']} req/s, {results['errors_5xx']} errores 5xx")
+    print(f"{'operación':>12} {'reqs':>6} {'req/s':>7} {'4xx':>5} {'5xx':>4} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'consultas':>9} {'db ms':>7}")
+    for name, e in results["endpoints"].items():
+        queries = "-" if e["queries_per_request"] is None else e["queries_per_request"]
+        db_ms = "-" if e["db_ms_per_request"] is None else e["db_ms_per_request"]
+        print(f"{name:>12} {e['requests']:>6} {e['rps']:>7} {e['rejected_4xx']:>5} {e['errors_5xx']:>4} "
+              f"{e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8} {queries:>9} {db_ms:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--sales", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=16, help="Usuarios virtuales en paralelo")
+    parser.add_argument("--duration", type=float, default=20, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=3, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Pesos de cada operación: nombre=peso,...")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", default=None,
+                        help="Base de pruebas (por defecto un SQLite temporal); ¡se borran sus tablas!")
+    parser.add_argument("--spawn", action="store_true", help="Levantar un uvicorn aparte en vez de ASGI en proceso")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn con --spawn")
+    parser.add_argument("--url", default=None, help="Servidor ya corriendo (no se siembra la base)")
+    parser.add_argument("--output", default=None, help="Archivo donde guardar el JSON de resultados")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    # Que el pool de conexiones no sea el cuello de botella de la prueba
+    os.environ.setdefault("DB_POOL_SIZE", str(args.concurrency))
+    # Un login por usuario virtual al arrancar: que no choquen con el límite de la cola de bcrypt
+    os.environ.setdefault("PASSWORD_QUEUE_LIMIT", str(args.concurrency * 2))
+    # Sin logs de requests lentos durante la prueba (salvo que se pida otro umbral)
+    os.environ.setdefault("SLOW_REQUEST_MS", "60000")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        mode = "remote" if args.url else ("uvicorn" if args.spawn else "asgi")
+        dialect = None
+        if not args.url:
+            os.environ["DATABASE_URL"] = database_url
+            from database import engine
+            from benchmarks.seed import seed
+            t0 = time.perf_counter()
+            counts = seed(engine, args.users, args.products, args.sales, seed_value=args.seed)
+            dialect = engine.dialect.name
+            print(f"Base sembrada en {time.perf_counter() - t0:.1f}s: {counts}", file=sys.stderr)
+
+        if args.url:
+            results = asyncio.run(run_remote(args, mix, args.url.rstrip("/")))
+        elif args.spawn:
+            port = _free_port()
+            url = f"http://127.0.0.1:{port}"
+            process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(args.workers), "--no-access-log", "--log-level", "warning"],
+                env=dict(os.environ),
+            )
+            try:
+                _wait_for_server(url, process)
+                results = asyncio.run(run_remote(args, mix, url))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        else:
+            results = asyncio.run(run_in_process(args, mix))
+
+    results["meta"] = {
+        "commit": _git_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "database": dialect or "remote",
+        "python": platform.python_version(),
+        "cores": os.cpu_count(),
+        "users": args.users,
+        "products": args.products,
+        "sales": args.sales,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "workers": args.workers if args.spawn else 1,
+        "mix": mix,
+        "seed": args.seed,
+    }
+    results = {"meta": results.pop("meta"), **results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
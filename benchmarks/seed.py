@@ -0,0 +1,108 @@
+"""
+Generador de datos para benchmarks: N usuarios, M productos y K ventas históricas.
+
+¡Borra y vuelve a crear las tablas de la base indicada! Usar solo con
+bases de prueba (un SQLite temporal o un MySQL local de pruebas).
+
+Todos los usuarios tienen la misma contraseña (BENCH_PASSWORD), con un
+solo hash de bcrypt para no tardar minutos en sembrar. Los emails son
+user{i}@bench.local (i desde 0) y el admin es admin@bench.local.
+
+Uso:
+    python -m benchmarks.seed --database-url sqlite:///bench.db --users 1000 --products 5000 --sales 50000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "admin@bench.local"
+CHUNK = 5000
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.local"
+
+
+def _chunks(rows, size=CHUNK):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed(engine, users: int, products: int, sales: int, stock: int = 10_000,
+         days: int = 365, seed_value: int = 1) -> dict:
+    """Recrea el esquema y lo llena (resúmenes diarios incluidos). Devuelve cuántas filas quedaron en cada tabla."""
+    from sqlalchemy import insert
+    import migrations
+    import models
+    import rollups
+    import security
+    from benchmarks.bench_search import generate_products
+
+    rng = random.Random(seed_value)
+    migrations.drop_all(engine)
+    migrations.upgrade(engine)
+
+    hashed = security.get_password_hash(BENCH_PASSWORD)
+    user_rows = [{"id": 1, "email": ADMIN_EMAIL, "nombre_completo": "Admin Bench",
+                  "hashed_password": hashed, "is_admin": True}]
+    user_rows += [
+        {"id": i + 2, "email": user_email(i), "nombre_completo": f"Usuario {i}",
+         "hashed_password": hashed, "is_admin": False, "ciudad": rng.choice(["San José", "Heredia", "Cartago", "Alajuela"])}
+        for i in range(users)
+    ]
+    product_rows = [
+        {"id": product_id, "nombre": nombre[:100], "descripcion": descripcion,
+         "precio": round(rng.uniform(5, 150), 2), "stock": stock, "reservado": 0, "imagen_url": None}
+        for product_id, nombre, descripcion in generate_products(products, seed_value)
+    ]
+    prices = {row["id"]: row["precio"] for row in product_rows}
+
+    now = datetime.now().replace(microsecond=0)
+    venta_rows, item_rows = [], []
+    for venta_id in range(1, sales + 1):
+        lines = rng.sample(range(1, products + 1), min(products, rng.randint(1, 4)))
+        total = 0.0
+        for product_id in lines:
+            cantidad = rng.randint(1, 3)
+            total += cantidad * prices[product_id]
+            item_rows.append({"venta_id": venta_id, "product_id": product_id, "cantidad": cantidad,
+                              "precio_unitario": prices[product_id]})
+        venta_rows.append({"id": venta_id, "user_id": rng.randint(2, users + 1) if users else 1,
+                           "total": round(total, 2),
+                           "fecha": now - timedelta(seconds=rng.randint(0, days * 86400))})
+
+    with engine.begin() as conn:
+        for table, rows in ((models.User, user_rows), (models.Product, product_rows),
+                            (models.Venta, venta_rows), (models.VentaItem, item_rows)):
+            for chunk in _chunks(rows):
+                conn.execute(insert(table), chunk)
+        # Las ventas entran directo, sin checkout: los resúmenes diarios se calculan aparte
+        rollups.rebuild(conn)
+    return {"users": len(user_rows), "products": len(product_rows),
+            "ventas": len(venta_rows), "venta_items": len(item_rows)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="Base de pruebas: ¡se borran sus tablas!")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--sales", type=int, default=50_000)
+    parser.add_argument("--stock", type=int, default=10_000, help="Stock inicial de cada producto")
+    parser.add_argument("--days", type=int, default=365, help="Las ventas se reparten en los últimos N días")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from database import engine
+
+    t0 = time.perf_counter()
+    counts = seed(engine, args.users, args.products, args.sales, args.stock, args.days, args.seed)
+    print(f"Sembrado en {time.perf_counter() - t0:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
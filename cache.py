@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+# Respuesta ya serializada junto con su ETag (hash fuerte de los bytes)
+CachedBody = namedtuple("CachedBody", ["body", "etag"])
+
+
+def make_etag(body: bytes) -> str:
+    """ETag fuerte (entre comillas, como pide HTTP) calculado a partir de los bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class TTLCache:
+    """
+    Caché LRU en memoria con expiración por tiempo (TTL).
+    - max_entries: número máximo de entradas (se expulsa la menos usada)
+    - ttl: segundos que vive cada entrada
+    Es segura entre hilos y lleva contadores de aciertos/fallos.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Devuelve el valor guardado o None si no existe / expiró."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        """Guarda un valor (opcionalmente con un TTL propio)."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[1] if entry else None
+
+    def remove_where(self, predicate) -> int:
+        """Elimina las entradas cuyo valor cumpla 'predicate'. Devuelve cuántas borró."""
+        with self._lock:
+            keys = [k for k, (_, v) in self._data.items() if predicate(v)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CatalogCache:
+    """
+    Caché versionada del catálogo de productos.
+
+    Guarda las respuestas ya serializadas (bytes JSON + ETag) indexadas por
+    (versión, variante de la consulta). Cada escritura del catálogo llama a
+    'bump()', que incrementa la versión: las entradas viejas dejan de ser
+    alcanzables y se terminan expulsando por LRU/TTL.
+
+    La caché vive en el proceso: con varios workers de uvicorn cada uno
+    tiene la suya, por eso el TTL acota cuánto puede tardar un worker en
+    ver un cambio hecho en otro.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 30.0):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        """Invalida el catálogo (llamar después de cada commit que lo modifique)."""
+        with self._lock:
+            self._version += 1
+            return self._version
+
+    def get(self, variant) -> CachedBody | None:
+        return self._entries.get((self._version, variant))
+
+    def set(self, variant, body: bytes, version: int) -> CachedBody:
+        """
+        Guarda 'body' para la versión con la que se leyó de la DB. Si el
+        catálogo cambió mientras tanto, la entrada queda huérfana y no se sirve.
+        """
+        cached = CachedBody(body, make_etag(body))
+        self._entries.set((version, variant), cached)
+        return cached
+
+    def stats(self) -> dict:
+        data = self._entries.stats()
+        data["version"] = self._version
+        return data
+
+
+catalog_cache = CatalogCache(
+    max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "128")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "30")),
+)
+
+# token -> usuario autenticado (ver get_current_user en api_server.py)
+user_cache = TTLCache(
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)
@@ -0,0 +1,246 @@
+import os
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from network_worker import API_URL
+from request_executor import submit
+
+# Tiempo sin cambios antes de mandar las cantidades nuevas al servidor (ms)
+CART_DEBOUNCE_MS = int(os.getenv("CART_DEBOUNCE_MS", "400"))
+
+
+class CartStore(QObject):
+    """
+    Estado local del carrito para VentanaCarrito.
+
+    - Los cambios (cantidad / eliminar) se aplican al instante en el estado
+      local y la vista se entera por señales por fila: no se reconstruye todo.
+    - Los cambios de cantidad esperan CART_DEBOUNCE_MS sin cambios: girar el
+      spin de 1 a 8 manda un solo cambio con el 8. Todo lo pendiente sale
+      junto en un POST /api/cart/batch.
+    - Los lotes salen de a uno, en orden; cada respuesta trae el carrito
+      completo, que se compara con lo que se muestra y solo se emiten las
+      filas que cambiaron.
+    - Si el servidor rechaza un cambio, esa fila vuelve al último valor que
+      confirmó el servidor (rollback) y se emite sync_failed.
+    """
+    row_inserted = pyqtSignal(int, dict)   # posición, item
+    row_updated = pyqtSignal(dict)         # item (se identifica por product_id)
+    row_removed = pyqtSignal(int)          # product_id
+    changed = pyqtSignal()                 # después de cada cambio (total, avisos de stock...)
+    loaded = pyqtSignal()                  # llegó la primera foto del servidor
+    load_failed = pyqtSignal(str)
+    sync_failed = pyqtSignal(str)          # una mutación falló y se deshizo
+    syncing_changed = pyqtSignal(bool)     # hay cambios locales sin confirmar
+
+    def __init__(self, debounce_ms: int = CART_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.token = None
+        self._server = {}       # product_id -> item, última foto confirmada por el servidor
+        self._items = {}        # product_id -> item, lo que se muestra (servidor + cambios locales)
+        self._wanted = {}       # product_id -> cantidad pedida aún sin confirmar (0 = eliminar)
+        self._queue = []        # product_ids listos para mandar (ya pasó el debounce)
+        self._inflight = None   # {product_id: cantidad} del lote en curso
+        self._mutations = 0     # cuenta de mutaciones enviadas (para descartar GETs viejos)
+        self._loaded = False
+        self._syncing = False
+        self._after_sync = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self.flush)
+
+    # --- Lectura ---
+
+    def items(self) -> list:
+        return list(self._items.values())
+
+    def total(self) -> float:
+        return sum(i["cantidad"] * i["precio_unitario"] for i in self._items.values())
+
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def is_syncing(self) -> bool:
+        return bool(self._wanted) or self._inflight is not None
+
+    def stock_conflicts(self) -> list:
+        """Items cuya cantidad supera el stock disponible."""
+        return [i for i in self._items.values() if i["cantidad"] > (i.get("stock") or 0)]
+
+    # --- Carga ---
+
+    def set_token(self, token: str):
+        if token != self.token:
+            # Otro usuario: nada de lo que había sirve
+            self._timer.stop()
+            self._server, self._wanted, self._queue = {}, {}, []
+            self._inflight = None
+            self._after_sync = []
+            self._loaded = False
+            self._refresh()
+        self.token = token
+
+    def fetch(self):
+        """Pide el carrito (GET condicional). Si mientras tanto se envió una mutación, la respuesta se ignora."""
+        mutations = self._mutations
+        request = submit(
+            f"{API_URL}/api/cart", "GET_AUTH", token=self.token,
+            conditional=True, channel=f"carrito-{id(self)}"
+        )
+        request.success.connect(lambda cart: self._on_fetched(cart, mutations))
+        request.not_modified.connect(lambda cart: self._on_fetched(cart, mutations, not_modified=True))
+        request.failure.connect(self.load_failed.emit)
+
+    def _on_fetched(self, cart: dict, mutations: int, not_modified: bool = False):
+        if not_modified and self._loaded:
+            return
+        if mutations == self._mutations:
+            self._apply_snapshot(cart)
+        if not self._loaded:
+            self._loaded = True
+            self.loaded.emit()
+
+    # --- Cambios locales ---
+
+    def set_quantity(self, product_id: int, cantidad: int):
+        """Cambio optimista de cantidad; se envía cuando pasa el debounce."""
+        if product_id not in self._items or cantidad <= 0:
+            return
+        self._wanted[product_id] = cantidad
+        self._refresh()
+        self._update_syncing()
+        self._timer.start()
+
+    def remove(self, product_id: int):
+        """Quita la fila ya y manda el DELETE (junto con lo que estuviera esperando el debounce)."""
+        if product_id not in self._items:
+            return
+        self._wanted[product_id] = 0
+        self._refresh()
+        self.flush()
+
+    def flush(self):
+        """Manda ya los cambios pendientes, sin esperar el debounce."""
+        self._timer.stop()
+        for product_id in self._wanted:
+            if product_id not in self._queue:
+                self._queue.append(product_id)
+        self._pump()
+
+    def when_synced(self, callback):
+        """
+        Llama a callback cuando el servidor haya confirmado todos los cambios
+        (en el momento si no hay nada pendiente). Si algún cambio falla, no se llama.
+        """
+        if not self.is_syncing():
+            callback()
+            return
+        self._after_sync.append(callback)
+        self.flush()
+
+    # --- Envío ---
+
+    def _pump(self):
+        """Manda en un solo POST /api/cart/batch todo lo que está en cola (si no hay un lote en vuelo)."""
+        if self._inflight is None and self._queue:
+            ops = {}
+            for product_id in self._queue:
+                cantidad = self._wanted.get(product_id)
+                if cantidad is None:
+                    continue
+                confirmed = self._server.get(product_id)
+                if confirmed is None or confirmed["cantidad"] == cantidad:
+                    # Volvió al valor del servidor (ej. 3 -> 4 -> 3) o la fila ya no
+                    # existe allí: no hay nada que mandar
+                    del self._wanted[product_id]
+                    continue
+                ops[product_id] = cantidad
+            self._queue = []
+            if ops:
+                self._send(ops)
+        self._update_syncing()
+
+    def _send(self, ops: dict):
+        self._inflight = ops
+        self._mutations += 1
+        batch = {
+            "atomic": False,   # un cambio rechazado no debe deshacer los demás
+            "ops": [
+                {"op": "remove", "product_id": product_id} if cantidad == 0
+                else {"op": "set", "product_id": product_id, "cantidad": cantidad}
+                for product_id, cantidad in ops.items()
+            ],
+        }
+        request = submit(f"{API_URL}/api/cart/batch", "POST_AUTH", batch, token=self.token)
+        token = self.token
+        request.success.connect(lambda response: self._on_sent(token, response))
+        request.failure.connect(lambda error: self._on_send_failed(token, error))
+
+    def _settle(self, ops: dict):
+        """Olvida los cambios que ya respondió el servidor (salvo que el usuario haya vuelto a cambiarlos)."""
+        for product_id, cantidad in ops.items():
+            if self._wanted.get(product_id) == cantidad:
+                del self._wanted[product_id]
+
+    def _on_sent(self, token: str, response: dict):
+        if token != self.token or self._inflight is None:
+            return
+        ops, self._inflight = self._inflight, None
+        self._settle(ops)
+        # Las operaciones rechazadas quedan con el valor del servidor (rollback)
+        errors = [r["error"] for r in response.get("results", []) if not r["ok"]]
+        if errors:
+            self._after_sync = []
+        self._apply_snapshot(response["cart"])
+        if errors:
+            self.sync_failed.emit("\n".join(errors))
+        self._pump()
+
+    def _on_send_failed(self, token: str, error: str):
+        if token != self.token or self._inflight is None:
+            return
+        ops, self._inflight = self._inflight, None
+        # Rollback: las filas del lote vuelven a lo que dice el servidor
+        self._settle(ops)
+        self._after_sync = []
+        self._refresh()
+        self.sync_failed.emit(error)
+        self._pump()
+
+    def _update_syncing(self):
+        syncing = self.is_syncing()
+        if syncing != self._syncing:
+            self._syncing = syncing
+            self.syncing_changed.emit(syncing)
+        if not syncing and self._after_sync:
+            callbacks, self._after_sync = self._after_sync, []
+            for callback in callbacks:
+                callback()
+
+    # --- Diff servidor / vista ---
+
+    def _apply_snapshot(self, cart: dict):
+        self._server = {item["product_id"]: item for item in cart.get("items", [])}
+        self._refresh()
+
+    def _refresh(self):
+        """Recalcula lo que se muestra (servidor + cambios locales) y emite solo las filas que cambiaron."""
+        items = {}
+        for product_id, item in self._server.items():
+            cantidad = self._wanted.get(product_id, item["cantidad"])
+            if cantidad == 0:
+                continue
+            items[product_id] = item if cantidad == item["cantidad"] else {**item, "cantidad": cantidad}
+
+        old = self._items
+        self._items = items
+        for product_id in old:
+            if product_id not in items:
+                self.row_removed.emit(product_id)
+        for position, (product_id, item) in enumerate(items.items()):
+            if product_id not in old:
+                self.row_inserted.emit(position, item)
+            elif old[product_id] != item:
+                self.row_updated.emit(item)
+        self.changed.emit()
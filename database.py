@@ -1,18 +1,174 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Integer, cast, create_engine, event, exc, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# --- Configuración del pool de conexiones (por proceso/worker) ---
+# pool_size + max_overflow debería cubrir API_THREADPOOL_SIZE (api_server.py):
+# cada hilo que atiende una petición usa como mucho una conexión.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))     # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # < wait_timeout de MySQL
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)          # evita "MySQL server has gone away"
+
+
+class PoolStats:
+    """Contadores del pool alimentados por los eventos de SQLAlchemy."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.waits,
+                "wait_ms_total": round(self.wait_total * 1000, 3),
+                "wait_ms_avg": round(self.wait_total * 1000 / self.waits, 3) if self.waits else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto tarda cada petición en obtener una conexión."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:")):
+        # SQLite en memoria: una única conexión compartida (para pruebas locales)
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    return options
 
 
 # 'create_engine' es el punto de entrada a la base de datos
-engine = create_engine(os.getenv("DATABASE_URL"))
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.incr("connects")
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.incr("checkouts")
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_stats.incr("checkins")
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr("invalidations")
+
+def pool_status() -> dict:
+    """Estado actual del pool + contadores acumulados (para /api/admin/db-pool)."""
+    pool = engine.pool
+    data = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": DB_MAX_OVERFLOW,
+            "timeout_s": DB_POOL_TIMEOUT,
+            "recycle_s": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+        })
+    data.update(pool_stats.snapshot())
+    return data
+
+# --- Helpers de SQL que dependen del motor (MySQL en producción, SQLite en local) ---
+
+# Formato de cada "bucket" de fechas para agrupar ventas. Las semanas son ISO
+# 8601 en los dos motores (lunes a domingo; el año es el de su jueves, así
+# el 2024-12-30 cae en '2025-W01').
+_BUCKET_FORMATS = {
+    "mysql": {"day": "%Y-%m-%d", "week": "%x-W%v", "month": "%Y-%m"},
+    "sqlite": {"day": "%Y-%m-%d", "month": "%Y-%m"},
+}
+
+def _sqlite_iso_week(column):
+    """
+    Semana ISO en SQLite ('%G-W%V' recién existe desde SQLite 3.46): se toma
+    el jueves de la semana de 'column', y su año y su día del año dan la
+    etiqueta.
+    """
+    thursday = func.date(column, "-3 days", "weekday 4")
+    return func.printf("%s-W%02d", func.strftime("%Y", thursday),
+                       (cast(func.strftime("%j", thursday), Integer) - 1) // 7 + 1)
+
+def date_bucket(column, bucket: str, dialect_name: str):
+    """Expresión SQL que convierte 'column' (DateTime) en la etiqueta del periodo: '2025-01-31', '2025-W05', '2025-01'."""
+    if dialect_name == "sqlite":
+        if bucket == "week":
+            return _sqlite_iso_week(column)
+        return func.strftime(_BUCKET_FORMATS["sqlite"][bucket], column)
+    return func.date_format(column, _BUCKET_FORMATS["mysql"][bucket])
 
 # 'SessionLocal' es la clase que usaremos para crear "sesiones" (conexiones)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # 'Base' es una clase base de la cual heredarán todos nuestros modelos (tablas)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
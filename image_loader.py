@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+import requests
+from PyQt6.QtCore import QObject, QRunnable, QStandardPaths, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+
+from network_worker import http_request
+
+# --- Configuración del cargador de imágenes ---
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "4"))                 # descargas simultáneas
+IMAGE_MEMORY_ITEMS = int(os.getenv("IMAGE_MEMORY_ITEMS", "512"))     # QPixmaps escalados en memoria
+# Si el servidor de imágenes no manda Cache-Control/Expires, cuánto se
+# considera "fresca" la copia en disco antes de revalidarla (segundos)
+IMAGE_DEFAULT_MAX_AGE = int(os.getenv("IMAGE_DEFAULT_MAX_AGE", str(24 * 3600)))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", "10"))
+
+
+def default_cache_dir() -> str:
+    """~/.cache/app_tienda_ropa/images (o el equivalente del sistema operativo)."""
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericCacheLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "app_tienda_ropa", "images")
+
+
+class DiskImageCache:
+    """
+    Copia en disco de cada imagen descargada: '<sha1(url)>.img' con los bytes
+    y '<sha1(url)>.json' con los validadores HTTP (ETag / Last-Modified) y
+    hasta cuándo se puede usar sin preguntarle al servidor.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".img"), os.path.join(self.directory, key + ".json")
+
+    def load(self, url: str):
+        """Devuelve (bytes, meta) o (None, None) si no hay copia."""
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def store(self, url: str, data: bytes | None, meta: dict):
+        """Guarda bytes (si vienen) y metadatos; se escribe a un temporal y se renombra."""
+        data_path, meta_path = self._paths(url)
+        if data is not None:
+            self._write_atomic(data_path, data)
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: str, content: bytes):
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+
+def _freshness(headers) -> float:
+    """Segundos que la respuesta puede usarse sin revalidar (Cache-Control > Expires > default)."""
+    cache_control = headers.get("Cache-Control", "")
+    for directive in cache_control.split(","):
+        directive = directive.strip().lower()
+        if directive in ("no-cache", "no-store"):
+            return 0
+        if directive.startswith("max-age="):
+            try:
+                return max(0, int(directive.split("=", 1)[1]))
+            except ValueError:
+                pass
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0.0, parsedate_to_datetime(expires).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return 0
+    return IMAGE_DEFAULT_MAX_AGE
+
+
+def fetch_image_bytes(url: str, disk: DiskImageCache) -> bytes | None:
+    """
+    Bytes de la imagen, pasando por la caché en disco:
+      - copia fresca -> se usa sin tocar la red
+      - copia vencida -> GET condicional (If-None-Match / If-Modified-Since);
+        con 304 solo se renueva la fecha de vencimiento
+      - sin red -> se usa la copia vieja si existe
+    """
+    data, meta = disk.load(url)
+    now = time.time()
+    if data is not None and meta.get("fresh_until", 0) > now:
+        return data
+
+    headers = {}
+    if data is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        response = http_request("GET", url, headers=headers, timeout=IMAGE_TIMEOUT)
+    except requests.exceptions.RequestException:
+        return data
+
+    if response.status_code == 304 and data is not None:
+        meta["fresh_until"] = now + _freshness(response.headers)
+        disk.store(url, None, meta)
+        return data
+    if response.status_code != 200:
+        return data
+
+    meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fresh_until": now + _freshness(response.headers),
+    }
+    if "no-store" not in response.headers.get("Cache-Control", "").lower():
+        disk.store(url, response.content, meta)
+    return response.content
+
+
+class _LoaderSignals(QObject):
+    # url, {ancho: QImage} (vacío si falló)
+    done = pyqtSignal(str, dict)
+
+
+class _ImageJob(QRunnable):
+    """Descarga/lee de disco una URL, la decodifica y la escala a los anchos pedidos (fuera del hilo de la UI)."""
+
+    def __init__(self, url: str, widths: set, disk: DiskImageCache, signals: _LoaderSignals):
+        super().__init__()
+        self.url = url
+        self.widths = widths
+        self.disk = disk
+        self.signals = signals
+
+    def run(self):
+        images = {}
+        try:
+            data = fetch_image_bytes(self.url, self.disk)
+            image = QImage()
+            if data and image.loadFromData(data):
+                for width in self.widths:
+                    images[width] = image.scaledToWidth(width, Qt.TransformationMode.SmoothTransformation)
+        except Exception as e:
+            print(f"[ImageLoader] Error cargando {self.url}: {e}")
+        self.signals.done.emit(self.url, images)
+
+
+class ImageLoader(QObject):
+    """
+    Cargador de imágenes de productos para la UI.
+
+    - pixmap(url, width): devuelve el QPixmap ya escalado si está en memoria;
+      si no, lo pide en segundo plano y devuelve None (la vista pinta un
+      placeholder y lo reemplaza cuando llega 'image_ready').
+    - Las descargas corren en un QThreadPool acotado (IMAGE_WORKERS) y las
+      peticiones repetidas a la misma URL mientras se descarga se juntan en una.
+    - Memoria: LRU de QPixmaps por (url, ancho). Disco: DiskImageCache, así que
+      al reabrir la app las imágenes salen del disco sin usar la red.
+    """
+    image_ready = pyqtSignal(str)   # url (ya hay pixmaps en memoria para ella)
+
+    def __init__(self, cache_dir: str | None = None, max_workers: int = IMAGE_WORKERS,
+                 memory_items: int = IMAGE_MEMORY_ITEMS, parent=None):
+        super().__init__(parent)
+        self.disk = DiskImageCache(cache_dir or default_cache_dir())
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.memory_items = memory_items
+        self._memory = OrderedDict()    # (url, ancho) -> QPixmap
+        self._pending = {}              # url -> anchos pedidos mientras se descarga
+        self._failed = set()            # urls que no se pudieron cargar en esta sesión
+        self._signals = _LoaderSignals()
+        self._signals.done.connect(self._on_done)
+
+    def pixmap(self, url: str, width: int) -> QPixmap | None:
+        """QPixmap escalado a 'width' o None (y se encarga la carga)."""
+        if not url:
+            return None
+        key = (url, width)
+        pixmap = self._memory.get(key)
+        if pixmap is not None:
+            self._memory.move_to_end(key)
+            return pixmap
+        self.request(url, width)
+        return None
+
+    def request(self, url: str, width: int):
+        if url in self._failed:
+            return
+        if url in self._pending:
+            self._pending[url].add(width)   # ya se está descargando: solo sumamos el ancho
+            return
+        self._pending[url] = {width}
+        # El job recibe una copia: los anchos que se pidan mientras tanto se resuelven en _on_done
+        self.pool.start(_ImageJob(url, {width}, self.disk, self._signals))
+
+    def is_failed(self, url: str) -> bool:
+        return url in self._failed
+
+    def _on_done(self, url: str, images: dict):
+        widths = self._pending.pop(url, set())
+        if not images:
+            self._failed.add(url)
+        for width, image in images.items():
+            self._remember((url, width), QPixmap.fromImage(image))
+        # Un ancho pedido después de que el job ya escaló: se pide de nuevo (saldrá del disco)
+        missing = widths - set(images) if images else set()
+        for width in missing:
+            self.request(url, width)
+        self.image_ready.emit(url)
+
+    def _remember(self, key, pixmap: QPixmap):
+        self._memory[key] = pixmap
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def bind_label(self, label, url: str, width: int, placeholder: str = "(Cargando imagen...)"):
+        """
+        Muestra la imagen en un QLabel: placeholder ahora y el pixmap cuando
+        llegue. Si el label ya se destruyó para entonces, no pasa nada.
+        """
+        pixmap = self.pixmap(url, width)
+        if pixmap is not None:
+            label.setPixmap(pixmap)
+            return
+        if self.is_failed(url):
+            label.setText("(Sin imagen)")
+            return
+        label.setText(placeholder)
+
+        def swap(ready_url):
+            if ready_url != url:
+                return
+            try:
+                self.image_ready.disconnect(swap)
+            except TypeError:
+                pass
+            try:
+                pixmap = self._memory.get((url, width))
+                if pixmap is not None:
+                    label.setPixmap(pixmap)
+                elif self.is_failed(url):
+                    label.setText("(Sin imagen)")
+            except RuntimeError:
+                pass  # el QLabel fue eliminado (se refrescó la pantalla)
+
+        self.image_ready.connect(swap)
+
+
+_image_loader = None
+
+def get_image_loader() -> ImageLoader:
+    """Instancia compartida (se crea al primer uso, con la QApplication ya creada)."""
+    global _image_loader
+    if _image_loader is None:
+        _image_loader = ImageLoader()
+    return _image_loader
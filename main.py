@@ -1,18 +1,23 @@
-from datetime import datetime
 import sys
-import requests
-import json
 import re
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QLabel, QVBoxLayout, QWidget, 
-    QLineEdit, QPushButton, QMessageBox, QFormLayout, QStackedWidget, QScrollArea, QFrame, QHBoxLayout, QSpinBox
+    QLineEdit, QPushButton, QMessageBox, QFormLayout, QStackedWidget, QScrollArea, QFrame, QHBoxLayout, QSpinBox,
+    QTableView, QHeaderView, QAbstractItemView
 )
-from PyQt6.QtCore import QObject, QThread, pyqtSignal,Qt
-from PyQt6.QtGui import QPixmap
-import urllib.request
+from PyQt6.QtCore import pyqtSignal,Qt
 
-from network_worker import NetworkWorker, API_URL  # moved here
-from admin_productos import VentanaAdminProductos  # keep after NetworkWorker import
+from network_worker import API_URL  # moved here
+from request_executor import submit, Priority
+from admin_productos import VentanaAdminProductos  # keep after network_worker import
+from image_loader import get_image_loader
+from cart_store import CartStore
+from qt_models import SalesTableModel, SalesRowDelegate, ProductListModel, ProductCardDelegate, ProductGridView
+
+# Ventas por página en el panel de administración
+SALES_PAGE_SIZE = 100
+# Productos por página en las grillas de la tienda
+PRODUCTS_PAGE_SIZE = 60
 
 # --- Página de la Tienda (Placeholder) ---
 
@@ -27,8 +32,6 @@ class VentanaAdminVentas(QWidget):
     def __init__(self):
         super().__init__()
         self.api_token = None
-        self.thread = None
-        self.worker = None
 
         # Layout principal
         main_layout = QVBoxLayout(self)
@@ -61,19 +64,30 @@ class VentanaAdminVentas(QWidget):
         self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         main_layout.addWidget(self.info_label)
         
-        # --- Área de Scroll para Ventas ---
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFrameShape(QFrame.Shape.NoFrame)
-        main_layout.addWidget(scroll_area)
-        
-        # Widget contenedor para las ventas
-        self.sales_widget = QWidget()
-        scroll_area.setWidget(self.sales_widget)
-        
-        # Layout para la lista de ventas
-        self.sales_layout = QVBoxLayout(self.sales_widget)
-        self.sales_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        # --- Tabla de Ventas (modelo/vista) ---
+        # Solo se pintan las filas visibles y las páginas siguientes se piden
+        # al hacer scroll hasta el final (SalesTableModel.fetchMore).
+        self.sales_model = SalesTableModel(page_size=SALES_PAGE_SIZE, parent=self)
+        self.sales_model.loading_changed.connect(self.on_loading_changed)
+        self.sales_model.load_failed.connect(self.on_fetch_failure)
+
+        self.sales_view = QTableView()
+        self.sales_view.setModel(self.sales_model)
+        self.sales_view.setItemDelegate(SalesRowDelegate(self.sales_view))
+        self.sales_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.sales_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.sales_view.setAlternatingRowColors(True)
+        self.sales_view.setWordWrap(False)
+        self.sales_view.verticalHeader().hide()
+        # Alto fijo: la vista no mide cada fila para calcular el scroll
+        self.sales_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.sales_view.verticalHeader().setDefaultSectionSize(SalesRowDelegate.ROW_HEIGHT)
+        header = self.sales_view.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(SalesTableModel.COL_ITEMS, QHeaderView.ResizeMode.Stretch)
+        header.setSortIndicator(SalesTableModel.COL_FECHA, Qt.SortOrder.DescendingOrder)
+        self.sales_view.setSortingEnabled(True)
+        main_layout.addWidget(self.sales_view)
         
     def set_token(self, token: str):
         """Recibe el token y pide las ventas."""
@@ -81,18 +95,28 @@ class VentanaAdminVentas(QWidget):
         print(f"VentanaAdmin: Token recibido. Pidiendo ventas...")
         self.fetch_sales()
 
-    def update_summary(self, sales_list: list):
-        """Actualiza el resumen de ventas."""
-        if not sales_list:
+    def fetch_summary(self):
+        """Pide el resumen de ventas (calculado en el servidor con SQL)."""
+        request = submit(
+            f"{API_URL}/api/admin/sales/summary?top=0",
+            "GET_AUTH",
+            token=self.api_token,
+            priority=Priority.BACKGROUND,       # no es algo que el usuario pidió
+            channel=f"ventas-resumen-{id(self)}"  # un resumen nuevo descarta el anterior
+        )
+        request.success.connect(self.update_summary)
+        request.failure.connect(lambda _: self.summary_label.hide())
+
+    def update_summary(self, summary: dict):
+        """Actualiza el resumen de ventas con la respuesta de /api/admin/sales/summary."""
+        totales = summary.get("totales", {})
+        total_ventas = totales.get("ventas", 0)
+        if not total_ventas:
             self.summary_label.hide()
             return
 
-        total_ventas = len(sales_list)
-        total_dinero = sum(sale['total'] for sale in sales_list)
-        total_productos = sum(
-            sum(item['cantidad'] for item in sale['items']) 
-            for sale in sales_list
-        )
+        total_dinero = totales.get("ingresos", 0.0)
+        total_productos = totales.get("unidades", 0)
         
         self.summary_label.setText(
             f"📊 Resumen de Ventas:\n"
@@ -103,115 +127,97 @@ class VentanaAdminVentas(QWidget):
         self.summary_label.show()
 
     def fetch_sales(self):
-        """Inicia el hilo de red para buscar las ventas."""
+        """Recarga el resumen y la tabla de ventas desde la primera página."""
         self.info_label.setText("Cargando ventas...")
         self.info_label.show() # Muestra "Cargando..."
-        
-        # Limpia ventas antiguas (si las hubiera)
-        while self.sales_layout.count():
-            child = self.sales_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        
-        # Configura el hilo y el worker
-        self.thread = QThread()
-        # ¡Usamos el método GET_AUTH y pasamos el token de admin!
-        self.worker = NetworkWorker(
-            f"{API_URL}/api/admin/sales", 
-            "GET_AUTH", 
-            token=self.api_token
-        )
-        self.worker.moveToThread(self.thread)
-
-        # Conecta señales
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_fetch_success)
-        self.worker.failure.connect(self.on_fetch_failure)
-        
-        # Limpieza
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
-
-    def on_fetch_success(self, sales_list: list):
-        """Se llama cuando la API devuelve la lista de ventas."""
-        self.info_label.hide()
-        
-        # Update summary first
-        self.update_summary(sales_list)
-        
-        if not sales_list:
-            self.info_label.setText("No se han encontrado ventas registradas.")
+        self.fetch_summary()
+        self.sales_model.set_token(self.api_token)
+        self.sales_model.reload()
+
+    def on_loading_changed(self, loading: bool):
+        """El modelo empezó/terminó de pedir una página."""
+        self.refresh_button.setEnabled(not loading)
+        if loading:
+            self.info_label.setText("Cargando ventas...")
             self.info_label.show()
             return
+        count = self.sales_model.rowCount()
+        if count == 0:
+            self.info_label.setText("No se han encontrado ventas registradas.")
+        elif self.sales_model.has_more():
+            self.info_label.setText(f"Mostrando {count} ventas (baja para cargar más)")
+        else:
+            self.info_label.setText(f"Mostrando las {count} ventas")
+        self.info_label.show()
 
-        # Limpia ventas antiguas
-        while self.sales_layout.count():
-            child = self.sales_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        # Create frames for each sale
-        for sale in sales_list:
-            sale_frame = QFrame()
-            sale_frame.setFrameShape(QFrame.Shape.StyledPanel)
-            sale_frame.setStyleSheet("""
-                QFrame {
-                    background-color: white;
-                    border-radius: 8px;
-                    border: 1px solid #ccc;
-                    margin: 2px;
-                }
-            """)
-            
-            frame_layout = QVBoxLayout(sale_frame)
-            
-            # Format sale information
-            try:
-                sale_datetime = datetime.strptime(sale['fecha'], '%Y-%m-%dT%H:%M:%S.%f')
-            except ValueError:
-                try:
-                    sale_datetime = datetime.strptime(sale['fecha'], '%Y-%m-%d %H:%M:%S')
-                except:
-                    sale_datetime = None
-
-            fecha_formateada = sale_datetime.strftime('%Y-%m-%d %H:%M') if sale_datetime else sale['fecha']
-            
-            header_text = (
-                f"<b>Venta #{sale['id']}</b> | Cliente #{sale['user_id']} | {fecha_formateada}"
-            )
-            header_label = QLabel(header_text)
-            header_label.setStyleSheet("padding: 5px;")
-            frame_layout.addWidget(header_label)
-            
-            # Items section
-            items_text = []
-            for item in sale['items']:
-                items_text.append(
-                    f"• {item['cantidad']}x Producto #{item['product_id']} "
-                    f"(${item['precio_unitario']:.2f} c/u)"
-                )
-            
-            items_label = QLabel("\n".join(items_text))
-            items_label.setStyleSheet("padding: 5px; color: #555;")
-            frame_layout.addWidget(items_label)
-            
-            # Total
-            total_label = QLabel(f"<b>Total: ${sale['total']:.2f}</b>")
-            total_label.setAlignment(Qt.AlignmentFlag.AlignRight)
-            total_label.setStyleSheet("padding: 5px; color: #2ecc71;")
-            frame_layout.addWidget(total_label)
-            
-            self.sales_layout.addWidget(sale_frame)
-            
     def on_fetch_failure(self, error_message):
         """Se llama si la API falla."""
         self.info_label.setText(f"Error al cargar ventas: {error_message}")
         self.info_label.show()
         QMessageBox.critical(self, "Error de Red", error_message)
 
+class CartRow(QFrame):
+    """Una línea del carrito. Se crea una vez y después solo se actualiza (update_item)."""
+    quantity_changed = pyqtSignal(int, int)   # product_id, cantidad
+    remove_requested = pyqtSignal(int)        # product_id
+
+    def __init__(self, item: dict):
+        super().__init__()
+        self.product_id = item["product_id"]
+        self.item = None
+        self.setFrameShape(QFrame.Shape.Box)
+        fl = QHBoxLayout(self)
+
+        # --- Mostrar imagen si hay URL (se carga en segundo plano, una sola vez por fila) ---
+        if item.get("imagen_url"):
+            img_label = QLabel()
+            #añadir estilos a la imagen    
+            img_label.setStyleSheet("""
+                QLabel {
+                    border: 2px solid #bdc3c7;
+                    border-radius: 4px;
+                    padding: 4px;
+                    background-color: white;
+                }
+            """)
+            img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            img_label.setMinimumWidth(90)
+            get_image_loader().bind_label(img_label, item["imagen_url"], 80)
+            fl.addWidget(img_label)
+        # --- Fin imagen ---
+
+        self.name = QLabel()
+        fl.addWidget(self.name)
+
+        self.spin = QSpinBox()
+        self.spin.setMinimum(1)
+        fl.addWidget(self.spin)
+
+        remove_btn = QPushButton("Eliminar")
+        fl.addWidget(remove_btn)
+
+        # El spin aplica el cambio directamente (el CartStore junta los cambios seguidos en un POST /api/cart/batch)
+        self.spin.valueChanged.connect(lambda value: self.quantity_changed.emit(self.product_id, value))
+        remove_btn.clicked.connect(lambda: self.remove_requested.emit(self.product_id))
+
+        self.update_item(item)
+
+    def update_item(self, item: dict):
+        """Refresca solo lo que cambió, sin volver a emitir quantity_changed."""
+        previous, self.item = self.item, item
+        if previous is None or (previous.get("nombre"), previous["precio_unitario"]) != (item.get("nombre"), item["precio_unitario"]):
+            self.name.setText(f"{item.get('nombre','Producto')} ( ${item['precio_unitario']:.2f} )")
+        # Usar stock provisto por la API para limitar la cantidad máxima
+        stock_available = item.get("stock", 9999) or 0
+        maximum = max(1, stock_available)
+        value = min(item["cantidad"], maximum)
+        if self.spin.maximum() != maximum or self.spin.value() != value:
+            self.spin.blockSignals(True)
+            self.spin.setMaximum(maximum)
+            self.spin.setValue(value)
+            self.spin.blockSignals(False)
+
+
 class VentanaCarrito(QWidget):
     """Página del carrito de compras (Funcional)."""
     go_to_store = pyqtSignal()
@@ -219,9 +225,18 @@ class VentanaCarrito(QWidget):
     def __init__(self):
         super().__init__()
         self.api_token = None
-        # Lista para mantener referencias a threads activos
-        self.active_threads = []
-        self.active_workers = []
+
+        # Estado local del carrito: los cambios se ven al instante y se sincronizan en segundo plano
+        self.store = CartStore(parent=self)
+        self.store.row_inserted.connect(self.on_row_inserted)
+        self.store.row_updated.connect(self.on_row_updated)
+        self.store.row_removed.connect(self.on_row_removed)
+        self.store.changed.connect(self.refresh_footer)
+        self.store.loaded.connect(self.refresh_footer)
+        self.store.syncing_changed.connect(lambda _: self.refresh_footer())
+        self.store.load_failed.connect(self.on_fetch_cart_failure)
+        self.store.sync_failed.connect(lambda e: QMessageBox.critical(self, "Error", e))
+        self.rows = {}   # product_id -> CartRow
 
         layout = QVBoxLayout(self)
         title = QLabel("MI CARRITO")
@@ -236,6 +251,7 @@ class VentanaCarrito(QWidget):
         self.scroll.setWidgetResizable(True)
         self.scroll_widget = QWidget()
         self.scroll_layout = QVBoxLayout(self.scroll_widget)
+        self.scroll_layout.addStretch()
         self.scroll.setWidget(self.scroll_widget)
         layout.addWidget(self.scroll)
 
@@ -250,6 +266,7 @@ class VentanaCarrito(QWidget):
         self.total_label = QLabel("Total: $0.00")
         footer.addWidget(self.total_label)
         self.checkout_btn = QPushButton("Finalizar Compra")
+        self.checkout_btn.setEnabled(False)
         self.checkout_btn.clicked.connect(self.handle_checkout)
         footer.addWidget(self.checkout_btn)
         self.back_button = QPushButton("Volver")
@@ -272,147 +289,54 @@ class VentanaCarrito(QWidget):
 
     def set_token(self, token: str):
         self.api_token = token
+        self.store.set_token(token)
         self.fetch_cart()
 
-    def cleanup_threads(self):
-        """Limpia threads completados de la lista (sin tocar workers eliminados)."""
-        # Sólo mantenemos threads que aún están corriendo.
-        self.active_threads = [t for t in self.active_threads if t.isRunning()]
-
-    def start_network_operation(self, url: str, method: str, data: dict = None):
-        """Helper para iniciar operaciones de red manteniendo referencias."""
-        self.cleanup_threads()
-        
-        thread = QThread()
-        worker = NetworkWorker(url, method, data=data, token=self.api_token)
-        
-        # Guardamos referencias
-        self.active_threads.append(thread)
-        self.active_workers.append(worker)
-        
-        worker.moveToThread(thread)
-        thread.started.connect(worker.run)
-
-        # Cuando el worker termine: cerramos el thread, removemos worker de la lista y borramos worker.
-        def _on_worker_finished(w=worker):
-            # remover worker de la lista de forma segura
-            try:
-                if w in self.active_workers:
-                    self.active_workers.remove(w)
-            except Exception:
-                pass
-
-        worker.finished.connect(_on_worker_finished)
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-
-        # Cuando el thread termine: removemos el thread de la lista (si existe) y lo liberamos.
-        def _on_thread_finished(t=thread):
-            try:
-                if t in self.active_threads:
-                    self.active_threads.remove(t)
-            except Exception:
-                pass
-
-        thread.finished.connect(lambda: _on_thread_finished())
-        thread.finished.connect(thread.deleteLater)
-        
-        return thread, worker
+    def start_network_operation(self, url: str, method: str, data: dict = None, conditional: bool = False, channel: str = None):
+        """Helper: envía la petición del carrito por el ejecutor compartido."""
+        return submit(url, method, data=data, token=self.api_token, conditional=conditional, channel=channel)
 
     def fetch_cart(self):
-        """Obtiene contenido del carrito."""
-        self.info_label.setText("Cargando carrito...")
-        # Limpia UI
-        while self.scroll_layout.count():
-            child = self.scroll_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        thread, worker = self.start_network_operation(
-            f"{API_URL}/api/cart", 
-            "GET_AUTH"
-        )
-        worker.success.connect(self.on_fetch_cart_success)
-        worker.failure.connect(self.on_fetch_cart_failure)
-        thread.start()
-
-    def on_fetch_cart_success(self, cart_data):
-        self.info_label.hide()
-        items = cart_data.get("items", [])
-        total = cart_data.get("total", 0.0)
-        self.total_label.setText(f"Total: ${total:.2f}")
-
-        # Reset warning / checkout default
-        self.warning_label.hide()
-        self.checkout_btn.setEnabled(False)
-
-        if not items:
-            self.scroll_layout.addWidget(QLabel("El carrito está vacío."))
+        """Obtiene contenido del carrito (si no cambió, el servidor responde 304 y no se toca nada)."""
+        if not self.store.is_loaded():
+            self.info_label.setText("Cargando carrito...")
+            self.info_label.show()
+        self.store.fetch()
+
+    # --- Filas: se parchean según lo que emite el CartStore ---
+
+    def on_row_inserted(self, position: int, item: dict):
+        row = CartRow(item)
+        row.quantity_changed.connect(self.store.set_quantity)
+        row.remove_requested.connect(self.store.remove)
+        self.rows[item["product_id"]] = row
+        self.scroll_layout.insertWidget(position, row)
+
+    def on_row_updated(self, item: dict):
+        row = self.rows.get(item["product_id"])
+        if row is not None:
+            row.update_item(item)
+
+    def on_row_removed(self, product_id: int):
+        row = self.rows.pop(product_id, None)
+        if row is not None:
+            self.scroll_layout.removeWidget(row)
+            row.deleteLater()
+
+    def refresh_footer(self):
+        """Total, aviso de stock y botón de compra según el estado local."""
+        self.total_label.setText(f"Total: ${self.store.total():.2f}")
+        if not self.store.is_loaded():
             return
-
-        stock_ok = True
-
-        for ci in items:
-            frame = QFrame()
-            frame.setFrameShape(QFrame.Shape.Box)
-            fl = QHBoxLayout(frame)
-
-            # --- Mostrar imagen si hay URL ---
-            if ci.get("imagen_url"):
-                try:
-                    data = urllib.request.urlopen(ci["imagen_url"]).read()
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(data)
-                    img_label = QLabel()
-                    img_label.setPixmap(pixmap.scaledToWidth(80))
-                    fl.addWidget(img_label)
-                    #añadir estilos a la imagen    
-                    img_label.setStyleSheet("""
-                        QLabel {
-                            border: 2px solid #bdc3c7;
-                            border-radius: 4px;
-                            padding: 4px;
-                            background-color: white;
-                        }
-                    """)
-
-                    img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                except Exception:
-                    fl.addWidget(QLabel("(Sin imagen)"))
-                    
-
-                 
-              
-            # --- Fin imagen ---
-
-            name = QLabel(f"{ci.get('nombre','Producto')} ( ${ci['precio_unitario']:.2f} )")
-            fl.addWidget(name)
-
-            spin = QSpinBox()
-            spin.setMinimum(1)
-            # Usar stock provisto por la API para limitar la cantidad máxima
-            stock_available = ci.get("stock", 9999) or 0
-            spin.setMaximum(max(1, stock_available))
-            spin.setValue(min(ci["cantidad"], max(1, stock_available)))
-            fl.addWidget(spin)
-
-            # Detect stock conflict
-            if ci["cantidad"] > stock_available:
-                stock_ok = False
-
-            update_btn = QPushButton("Actualizar")
-            remove_btn = QPushButton("Eliminar")
-            fl.addWidget(update_btn)
-            fl.addWidget(remove_btn)
-
-            # Conexiones con closures capturando product_id y spin
-            update_btn.clicked.connect(lambda _, pid=ci["product_id"], s=spin: self.update_cart_item(pid, s.value()))
-            remove_btn.clicked.connect(lambda _, pid=ci["product_id"]: self.remove_cart_item(pid))
-
-            self.scroll_layout.addWidget(frame)
+        items = self.store.items()
+        if not items:
+            self.info_label.setText("El carrito está vacío.")
+            self.info_label.show()
+        else:
+            self.info_label.hide()
 
         # Si algún item excede stock, mostrar advertencia y deshabilitar checkout
-        if not stock_ok:
+        if self.store.stock_conflicts():
             self.warning_label.setText("Algunos items superan el stock disponible. Actualiza las cantidades.")
             self.warning_label.show()
             self.checkout_btn.setEnabled(False)
@@ -423,36 +347,11 @@ class VentanaCarrito(QWidget):
 
     def on_fetch_cart_failure(self, error_message):
         self.info_label.setText(f"Error: {error_message}")
+        self.info_label.show()
         QMessageBox.critical(self, "Error al cargar carrito", error_message)
 
-    def update_cart_item(self, product_id: int, cantidad: int):
-        """Actualiza cantidad de un item."""
-        if cantidad <= 0:
-            QMessageBox.warning(self, "Cantidad inválida", "La cantidad debe ser mayor que 0.")
-            return
-
-        data = {"product_id": product_id, "cantidad": cantidad}
-        thread, worker = self.start_network_operation(
-            f"{API_URL}/api/cart/update/{product_id}",
-            "PUT_AUTH",
-            data=data
-        )
-        worker.success.connect(lambda _: self.fetch_cart())
-        worker.failure.connect(lambda e: QMessageBox.critical(self, "Error", e))
-        thread.start()
-
-    def remove_cart_item(self, product_id: int):
-        """Elimina un item del carrito."""
-        thread, worker = self.start_network_operation(
-            f"{API_URL}/api/cart/remove/{product_id}",
-            "DELETE_AUTH"
-        )
-        worker.success.connect(lambda _: self.fetch_cart())
-        worker.failure.connect(lambda e: QMessageBox.critical(self, "Error", e))
-        thread.start()
-
     def handle_checkout(self):
-        """Finaliza la compra."""
+        """Finaliza la compra (después de que el servidor confirme los cambios pendientes)."""
         if QMessageBox.question(
             self, 
             "Confirmar", 
@@ -460,39 +359,32 @@ class VentanaCarrito(QWidget):
         ) != QMessageBox.StandardButton.Yes:
             return
 
-        thread, worker = self.start_network_operation(
+        self.checkout_btn.setEnabled(False)
+        self.store.when_synced(self.send_checkout)
+
+    def send_checkout(self):
+        request = self.start_network_operation(
             f"{API_URL}/api/cart/checkout",
             "POST_AUTH"
         )
-        worker.success.connect(self.on_checkout_success)
-        worker.failure.connect(lambda e: QMessageBox.critical(self, "Error al pagar", e))
-        thread.start()
-
-    def closeEvent(self, event):
-        """Se llama cuando se cierra la ventana."""
-        # Esperar a que terminen los threads activos (con timeout razonable)
-        for thread in list(self.active_threads):
-            try:
-                if thread.isRunning():
-                    thread.quit()
-                    thread.wait(2000)  # espera hasta 2s
-            except Exception:
-                pass
-        super().closeEvent(event)
+        request.success.connect(self.on_checkout_success)
+        request.failure.connect(self.on_checkout_failure)
 
     def on_checkout_success(self, venta_data):
         QMessageBox.information(self, "Compra exitosa", f"Compra realizada. Venta ID: {venta_data.get('id')}")
         # Refrescar carrito (estará vacío)
         self.fetch_cart()
 
+    def on_checkout_failure(self, error_message):
+        self.refresh_footer()
+        QMessageBox.critical(self, "Error al pagar", error_message)
+
 class VentanaRegistro(QWidget):
     register_success = pyqtSignal() # Avisa a la ventana principal que cambie a Login
     go_to_login = pyqtSignal()      # Avisa que queremos ir a la vista de Login
 
     def __init__(self):
         super().__init__()
-        self.thread = None
-        self.worker = None
 
         layout = QFormLayout()
         self.nombre_input = QLineEdit()
@@ -577,22 +469,10 @@ class VentanaRegistro(QWidget):
         # Deshabilita el formulario para evitar doble clic
         self.setEnabled(False)
 
-        # Configura el hilo y el worker
-        self.thread = QThread()
-        self.worker = NetworkWorker(f"{API_URL}/api/register", "POST_JSON", register_data)
-        self.worker.moveToThread(self.thread)
-
-        # Conecta señales
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_register_success)
-        self.worker.failure.connect(self.on_register_failure)
-        
-        # Limpieza
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
+        # Envía la petición por el ejecutor compartido
+        request = submit(f"{API_URL}/api/register", "POST_JSON", register_data)
+        request.success.connect(self.on_register_success)
+        request.failure.connect(self.on_register_failure)
 
     def on_register_success(self, response_data):
         self.setEnabled(True) # Reactiva el formulario
@@ -614,8 +494,6 @@ class VentanaLogin(QWidget):
 
     def __init__(self):
         super().__init__()
-        self.thread = None
-        self.worker = None
 
         layout = QFormLayout()
         self.email_input = QLineEdit()
@@ -652,20 +530,10 @@ class VentanaLogin(QWidget):
         
         self.setEnabled(False) # Deshabilita formulario
 
-        # Configura y corre el hilo
-        self.thread = QThread()
-        self.worker = NetworkWorker(f"{API_URL}/api/login", "POST_FORM", login_data)
-        self.worker.moveToThread(self.thread)
-
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_login_success)
-        self.worker.failure.connect(self.on_login_failure)
-        
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        
-        self.thread.start()
+        # Envía la petición por el ejecutor compartido
+        request = submit(f"{API_URL}/api/login", "POST_FORM", login_data)
+        request.success.connect(self.on_login_success)
+        request.failure.connect(self.on_login_failure)
 
     def on_login_success(self, response_data):
         self.setEnabled(True)
@@ -680,359 +548,6 @@ class VentanaLogin(QWidget):
         QMessageBox.critical(self, "Error de Login", error_message)
 
 
-# --- Ventana Principal (Contenedora) ---
-
-class VentanaPrincipal(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        # Aplicar estilos globales
-        app = QApplication.instance()
-        app.setStyleSheet(STYLE)
-        
-        self.setWindowTitle("Tienda E-Commerce")
-        self.setGeometry(100, 100, 400, 250) # Tamaño inicial para login
-
-        self.api_token = None # Aquí guardaremos el token JWT
-
-        # El QStackedWidget es el "mazo de cartas" que contiene nuestras páginas
-        self.stack = QStackedWidget()
-        self.setCentralWidget(self.stack)
-
-        # Crear las páginas
-        self.login_page = VentanaLogin()
-        self.register_page = VentanaRegistro()
-        self.tienda_page = VentanaTienda()
-        self.admin_page = VentanaAdminVentas()
-        self.perfil_page = VentanaPerfil()
-        self.carrito_page = VentanaCarrito()
-        self.admin_productos_page = VentanaAdminProductos()
-
-        # Añadir las páginas al "mazo"
-        self.stack.addWidget(self.login_page)     # Índice 0
-        self.stack.addWidget(self.register_page)  # Índice 1
-        self.stack.addWidget(self.tienda_page)    # Índice 2
-        self.stack.addWidget(self.admin_page)     # Índice 3
-        self.stack.addWidget(self.perfil_page)    # Índice 4
-        self.stack.addWidget(self.carrito_page)   # Índice 5
-        self.stack.addWidget(self.admin_productos_page)  # Índice 6
-
-        # --- NUEVO: Crear menú persistente para administradores ---
-        self.admin_menu_widget = QWidget()
-        admin_menu_layout = QVBoxLayout(self.admin_menu_widget)
-        admin_title = QLabel("Panel de Administración")
-        admin_title.setStyleSheet("font-size: 16px; font-weight: bold;")
-        admin_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        admin_menu_layout.addWidget(admin_title)
-
-        self.admin_ventas_btn = QPushButton("Ver Ventas")
-        self.admin_productos_btn = QPushButton("Gestionar Productos")
-        admin_menu_layout.addWidget(self.admin_ventas_btn)
-        admin_menu_layout.addWidget(self.admin_productos_btn)
-
-        # Añadir el admin_menu al stack (índice siguiente disponible)
-        self.stack.addWidget(self.admin_menu_widget)
-
-        # Conectar los botones del menú a las vistas correspondientes
-        self.admin_ventas_btn.clicked.connect(self.mostrar_admin_ventas)
-        self.admin_productos_btn.clicked.connect(self.mostrar_admin_productos)
-
-        # --- Conectar señales entre páginas y la ventana principal ---
-        
-        # Botones de navegación
-        self.login_page.go_to_register.connect(self.mostrar_registro)
-        self.register_page.go_to_login.connect(self.mostrar_login)
-        
-        self.tienda_page.go_to_profile.connect(self.mostrar_perfil)
-        self.tienda_page.go_to_cart.connect(self.mostrar_carrito)
-
-        self.perfil_page.go_to_store.connect(self.mostrar_tienda)
-        self.carrito_page.go_to_store.connect(self.mostrar_tienda)
-        # Cambiado: cuando admin pulse "Volver" en vistas admin, mostramos el admin_menu
-        self.admin_page.go_to_store.connect(self.mostrar_admin_menu)
-        self.admin_productos_page.go_to_store.connect(self.mostrar_admin_menu)  # Conexión para la nueva página
-
-        # Lógica de la aplicación
-        self.register_page.register_success.connect(self.mostrar_login)
-        self.login_page.login_success.connect(self.on_login_exitoso)
-
-        
-        # Empezar en la página de Login
-        self.mostrar_login()
-
-    def mostrar_login(self):
-        self.stack.setCurrentIndex(0)
-        self.setWindowTitle("Iniciar Sesión")
-        self.resize(400, 250)
-
-    def mostrar_registro(self):
-        self.stack.setCurrentIndex(1)
-        self.setWindowTitle("Registro de Usuario")
-        self.resize(400, 250)
-
-    def mostrar_tienda(self):
-        self.stack.setCurrentIndex(2)
-        self.setWindowTitle(f"Tienda - ¡Bienvenido!")
-        self.resize(800, 600)
-        # Pasamos el token a la página de la tienda
-        self.tienda_page.set_token(self.api_token)
-
-    def mostrar_admin_ventas(self):
-        self.stack.setCurrentIndex(3) # Índice 3 = admin_page
-        self.setWindowTitle("Panel de Administración")
-        self.resize(800, 600)
-        # Pasamos el token a la página de admin
-        self.admin_page.set_token(self.api_token)
-
-    def mostrar_admin_productos(self):
-        """Muestra la página de gestión de productos."""
-        # Ajusta al índice en el que añadiste admin_productos_page (6)
-        self.stack.setCurrentIndex(self.stack.indexOf(self.admin_productos_page))
-        self.setWindowTitle("Gestión de Productos")
-        self.resize(800, 600)
-        self.admin_productos_page.set_token(self.api_token)
-
-    # NUEVO: Método para mostrar el menú de administración
-    def mostrar_admin_menu(self):
-        """Muestra el menú principal de administración."""
-        self.stack.setCurrentWidget(self.admin_menu_widget)
-        self.setWindowTitle("Panel de Administración")
-        self.resize(600, 400)
-
-    def mostrar_perfil(self):
-        self.stack.setCurrentIndex(4) # Índice 4 = perfil_page
-        self.setWindowTitle("Mi Perfil")
-        self.resize(500, 300) # Un tamaño más pequeño para el perfil
-        # Pasamos el token y pedimos los datos
-        self.perfil_page.set_token(self.api_token)
-
-    def mostrar_carrito(self):
-        self.stack.setCurrentIndex(5) # Índice 5 = carrito_page
-        self.setWindowTitle("Mi Carrito")
-        self.resize(600, 400) # Un tamaño más adecuado para el carrito
-        # Pasamos el token y pedimos los datos
-        self.carrito_page.set_token(self.api_token)
-
-    
-
-    def on_login_exitoso(self, login_data: dict):
-        """
-        Se llama cuando el login es exitoso.
-        Recibe el dict de login y decide a dónde enrutar.
-        """
-        self.api_token = login_data.get("access_token")
-        is_admin = login_data.get("is_admin", False)
-
-        print(f"Login exitoso. Token guardado. Es Admin: {is_admin}")
-
-        if is_admin:
-            # Mostrar el menú persistente de admin (en lugar de crear uno local)
-            self.mostrar_admin_menu()
-        else:
-            self.mostrar_tienda()   
-
-class VentanaTienda(QWidget):
-    """Página principal de la tienda."""
-    go_to_profile = pyqtSignal() # Señal para ir al perfil
-    go_to_cart = pyqtSignal()    # Señal para ir al carrito
-    
-    def __init__(self):
-        super().__init__()
-        self.api_token = None
-        self.thread = None
-        self.worker = None
-
-        # Layout principal
-        main_layout = QVBoxLayout(self)
-        main_layout.setContentsMargins(0, 0, 0, 0)
-        
-        # --- Botones de Navegación ---
-        nav_layout = QHBoxLayout()
-        self.profile_button = QPushButton("Mi Perfil")
-        self.cart_button = QPushButton("Mi Carrito")
-        nav_layout.addWidget(self.profile_button)
-        nav_layout.addWidget(self.cart_button)
-        main_layout.addLayout(nav_layout)
-        
-        self.profile_button.clicked.connect(self.go_to_profile.emit)
-        self.cart_button.clicked.connect(self.go_to_cart.emit)
-        # --- Fin de botones ---
-        
-        self.info_label = QLabel("Cargando productos...")
-        self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(self.info_label)
-        
-        # --- Área de Scroll para Productos ---
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFrameShape(QFrame.Shape.NoFrame)
-        main_layout.addWidget(scroll_area)
-        
-        # Widget contenedor para los productos (irá dentro del scroll)
-        self.products_widget = QWidget()
-        scroll_area.setWidget(self.products_widget)
-        
-        # Layout para la lista de productos
-        self.products_layout = QVBoxLayout(self.products_widget)
-        self.products_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        
-
-    def set_token(self, token: str):
-        """Recibe el token de la ventana principal y pide los productos."""
-        self.api_token = token
-        print(f"VentanaTienda: Token recibido. Pidiendo productos...")
-        self.fetch_products()
-
-    def fetch_products(self):
-        self.info_label.setText("Cargando productos...")
-        self.info_label.show() # Muestra "Cargando..."
-        
-        # Limpia productos antiguos (si los hubiera)
-        while self.products_layout.count():
-            child = self.products_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        
-        # DEBUG: mostrar info útil para depuración
-        print(f"[VentanaTienda] GET {API_URL}/api/products token_present={bool(self.api_token)}")
-        
-        # Configura el hilo y el worker
-        self.thread = QThread()
-        # ¡Usamos el método GET_AUTH y pasamos el token!
-        self.worker = NetworkWorker(
-            f"{API_URL}/api/products", 
-            "GET_AUTH", 
-            token=self.api_token
-        )
-        self.worker.moveToThread(self.thread)
-
-        # Conecta señales
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_fetch_success)
-        self.worker.failure.connect(self.on_fetch_failure)
-        
-        # Limpieza
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
-
-    def on_fetch_success(self, products_list: list):
-        """Se llama cuando la API devuelve la lista de productos."""
-        self.info_label.hide()
-        
-        if not products_list:
-            self.info_label.setText("No hay productos disponibles en este momento.")
-            self.info_label.show()
-            return
-
-        # Crea un widget para cada producto
-        for product in products_list:
-            # Crear un frame contenedor para el producto
-            product_frame = QFrame()
-            product_frame.setFrameShape(QFrame.Shape.Box)
-            product_frame.setStyleSheet("""
-                QFrame {
-                    background-color: white;
-                    border-radius: 8px;
-                    border: 1px solid #ecf0f1;
-                    margin: 5px;
-                }
-            """)
-            
-            # Layout vertical para el producto
-            product_layout = QVBoxLayout(product_frame)
-            
-            # Información del producto con HTML para mejor formato
-            info_text = f"""
-                <h3>{product['nombre']}</h3>
-                <p>{product['descripcion'] or 'Sin descripción'}</p>
-                <p><b>Precio: ${product['precio']:.2f}</b></p>
-                <p>Stock disponible: {product['stock']}</p>
-            """
-            info_label = QLabel(info_text)
-            info_label.setWordWrap(True)
-            info_label.setTextFormat(Qt.TextFormat.RichText)
-            product_layout.addWidget(info_label)
-            
-            # --- Mostrar imagen si hay URL ---
-            if product.get("imagen_url"):
-                try:
-                    data = urllib.request.urlopen(product["imagen_url"]).read()
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(data)
-                    img_label = QLabel()
-                    img_label.setPixmap(pixmap.scaledToWidth(120))
-                    product_layout.addWidget(img_label)
-                except Exception:
-                    img_label = QLabel("(Imagen no disponible)")
-                    product_layout.addWidget(img_label)
-            # --- Fin imagen ---
-            
-            # Contenedor horizontal para cantidad y botón
-            controls_layout = QHBoxLayout()
-            
-            # Spinner para la cantidad
-            cantidad_spin = QSpinBox()
-            cantidad_spin.setMinimum(1)
-            cantidad_spin.setMaximum(min(10, product['stock']))  # Máximo 10 o el stock disponible
-            cantidad_spin.setValue(1)
-            cantidad_spin.setPrefix("Cantidad: ")
-            controls_layout.addWidget(cantidad_spin)
-            
-            # Botón de añadir al carrito
-            add_button = QPushButton("🛒 Añadir al Carrito")
-            add_button.setEnabled(product['stock'] > 0)
-            if product['stock'] > 0:
-                add_button.clicked.connect(
-                    lambda checked, p=product, spin=cantidad_spin: 
-                    self.handle_add_to_cart(p, spin.value())
-                )
-            else:
-                add_button.setText("Sin Stock")
-                add_button.setStyleSheet("background-color: #ffebee;")
-            
-            controls_layout.addWidget(add_button)
-            product_layout.addLayout(controls_layout)
-            
-            # Añadir el frame del producto al layout principal
-            self.products_layout.addWidget(product_frame)
-
-    def handle_add_to_cart(self, product: dict, cantidad: int):
-        """Envía petición para añadir producto al carrito (API)."""
-        if cantidad <= 0:
-            QMessageBox.warning(self, "Error", "Cantidad inválida.")
-            return
-        add_data = {"product_id": product["id"], "cantidad": cantidad}
-        self.thread = QThread()
-        self.worker = NetworkWorker(
-            f"{API_URL}/api/cart/add",
-            "POST_AUTH",
-            data=add_data,
-            token=self.api_token
-        )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_add_to_cart_success)
-        self.worker.failure.connect(self.on_add_to_cart_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
-
-    def on_add_to_cart_success(self, cart_data):
-        QMessageBox.information(self, "Carrito", f"Producto añadido al carrito. Total del carrito: ${cart_data.get('total', 0):.2f}")
-
-    def on_add_to_cart_failure(self, error_message):
-        QMessageBox.critical(self, "Error al añadir", error_message)
-
-    def on_fetch_failure(self, error_message):
-        """Se llama si la API falla."""
-        self.info_label.setText(f"Error al cargar productos: {error_message}")
-        self.info_label.show()
-        QMessageBox.critical(self, "Error de Red", error_message)
-
-
 # --- Estilos globales ---
 
 # Paleta de colores minimalista
@@ -1123,6 +638,8 @@ QLabel#success_label {
 }
 """
 
+# --- Ventana Principal (Contenedora) ---
+
 class VentanaPrincipal(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -1279,8 +796,6 @@ class VentanaTienda(QWidget):
     def __init__(self):
         super().__init__()
         self.api_token = None
-        self.thread = None
-        self.worker = None
 
         # Layout principal
         main_layout = QVBoxLayout(self)
@@ -1302,19 +817,16 @@ class VentanaTienda(QWidget):
         self.info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         main_layout.addWidget(self.info_label)
         
-        # --- Área de Scroll para Productos ---
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFrameShape(QFrame.Shape.NoFrame)
-        main_layout.addWidget(scroll_area)
-        
-        # Widget contenedor para los productos (irá dentro del scroll)
-        self.products_widget = QWidget()
-        scroll_area.setWidget(self.products_widget)
-        
-        # Layout para la lista de productos
-        self.products_layout = QVBoxLayout(self.products_widget)
-        self.products_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        # --- Grilla de Productos (modelo/vista) ---
+        # Solo se pintan las tarjetas visibles y el catálogo se pide por
+        # páginas a medida que se hace scroll (ProductListModel.fetchMore).
+        self.products_model = ProductListModel(page_size=PRODUCTS_PAGE_SIZE, parent=self)
+        self.products_model.loading_changed.connect(self.on_loading_changed)
+        self.products_model.load_failed.connect(self.on_fetch_failure)
+        self.products_delegate = ProductCardDelegate(mode="store", parent=self)
+        self.products_delegate.action_triggered.connect(self.on_product_action)
+        self.products_view = ProductGridView(self.products_model, self.products_delegate)
+        main_layout.addWidget(self.products_view)
         
 
     def set_token(self, token: str):
@@ -1326,118 +838,31 @@ class VentanaTienda(QWidget):
     def fetch_products(self):
         self.info_label.setText("Cargando productos...")
         self.info_label.show() # Muestra "Cargando..."
-        
-        # Limpia productos antiguos (si los hubiera)
-        while self.products_layout.count():
-            child = self.products_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        # Los productos actuales se quedan en pantalla: si el servidor
+        # responde 304 (nada cambió) no hace falta reconstruirlos.
         
         # DEBUG: mostrar info útil para depuración
-        print(f"[VentanaTienda] GET {API_URL}/api/products token_present={bool(self.api_token)}")
-        
-        # Configura el hilo y el worker
-        self.thread = QThread()
-        # ¡Usamos el método GET_AUTH y pasamos el token!
-        self.worker = NetworkWorker(
-            f"{API_URL}/api/products", 
-            "GET_AUTH", 
-            token=self.api_token
-        )
-        self.worker.moveToThread(self.thread)
-
-        # Conecta señales
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_fetch_success)
-        self.worker.failure.connect(self.on_fetch_failure)
-        
-        # Limpieza
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.thread.start()
-
-    def on_fetch_success(self, products_list: list):
-        """Se llama cuando la API devuelve la lista de productos."""
-        self.info_label.hide()
-        
-        if not products_list:
+        print(f"[VentanaTienda] GET {API_URL}/api/products/page token_present={bool(self.api_token)}")
+        self.products_model.set_token(self.api_token)
+        self.products_model.reload()
+
+    def on_loading_changed(self, loading: bool):
+        """El modelo empezó/terminó de pedir una página de productos."""
+        if loading:
+            if self.products_model.rowCount() == 0:
+                self.info_label.setText("Cargando productos...")
+                self.info_label.show()
+            return
+        if self.products_model.rowCount() == 0:
             self.info_label.setText("No hay productos disponibles en este momento.")
             self.info_label.show()
-            return
+        else:
+            self.info_label.hide()
 
-        # Crea un widget para cada producto
-        for product in products_list:
-            # Crear un frame contenedor para el producto
-            product_frame = QFrame()
-            product_frame.setFrameShape(QFrame.Shape.Box)
-            product_frame.setStyleSheet("""
-                QFrame {
-                    background-color: white;
-                    border-radius: 8px;
-                    border: 1px solid #ecf0f1;
-                    margin: 5px;
-                }
-            """)
-            
-            # Layout vertical para el producto
-            product_layout = QVBoxLayout(product_frame)
-            
-            # Información del producto con HTML para mejor formato
-            info_text = f"""
-                <h3>{product['nombre']}</h3>
-                <p>{product['descripcion'] or 'Sin descripción'}</p>
-                <p><b>Precio: ${product['precio']:.2f}</b></p>
-                <p>Stock disponible: {product['stock']}</p>
-            """
-            info_label = QLabel(info_text)
-            info_label.setWordWrap(True)
-            info_label.setTextFormat(Qt.TextFormat.RichText)
-            product_layout.addWidget(info_label)
-            
-            # --- Mostrar imagen si hay URL ---
-            if product.get("imagen_url"):
-                try:
-                    data = urllib.request.urlopen(product["imagen_url"]).read()
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(data)
-                    img_label = QLabel()
-                    img_label.setPixmap(pixmap.scaledToWidth(120))
-                    product_layout.addWidget(img_label)
-                except Exception:
-                    img_label = QLabel("(Imagen no disponible)")
-                    product_layout.addWidget(img_label)
-            # --- Fin imagen ---
-            
-            # Contenedor horizontal para cantidad y botón
-            controls_layout = QHBoxLayout()
-            
-            # Spinner para la cantidad
-            cantidad_spin = QSpinBox()
-            cantidad_spin.setMinimum(1)
-            cantidad_spin.setMaximum(min(10, product['stock']))  # Máximo 10 o el stock disponible
-            cantidad_spin.setValue(1)
-            cantidad_spin.setPrefix("Cantidad: ")
-            controls_layout.addWidget(cantidad_spin)
-            
-            # Botón de añadir al carrito
-            add_button = QPushButton("🛒 Añadir al Carrito")
-            add_button.setEnabled(product['stock'] > 0)
-            if product['stock'] > 0:
-                add_button.clicked.connect(
-                    lambda checked, p=product, spin=cantidad_spin: 
-                    self.handle_add_to_cart(p, spin.value())
-                )
-            else:
-                add_button.setText("Sin Stock")
-                add_button.setStyleSheet("background-color: #ffebee;")
-            
-            controls_layout.addWidget(add_button)
-            product_layout.addLayout(controls_layout)
-            
-            # Añadir el frame del producto al layout principal
-            self.products_layout.addWidget(product_frame)
+    def on_product_action(self, action: str, product: dict, cantidad: int):
+        """Clic en un botón de una tarjeta de la grilla."""
+        if action == "add":
+            self.handle_add_to_cart(product, cantidad)
 
     def handle_add_to_cart(self, product: dict, cantidad: int):
         """Envía petición para añadir producto al carrito (API)."""
@@ -1445,21 +870,14 @@ class VentanaTienda(QWidget):
             QMessageBox.warning(self, "Error", "Cantidad inválida.")
             return
         add_data = {"product_id": product["id"], "cantidad": cantidad}
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/cart/add",
             "POST_AUTH",
             data=add_data,
             token=self.api_token
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_add_to_cart_success)
-        self.worker.failure.connect(self.on_add_to_cart_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
+        request.success.connect(self.on_add_to_cart_success)
+        request.failure.connect(self.on_add_to_cart_failure)
 
     def on_add_to_cart_success(self, cart_data):
         QMessageBox.information(self, "Carrito", f"Producto añadido al carrito. Total del carrito: ${cart_data.get('total', 0):.2f}")
@@ -1481,8 +899,6 @@ class VentanaPerfil(QWidget):
     def __init__(self):
         super().__init__()
         self.api_token = None
-        self.thread = None
-        self.worker = None
 
         layout = QVBoxLayout(self)
         layout.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -1540,20 +956,17 @@ class VentanaPerfil(QWidget):
         self.save_button.setEnabled(False)
         self.info_label.show()
         
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/profile", 
             "GET_AUTH", 
-            token=self.api_token
+            token=self.api_token,
+            conditional=True,
+            channel=f"perfil-{id(self)}"
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_fetch_success)
-        self.worker.failure.connect(self.on_fetch_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
+        request.success.connect(self.on_fetch_success)
+        # Con 304 rellenamos desde el JSON guardado (descarta ediciones sin guardar, como antes)
+        request.not_modified.connect(self.on_fetch_success)
+        request.failure.connect(self.on_fetch_failure)
 
     def on_fetch_success(self, profile_data: dict):
         """Rellena los campos cuando la API responde."""
@@ -1616,21 +1029,14 @@ class VentanaPerfil(QWidget):
         self.save_button.setText("Guardando...")
         self.save_button.setEnabled(False)
 
-        self.thread = QThread()
-        self.worker = NetworkWorker(
+        request = submit(
             f"{API_URL}/api/profile", 
             "PUT_AUTH",
             data=update_data,
             token=self.api_token
         )
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.success.connect(self.on_save_success)
-        self.worker.failure.connect(self.on_save_failure)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
+        request.success.connect(self.on_save_success)
+        request.failure.connect(self.on_save_failure)
 
     def on_save_success(self, new_profile_data: dict):
         self.save_button.setText("Guardar Cambios")
@@ -0,0 +1,301 @@
+"""
+Métricas de la API: latencia por ruta, códigos de estado y consultas SQL por request.
+
+- MetricsMiddleware (ASGI puro) mide cada request y lo cuenta bajo la
+  plantilla de la ruta ("/api/admin/products/{product_id}", no el id real),
+  así la cantidad de series no crece con los datos.
+- instrument_engine() engancha before/after_cursor_execute del engine: cada
+  sentencia que corre mientras se atiende un request se suma a ese request
+  (cantidad y tiempo). El request actual viaja en un ContextVar, que anyio
+  copia a los hilos donde corren los endpoints síncronos.
+- Los requests más lentos que SLOW_REQUEST_MS se registran (logger
+  "tienda.metrics") con sus consultas agrupadas: una misma SELECT repetida
+  muchas veces es la firma de un N+1.
+- render_prometheus() arma el texto para GET /metrics (formato de
+  exposición de Prometheus, sin dependencias extra).
+"""
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+logger = logging.getLogger("tienda.metrics")
+
+# Requests más lentos que esto (ms) se registran con su lista de consultas
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Cuántas consultas distintas como mucho se muestran en el log de un request lento
+SLOW_REQUEST_MAX_QUERIES = int(os.getenv("SLOW_REQUEST_MAX_QUERIES", "20"))
+
+# Límites de los histogramas (le="...")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # segundos
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Request que se está atendiendo en este contexto (None fuera de un request)
+_current = ContextVar("metrics_request", default=None)
+
+
+class RequestRecord:
+    """Lo que se va juntando durante un request: sus consultas SQL."""
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = {}   # texto SQL -> [veces, segundos]
+
+    def add_query(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(self.bounds, self.counts):
+            total += n
+            yield bound, total
+
+
+class MetricsRegistry:
+    """Acumula las métricas de todos los requests de este proceso (worker)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.in_progress = 0
+        self.requests = {}        # (method, route, status) -> cantidad
+        self.latency = {}         # (method, route) -> Histogram (segundos)
+        self.query_counts = {}    # (method, route) -> Histogram (consultas por request)
+        self.db_seconds = {}      # (method, route) -> segundos en la DB
+        self.background_queries = 0
+        self.background_db_seconds = 0.0
+
+    def begin(self):
+        with self._lock:
+            self.in_progress += 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float, record: RequestRecord):
+        key = (method, route)
+        with self._lock:
+            self.in_progress -= 1
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            latency = self.latency.get(key)
+            if latency is None:
+                latency = self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.query_counts[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.db_seconds[key] = 0.0
+            latency.observe(seconds)
+            self.query_counts[key].observe(record.queries)
+            self.db_seconds[key] += record.db_seconds
+
+    def add_background_query(self, seconds: float):
+        """Consultas fuera de un request (barrido de reservas, índice de búsqueda...)."""
+        with self._lock:
+            self.background_queries += 1
+            self.background_db_seconds += seconds
+
+
+registry = MetricsRegistry()
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    # Lo que no coincide con ninguna ruta (404) va junto, para no crear una serie por URL
+    return path or "unmatched"
+
+
+def _log_slow_request(method: str, path: str, status: int, seconds: float, record: RequestRecord):
+    lines = [
+        f"Request lento: {method} {path} -> {status} en {seconds * 1000:.1f} ms "
+        f"({record.queries} consultas, {record.db_seconds * 1000:.1f} ms en la DB)"
+    ]
+    heaviest = sorted(record.statements.items(), key=lambda item: item[1][1], reverse=True)
+    for statement, (times, spent) in heaviest[:SLOW_REQUEST_MAX_QUERIES]:
+        sql = " ".join(statement.split())
+        if len(sql) > 300:
+            sql = sql[:300] + "..."
+        lines.append(f"  x{times:<4} {spent * 1000:8.1f} ms  {sql}")
+    if len(heaviest) > SLOW_REQUEST_MAX_QUERIES:
+        lines.append(f"  ... y {len(heaviest) - SLOW_REQUEST_MAX_QUERIES} consultas distintas más")
+    logger.warning("\n".join(lines))
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada request HTTP. Conviene que sea el más
+    externo (el último add_middleware) para que el tiempo incluya a los demás
+    (gzip, etc.). En respuestas en streaming el tiempo llega hasta el último
+    trozo enviado.
+    """
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_s = slow_request_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        record = RequestRecord()
+        token = _current.set(record)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.begin()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            seconds = time.perf_counter() - start
+            _current.reset(token)
+            method = scope["method"]
+            registry.finish(method, _route_template(scope), status, seconds, record)
+            if seconds >= self.slow_request_s:
+                _log_slow_request(method, scope["path"], status, seconds, record)
+
+
+def instrument_engine(engine):
+    """Cuenta y cronometra cada sentencia SQL del engine, y la suma al request en curso."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        record = _current.get()
+        if record is None:
+            registry.add_background_query(seconds)
+        else:
+            record.add_query(statement, seconds)
+
+
+# --- Exposición en formato texto de Prometheus ---
+
+def _labels(**labels) -> str:
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _histogram_lines(name: str, histograms: dict) -> list:
+    lines = []
+    for (method, route), hist in sorted(histograms.items()):
+        for bound, total in hist.cumulative():
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=f'{bound:g}')} {total}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {hist.count}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {hist.sum:.6f}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+    return lines
+
+
+def render_prometheus(pool: dict | None = None) -> str:
+    """Texto para GET /metrics. 'pool' es database.pool_status(), si se quiere incluir el pool."""
+    with registry._lock:
+        requests = dict(registry.requests)
+        latency = {k: _copy_histogram(h) for k, h in registry.latency.items()}
+        query_counts = {k: _copy_histogram(h) for k, h in registry.query_counts.items()}
+        db_seconds = dict(registry.db_seconds)
+        in_progress = registry.in_progress
+        background = (registry.background_queries, registry.background_db_seconds)
+
+    lines = [
+        "# HELP http_requests_total Requests HTTP atendidos, por ruta y código de estado.",
+        "# TYPE http_requests_total counter",
+    ]
+    for (method, route, status), n in sorted(requests.items()):
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+
+    lines += [
+        "# HELP http_request_duration_seconds Latencia de los requests HTTP.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    lines += _histogram_lines("http_request_duration_seconds", latency)
+
+    lines += [
+        "# HELP http_request_db_queries Consultas SQL por request.",
+        "# TYPE http_request_db_queries histogram",
+    ]
+    lines += _histogram_lines("http_request_db_queries", query_counts)
+
+    lines += [
+        "# HELP http_request_db_seconds_total Tiempo total en consultas SQL de los requests, por ruta.",
+        "# TYPE http_request_db_seconds_total counter",
+    ]
+    for (method, route), seconds in sorted(db_seconds.items()):
+        lines.append(f"http_request_db_seconds_total{_labels(method=method, route=route)} {seconds:.6f}")
+
+    lines += [
+        "# HELP http_requests_in_progress Requests HTTP que se están atendiendo ahora.",
+        "# TYPE http_requests_in_progress gauge",
+        f"http_requests_in_progress {in_progress}",
+        "# HELP db_background_queries_total Consultas SQL fuera de un request (tareas de fondo).",
+        "# TYPE db_background_queries_total counter",
+        f"db_background_queries_total {background[0]}",
+        "# HELP db_background_seconds_total Tiempo en consultas SQL fuera de un request.",
+        "# TYPE db_background_seconds_total counter",
+        f"db_background_seconds_total {background[1]:.6f}",
+        "# HELP process_start_time_seconds Momento en que arrancó este worker (epoch).",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {registry.started:.3f}",
+    ]
+
+    if pool:
+        gauges = ("size", "checked_out", "checked_in", "overflow")
+        counters = ("connects", "checkouts", "timeouts", "invalidations", "wait_count")
+        for name in gauges:
+            if name in pool:
+                lines += [f"# TYPE db_pool_{name} gauge", f"db_pool_{name} {pool[name]}"]
+        for name in counters:
+            if name in pool:
+                lines += [f"# TYPE db_pool_{name}_total counter", f"db_pool_{name}_total {pool[name]}"]
+        if "wait_ms_total" in pool:
+            lines += ["# TYPE db_pool_wait_seconds_total counter",
+                      f"db_pool_wait_seconds_total {pool['wait_ms_total'] / 1000:.6f}"]
+    return "\n".join(lines) + "\n"
+
+
+def _copy_histogram(hist: Histogram) -> Histogram:
+    copy = Histogram(hist.bounds)
+    copy.counts = list(hist.counts)
+    copy.sum = hist.sum
+    copy.count = hist.count
+    return copy
@@ -0,0 +1,215 @@
+"""
+Migraciones del esquema (sin Alembic): una lista ordenada de pasos y una
+tabla 'schema_migrations' con los que ya se aplicaron.
+
+- 0001: crea las tablas que falten a partir de models.py (una base vacía
+  queda directamente con el esquema actual, índices incluidos).
+- Los pasos siguientes llevan a las bases que ya existían (p.ej. la
+  restaurada de backup.sql) al esquema actual. Son idempotentes: miran
+  con el inspector qué columnas / índices ya están antes de crearlos.
+
+La API las aplica al arrancar (lifespan) salvo que AUTO_MIGRATE=0; en ese
+caso hay que correrlas al desplegar:
+
+    python -m migrations            # aplica las pendientes
+    python -m migrations status     # muestra cuáles están aplicadas
+
+En MySQL se toma un lock con nombre (GET_LOCK) para que varios workers
+arrancando a la vez no apliquen la misma migración dos veces.
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+import models
+import rollups
+
+# Tabla propia (no es un modelo): no entra en Base.metadata
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATION_LOCK_TIMEOUT = 60   # segundos esperando el lock de MySQL
+
+
+# --- Helpers idempotentes ---
+
+def _index_exists(conn, table: str, index) -> bool:
+    """True si ya hay un índice con ese nombre, o uno con las mismas columnas (y unicidad)."""
+    columns = [c.name for c in index.columns]
+    inspector = inspect(conn)
+    for existing in inspector.get_indexes(table):
+        if existing["name"] == index.name:
+            return True
+        if existing["column_names"] == columns and bool(existing.get("unique")) >= bool(index.unique):
+            return True
+    if index.unique:
+        for constraint in inspector.get_unique_constraints(table):
+            if constraint["column_names"] == columns:
+                return True
+    return False
+
+
+def ensure_index(conn, model, name: str) -> bool:
+    """Crea el índice 'name' declarado en el modelo si todavía no existe. Devuelve si lo creó."""
+    table = model.__table__
+    index = next(i for i in table.indexes if i.name == name)
+    if _index_exists(conn, table.name, index):
+        return False
+    index.create(conn)
+    return True
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+# --- Migraciones ---
+
+def m0001_create_tables(conn):
+    """Tablas que falten, con el esquema actual de models.py."""
+    models.Base.metadata.create_all(bind=conn, checkfirst=True)
+
+
+def m0002_stock_reservations(conn):
+    """Columnas de las reservas de stock del carrito (reservations.py)."""
+    if not _has_column(conn, "products", "reservado"):
+        conn.execute(text("ALTER TABLE products ADD COLUMN reservado INTEGER NOT NULL DEFAULT 0"))
+    if not _has_column(conn, "cart_items", "reservado_hasta"):
+        conn.execute(text("ALTER TABLE cart_items ADD COLUMN reservado_hasta DATETIME NULL"))
+    ensure_index(conn, models.CartItem, "ix_cart_items_reservado_hasta")
+
+
+def merge_duplicate_cart_lines(conn) -> int:
+    """
+    Junta las líneas repetidas (mismo usuario y producto) en una sola, con la
+    suma de las cantidades, para poder crear el índice único. La línea que
+    queda pierde su reserva (se libera lo reservado por todas) y se vuelve a
+    reservar la próxima vez que el usuario toque el carrito o compre.
+    Devuelve cuántas líneas se borraron.
+    """
+    CartItem, Product = models.CartItem, models.Product
+    groups = conn.execute(
+        text(
+            "SELECT user_id, product_id, MIN(id) AS keep_id, SUM(cantidad) AS total, COUNT(*) AS n "
+            "FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1"
+        )
+    ).all()
+    removed = 0
+    for group in groups:
+        same_line = (CartItem.user_id == group.user_id) & (CartItem.product_id == group.product_id)
+        held = conn.execute(
+            select(CartItem.cantidad).where(same_line, CartItem.reservado_hasta.isnot(None))
+        ).scalars().all()
+        if held:
+            conn.execute(
+                Product.__table__.update()
+                .where(Product.id == group.product_id)
+                .values(reservado=Product.reservado - sum(held))
+            )
+        conn.execute(
+            CartItem.__table__.update()
+            .where(CartItem.id == group.keep_id)
+            .values(cantidad=group.total, reservado_hasta=None)
+        )
+        conn.execute(CartItem.__table__.delete().where(same_line, CartItem.id != group.keep_id))
+        removed += group.n - 1
+    if removed:
+        print(f"[migraciones] {removed} líneas de carrito repetidas unificadas")
+    return removed
+
+
+def m0003_secondary_indexes(conn):
+    """Índice único (user_id, product_id) del carrito, ventas por cliente y fecha, nombre y precio de productos."""
+    merge_duplicate_cart_lines(conn)
+    ensure_index(conn, models.CartItem, "uq_cart_items_user_product")
+    ensure_index(conn, models.Venta, "ix_ventas_user_fecha")
+    ensure_index(conn, models.Product, "ix_products_nombre")
+    ensure_index(conn, models.Product, "ix_products_precio")
+
+
+def m0004_sales_rollups(conn):
+    """Resúmenes diarios de ventas (rollups.py), llenados con el histórico de ventas."""
+    models.VentaDiaria.__table__.create(conn, checkfirst=True)
+    models.VentaDiariaProducto.__table__.create(conn, checkfirst=True)
+    days = rollups.rebuild(conn)
+    if days:
+        print(f"[migraciones] resúmenes diarios calculados para {days} días con ventas")
+
+
+MIGRATIONS = [
+    ("0001_create_tables", m0001_create_tables),
+    ("0002_stock_reservations", m0002_stock_reservations),
+    ("0003_secondary_indexes", m0003_secondary_indexes),
+    ("0004_sales_rollups", m0004_sales_rollups),
+]
+
+
+# --- Runner ---
+
+def applied_versions(engine) -> set:
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(schema_migrations.name):
+            return set()
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine, target: str | None = None) -> list:
+    """Aplica en orden las migraciones pendientes (hasta 'target' incluida). Devuelve las que aplicó."""
+    with engine.connect() as lock_conn:
+        mysql = engine.dialect.name == "mysql"
+        if mysql:
+            got = lock_conn.execute(text("SELECT GET_LOCK('tienda_schema_migrations', :t)"),
+                                    {"t": MIGRATION_LOCK_TIMEOUT}).scalar()
+            if got != 1:
+                raise RuntimeError("No se pudo tomar el lock de migraciones (¿otro proceso migrando?)")
+        try:
+            _metadata.create_all(bind=engine, checkfirst=True)
+            done = applied_versions(engine)
+            applied = []
+            for version, migration in MIGRATIONS:
+                if version not in done:
+                    # Cada migración en su transacción (en MySQL el DDL hace commit igual)
+                    with engine.begin() as conn:
+                        migration(conn)
+                        conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.now()))
+                    print(f"[migraciones] aplicada {version}")
+                    applied.append(version)
+                if version == target:
+                    break
+            return applied
+        finally:
+            if mysql:
+                lock_conn.execute(text("SELECT RELEASE_LOCK('tienda_schema_migrations')"))
+
+
+def drop_all(engine):
+    """Borra todas las tablas, incluida schema_migrations (solo para bases de prueba/benchmarks)."""
+    models.Base.metadata.drop_all(bind=engine)
+    _metadata.drop_all(bind=engine)
+
+
+def main(argv: list):
+    from database import engine
+
+    command = argv[1] if len(argv) > 1 else "upgrade"
+    if command == "upgrade":
+        applied = upgrade(engine, argv[2] if len(argv) > 2 else None)
+        if not applied:
+            print("El esquema ya está al día.")
+    elif command == "status":
+        done = applied_versions(engine)
+        for version, migration in MIGRATIONS:
+            mark = "x" if version in done else " "
+            print(f"[{mark}] {version}: {(migration.__doc__ or '').strip()}")
+    else:
+        print(__doc__)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Float, Text, ForeignKey, Date, DateTime, Index
 from database import Base # Importamos la 'Base' que creamos
-from sqlalchemy.orm import relationship # ¡Añade esta importación!
+from sqlalchemy.orm import column_property, relationship # ¡Añade esta importación!
 from datetime import datetime # ¡Añade esta importación!
 
 
@@ -32,12 +32,16 @@ class Product(Base):
     __tablename__ = "products"
     
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String(100), nullable=False)
+    # Indexados: /api/products/page filtra por prefijo del nombre y por rango de precio
+    nombre = Column(String(100), nullable=False, index=True)
     descripcion = Column(Text, nullable=True)
-    precio = Column(Float, nullable=False)
+    precio = Column(Float, nullable=False, index=True)
     stock = Column(Integer, default=0)
     # Guardamos la URL de la imagen, no la imagen en sí
     imagen_url = Column(String(255), nullable=True)
+    # Unidades apartadas en carritos (ver reservations.py); lo vendible es stock - reservado
+    reservado = Column(Integer, nullable=False, default=0, server_default="0")
+    disponible = column_property(stock - reservado)
 
     # ... (Después de la clase Product) ...
 
@@ -45,10 +49,15 @@ class Venta(Base):
     """Modelo de la tabla 'ventas' (Pedidos)."""
     
     __tablename__ = "ventas"
+    __table_args__ = (
+        # Ventas de un cliente por fecha (filtro user_id del panel de admin)
+        Index("ix_ventas_user_fecha", "user_id", "fecha"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     # default=datetime.now(timezone.utc) si usas UTC, o solo datetime.now
-    fecha = Column(DateTime, default=datetime.now)
+    # Indexada: el panel de admin pagina y filtra las ventas por fecha
+    fecha = Column(DateTime, default=datetime.now, index=True)
     total = Column(Float, nullable=False)
     
     # --- Llave Foránea ---
@@ -91,12 +100,44 @@ class VentaItem(Base):
 class CartItem(Base):
     """Modelo de la tabla 'cart_items' (elementos temporales del carrito por usuario)."""
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # Una línea por producto en cada carrito. Todas las mutaciones buscan
+        # por este par y el índice único permite el upsert atómico.
+        Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     cantidad = Column(Integer, nullable=False, default=1)
     precio_unitario = Column(Float, nullable=False)  # precio tomado al agregar
+    # Hasta cuándo están reservadas estas unidades (None = sin reserva, hay que volver a reservar)
+    reservado_hasta = Column(DateTime, nullable=True, index=True)
 
     user = relationship("User", back_populates="cart_items")
-    producto = relationship("Product")
\ No newline at end of file
+    producto = relationship("Product")
+
+# --- Resúmenes diarios de ventas (ver rollups.py) ---
+# Los mantiene checkout_cart en la misma transacción que la venta y se pueden
+# reconstruir desde ventas/venta_items con 'python -m rollups backfill'.
+
+class VentaDiaria(Base):
+    """Totales de ventas de un día: pedidos, unidades e ingresos."""
+    __tablename__ = "ventas_diarias"
+
+    fecha = Column(Date, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
+
+class VentaDiariaProducto(Base):
+    """Ventas de un producto en un día: unidades, ingresos y en cuántos pedidos apareció."""
+    __tablename__ = "ventas_diarias_productos"
+
+    # Clave (fecha, product_id): un rango de días se lee por la clave primaria
+    fecha = Column(Date, primary_key=True)
+    # Sin FK: el histórico se conserva aunque el producto se borre
+    product_id = Column(Integer, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Float, nullable=False, default=0.0)
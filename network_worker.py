@@ -1,85 +1,201 @@
 import requests
 import json
+import os
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PyQt6.QtCore import QObject, pyqtSignal
 
 API_URL = "http://127.0.0.1:8000"
 
+# --- Sesión HTTP compartida (keep-alive) ---
+# Todas las peticiones del cliente reutilizan las conexiones TCP abiertas con
+# la API en lugar de abrir una nueva por clic.
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))     # conexiones abiertas por host
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.3"))      # 0.3s, 0.6s, 1.2s...
+
+# Timeouts (conexión, lectura) en segundos según el método
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_TIMEOUTS = {
+    "GET": (HTTP_CONNECT_TIMEOUT, 15),
+    "POST": (HTTP_CONNECT_TIMEOUT, 30),   # login (bcrypt) y checkout pueden tardar más
+    "PUT": (HTTP_CONNECT_TIMEOUT, 15),
+    "DELETE": (HTTP_CONNECT_TIMEOUT, 15),
+}
+
+# Métodos que se reintentan aunque el servidor ya haya recibido la petición
+# (timeout de lectura, 502/503/504). Los fallos de conexión se reintentan
+# siempre porque la petición no llegó a salir. POST no se repite (duplicaría
+# ventas o items) y DELETE tampoco: la segunda vez respondería 404.
+_RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT"})
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=_RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # tras el último intento se devuelve la respuesta tal cual
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # requests ya manda 'Accept-Encoding: gzip, deflate' (y 'br' si está
+    # instalado el paquete brotli) y descomprime solo las respuestas.
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Sesión compartida por todos los hilos. El pool de conexiones de urllib3 es
+    thread-safe; la sesión no se modifica después de crearla (headers de
+    autenticación y timeouts se pasan en cada petición).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def http_request(method: str, url: str, **kwargs) -> requests.Response:
+    """Petición por la sesión compartida con el timeout del método."""
+    kwargs.setdefault("timeout", HTTP_TIMEOUTS.get(method, HTTP_TIMEOUTS["GET"]))
+    return get_session().request(method, url, **kwargs)
+
+# --- Caché de validadores (ETag) para peticiones GET condicionales ---
+# Clave: (url, token) -> (etag, json ya decodificado). El token forma parte
+# de la clave porque /api/cart o /api/profile dependen del usuario.
+_VALIDATOR_CACHE_MAX = 256
+_validator_cache = OrderedDict()
+_validator_lock = threading.Lock()
+
+def _get_validator(url: str, token: str | None):
+    with _validator_lock:
+        entry = _validator_cache.get((url, token))
+        if entry is not None:
+            _validator_cache.move_to_end((url, token))
+        return entry
+
+def _store_validator(url: str, token: str | None, etag: str, data):
+    with _validator_lock:
+        _validator_cache[(url, token)] = (etag, data)
+        _validator_cache.move_to_end((url, token))
+        while len(_validator_cache) > _VALIDATOR_CACHE_MAX:
+            _validator_cache.popitem(last=False)
+
+def perform_request(url: str, method: str, data: dict = None, token: str = None, conditional: bool = False):
+    """
+    Hace la petición (en el hilo que la llame) y devuelve una tupla (resultado, valor):
+      - ("success", json decodificado)  (o {"message": texto} si no era JSON)
+      - ("not_modified", json guardado)  solo con conditional=True y respuesta 304
+      - ("failure", mensaje de error)
+
+    Con conditional=True, un GET_AUTH manda If-None-Match con el último ETag
+    recibido para esa URL; si nada cambió, no se descarga ni decodifica el cuerpo.
+    """
+    try:
+        # Debug: mostrar qué se va a ejecutar en consola (útil en desarrollo)
+        print(f"[NetworkWorker] {method} {url} token_present={bool(token)} data={bool(data)}")
+
+        if method == "POST_JSON":
+            response = http_request("POST", url, json=data)
+        elif method == "POST_FORM":
+            response = http_request("POST", url, data=data)
+        elif method == "POST_AUTH":
+            if not token:
+                raise ValueError("Se requiere un token para POST_AUTH")
+            headers = {"Authorization": f"Bearer {token}"}
+            response = http_request("POST", url, json=data, headers=headers)
+        elif method == "GET_AUTH":
+            if not token:
+                raise ValueError("Se requiere un token para GET_AUTH")
+            headers = {"Authorization": f"Bearer {token}"}
+            cached = _get_validator(url, token) if conditional else None
+            if cached:
+                headers["If-None-Match"] = cached[0]
+            response = http_request("GET", url, headers=headers)
+            if cached and response.status_code == 304:
+                return "not_modified", cached[1]
+        elif method == "PUT_AUTH":
+            if not token:
+                raise ValueError("Se requiere un token para PUT_AUTH")
+            headers = {"Authorization": f"Bearer {token}"}
+            response = http_request("PUT", url, headers=headers, json=data)
+        elif method == "DELETE_AUTH":
+            if not token:
+                raise ValueError("Se requiere un token para DELETE_AUTH")
+            headers = {"Authorization": f"Bearer {token}"}
+            response = http_request("DELETE", url, headers=headers)
+        else:
+            raise ValueError("Método HTTP no soportado")
+
+        # Forzar raise_for_status para convertir errores HTTP en excepciones
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as http_err:
+            # Intenta extraer JSON con 'detail' si está disponible
+            try:
+                err_json = response.json()
+                detail = err_json.get("detail") if isinstance(err_json, dict) else None
+                if detail:
+                    raise Exception(f"HTTP {response.status_code}: {detail}") from http_err
+            except (ValueError, json.JSONDecodeError):
+                pass
+            raise
+
+        # Entregar JSON si existe, si no, entregar texto como dict
+        try:
+            payload = response.json()
+        except ValueError:
+            return "success", {"message": response.text or ""}
+        etag = response.headers.get("ETag")
+        if conditional and etag:
+            _store_validator(url, token, etag, payload)
+        return "success", payload
+
+    except requests.exceptions.HTTPError as http_err:
+        return "failure", f"Error HTTP: {http_err} (status {getattr(http_err.response, 'status_code', 'n/a')})"
+    except requests.exceptions.RequestException as e:
+        return "failure", f"Error de conexión: {e}"
+    except Exception as e:
+        return "failure", str(e)
+
 class NetworkWorker(QObject):
     """
     Worker que corre en un hilo separado para manejar peticiones de red.
     Señales:
       - success: emite el JSON decodificado (dict o list)
       - failure: emite un mensaje de error (str)
+      - not_modified: (solo con conditional=True) el servidor respondió 304;
+        emite el JSON que ya teníamos guardado para esa URL
       - finished: emite cuando termina (siempre)
+
+    Las pantallas usan request_executor.submit(), que corre perform_request
+    en un pool compartido; este worker queda para quien necesite un QThread propio.
     """
     success = pyqtSignal(object)
     failure = pyqtSignal(str)
+    not_modified = pyqtSignal(object)
     finished = pyqtSignal()
 
-    def __init__(self, url: str, method: str, data: dict = None, token: str = None):
+    def __init__(self, url: str, method: str, data: dict = None, token: str = None, conditional: bool = False):
         super().__init__()
         self.url = url
         self.method = method
         self.data = data
         self.token = token
+        self.conditional = conditional
 
     def run(self):
         try:
-            # Debug: mostrar qué se va a ejecutar en consola (útil en desarrollo)
-            print(f"[NetworkWorker] {self.method} {self.url} token_present={bool(self.token)} data={bool(self.data)}")
-
-            if self.method == "POST_JSON":
-                response = requests.post(self.url, json=self.data, timeout=15)
-            elif self.method == "POST_FORM":
-                response = requests.post(self.url, data=self.data, timeout=15)
-            elif self.method == "POST_AUTH":
-                if not self.token:
-                    raise ValueError("Se requiere un token para POST_AUTH")
-                headers = {"Authorization": f"Bearer {self.token}"}
-                response = requests.post(self.url, json=self.data, headers=headers, timeout=15)
-            elif self.method == "GET_AUTH":
-                if not self.token:
-                    raise ValueError("Se requiere un token para GET_AUTH")
-                headers = {"Authorization": f"Bearer {self.token}"}
-                response = requests.get(self.url, headers=headers, timeout=15)
-            elif self.method == "PUT_AUTH":
-                if not self.token:
-                    raise ValueError("Se requiere un token para PUT_AUTH")
-                headers = {"Authorization": f"Bearer {self.token}"}
-                response = requests.put(self.url, headers=headers, json=self.data, timeout=15)
-            elif self.method == "DELETE_AUTH":
-                if not self.token:
-                    raise ValueError("Se requiere un token para DELETE_AUTH")
-                headers = {"Authorization": f"Bearer {self.token}"}
-                response = requests.delete(self.url, headers=headers, timeout=15)
-            else:
-                raise ValueError("Método HTTP no soportado")
-
-            # Forzar raise_for_status para convertir errores HTTP en excepciones
-            try:
-                response.raise_for_status()
-            except requests.exceptions.HTTPError as http_err:
-                # Intenta extraer JSON con 'detail' si está disponible
-                try:
-                    err_json = response.json()
-                    detail = err_json.get("detail") if isinstance(err_json, dict) else None
-                    if detail:
-                        raise Exception(f"HTTP {response.status_code}: {detail}") from http_err
-                except (ValueError, json.JSONDecodeError):
-                    pass
-                raise
-
-            # Entregar JSON si existe, si no, entregar texto como dict
-            try:
-                self.success.emit(response.json())
-            except ValueError:
-                self.success.emit({"message": response.text or ""})
-
-        except requests.exceptions.HTTPError as http_err:
-            self.failure.emit(f"Error HTTP: {http_err} (status {getattr(http_err.response, 'status_code', 'n/a')})")
-        except requests.exceptions.RequestException as e:
-            self.failure.emit(f"Error de conexión: {e}")
-        except Exception as e:
-            self.failure.emit(str(e))
+            kind, value = perform_request(self.url, self.method, self.data, self.token, self.conditional)
+            getattr(self, kind).emit(value)
         finally:
             self.finished.emit()
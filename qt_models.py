@@ -0,0 +1,587 @@
+from datetime import datetime
+import urllib.parse
+
+from PyQt6.QtCore import (
+    Qt, QAbstractListModel, QAbstractTableModel, QEvent, QModelIndex, QRect, QSize, pyqtSignal
+)
+from PyQt6.QtGui import QColor, QFont
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QApplication, QListView, QStyle, QStyledItemDelegate, QStyleOptionButton
+)
+
+from network_worker import API_URL
+from request_executor import submit
+from image_loader import get_image_loader
+
+
+def format_fecha(value: str) -> str:
+    """'2025-11-03T13:32:24.123' -> '2025-11-03 13:32' (si no se puede, se deja tal cual)."""
+    try:
+        return datetime.fromisoformat(value).strftime('%Y-%m-%d %H:%M')
+    except (TypeError, ValueError):
+        return value or ""
+
+
+def available_stock(product: dict) -> int:
+    """Unidades que se pueden comprar: 'disponible' (stock menos lo reservado en carritos) si la API lo manda."""
+    value = product.get("disponible")
+    if value is None:
+        value = product.get("stock")
+    return max(0, value or 0)
+
+
+class SalesTableModel(QAbstractTableModel):
+    """
+    Modelo de la tabla de ventas del panel de administración.
+
+    Las ventas se piden a /api/admin/sales por páginas: la vista llama a
+    'fetchMore' cuando el usuario llega al final del scroll, así que abrir la
+    pantalla cuesta lo mismo con 100 que con 1.000.000 de ventas. El texto de
+    cada celda se calcula una sola vez al recibir la página.
+
+    Ordenar por 'Venta' o 'Fecha' se hace en el servidor (se recarga desde la
+    primera página con order=asc/desc). El resto de columnas ordena las ventas
+    ya cargadas, y las páginas que lleguen después se insertan en su lugar.
+    """
+    COLUMNS = ["Venta", "Fecha", "Cliente", "Productos", "Unidades", "Total"]
+    COL_ID, COL_FECHA, COL_CLIENTE, COL_ITEMS, COL_UNIDADES, COL_TOTAL = range(6)
+    SERVER_SORT_COLUMNS = (COL_ID, COL_FECHA)
+
+    # Rol con el dict original de la venta (por si la vista necesita más datos)
+    SaleRole = Qt.ItemDataRole.UserRole + 1
+
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, page_size: int = 100, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.api_token = None
+        self._rows = []              # (valores por columna, textos por columna, venta)
+        self._next_cursor = None
+        self._exhausted = True       # no hay más páginas (o todavía no se pidió nada)
+        self._loading = False
+        self._server_order = "desc"
+        self._local_sort = None      # (columna, Qt.SortOrder) si se ordena en memoria
+
+    # --- Carga de datos ---
+
+    def set_token(self, token: str):
+        self.api_token = token
+
+    def reload(self):
+        """Vacía el modelo y pide la primera página."""
+        self.beginResetModel()
+        self._rows = []
+        self._next_cursor = None
+        self._exhausted = False
+        self._loading = False
+        self.endResetModel()
+        if self.api_token:
+            self.fetchMore(QModelIndex())
+
+    def is_loading(self) -> bool:
+        return self._loading
+
+    def has_more(self) -> bool:
+        return not self._exhausted
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return bool(self.api_token) and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        params = {"limit": self.page_size, "order": self._server_order}
+        if self._next_cursor:
+            params["cursor"] = self._next_cursor
+        url = f"{API_URL}/api/admin/sales?{urllib.parse.urlencode(params)}"
+
+        self._set_loading(True)
+        # Mismo canal para reload() y fetchMore(): una recarga descarta la página en vuelo
+        request = submit(url, "GET_AUTH", token=self.api_token, channel=f"ventas-{id(self)}")
+        request.success.connect(self._on_page)
+        request.failure.connect(self._on_failure)
+
+    def _set_loading(self, loading: bool):
+        self._loading = loading
+        self.loading_changed.emit(loading)
+
+    def _on_page(self, page: dict):
+        sales = page.get("items", [])
+        self._next_cursor = page.get("next_cursor")
+        self._exhausted = not self._next_cursor
+        if sales:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(sales) - 1)
+            self._rows.extend(self._make_row(sale) for sale in sales)
+            self.endInsertRows()
+            if self._local_sort:
+                self._sort_rows(*self._local_sort)
+        self._set_loading(False)
+
+    def _on_failure(self, message: str):
+        self._exhausted = True  # no reintentamos solos en cada scroll; "Actualizar" recarga
+        self._set_loading(False)
+        self.load_failed.emit(message)
+
+    @staticmethod
+    def _make_row(sale: dict):
+        items = sale.get("items", [])
+        unidades = sum(item.get("cantidad", 0) for item in items)
+        resumen = ", ".join(f"{item['cantidad']}x #{item['product_id']}" for item in items)
+        values = (sale["id"], sale.get("fecha") or "", sale.get("user_id"), resumen, unidades, sale.get("total", 0.0))
+        texts = (
+            f"#{sale['id']}",
+            format_fecha(sale.get("fecha")),
+            f"Cliente #{sale.get('user_id')}",
+            resumen,
+            str(unidades),
+            f"${sale.get('total', 0.0):.2f}",
+        )
+        return values, texts, sale
+
+    # --- API de QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        values, texts, sale = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return texts[column]
+        if role == Qt.ItemDataRole.ToolTipRole and column == self.COL_ITEMS:
+            return "\n".join(
+                f"• {item['cantidad']}x Producto #{item['product_id']} (${item['precio_unitario']:.2f} c/u)"
+                for item in sale.get("items", [])
+            )
+        if role == Qt.ItemDataRole.TextAlignmentRole and column in (self.COL_UNIDADES, self.COL_TOTAL):
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == self.SaleRole:
+            return sale
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section]
+        return None
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        if column in self.SERVER_SORT_COLUMNS:
+            server_order = "asc" if order == Qt.SortOrder.AscendingOrder else "desc"
+            had_local_sort = self._local_sort is not None
+            self._local_sort = None
+            if server_order != self._server_order or had_local_sort:
+                self._server_order = server_order
+                self.reload()
+            return
+        self._local_sort = (column, order)
+        self._sort_rows(column, order)
+
+    def _sort_rows(self, column: int, order):
+        self.layoutAboutToBeChanged.emit()
+        self._rows.sort(
+            key=lambda row: (row[0][column] is None, row[0][column]),
+            reverse=(order == Qt.SortOrder.DescendingOrder),
+        )
+        self.layoutChanged.emit()
+
+
+class SalesRowDelegate(QStyledItemDelegate):
+    """
+    Pinta las celdas de la tabla de ventas directamente con QPainter
+    (sin crear widgets por venta) y con alto fijo, para que la vista no
+    tenga que medir el texto de cada fila.
+    """
+    ROW_HEIGHT = 28
+    TOTAL_COLOR = QColor("#2ecc71")
+    MUTED_COLOR = QColor("#555555")
+
+    def paint(self, painter, option, index):
+        painter.save()
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        if selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+
+        column = index.column()
+        font = QFont(option.font)
+        color = option.palette.highlightedText().color() if selected else option.palette.text().color()
+        if column == SalesTableModel.COL_TOTAL:
+            font.setBold(True)
+            if not selected:
+                color = self.TOTAL_COLOR
+        elif column == SalesTableModel.COL_ID:
+            font.setBold(True)
+        elif column == SalesTableModel.COL_ITEMS and not selected:
+            color = self.MUTED_COLOR
+        painter.setFont(font)
+        painter.setPen(color)
+
+        rect = option.rect.adjusted(6, 0, -6, 0)
+        alignment = index.data(Qt.ItemDataRole.TextAlignmentRole) or (Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        text = painter.fontMetrics().elidedText(index.data() or "", Qt.TextElideMode.ElideRight, rect.width())
+        painter.drawText(rect, alignment, text)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+
+class ProductListModel(QAbstractListModel):
+    """
+    Modelo del catálogo para las grillas de la tienda y del panel de productos.
+
+    Pide /api/products/page por páginas (cursor 'after') a medida que la vista
+    hace scroll, así que abrir la tienda cuesta lo mismo con 50 que con 50.000
+    productos. La primera página se pide con If-None-Match: si no cambió
+    (304) se conserva, pero las páginas siguientes se descartan y se vuelven
+    a pedir, porque el ETag no dice nada de ellas. Las miniaturas vienen
+    del ImageLoader compartido y solo se piden para las tarjetas que se pintan.
+
+    También guarda la cantidad elegida para cada producto en la tienda
+    (lo que antes era el QSpinBox de cada tarjeta).
+    """
+    ProductRole = Qt.ItemDataRole.UserRole + 1
+    QuantityRole = Qt.ItemDataRole.UserRole + 2
+
+    THUMB_WIDTH = 120
+
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, page_size: int = 60, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.api_token = None
+        self._products = []
+        self._quantities = {}        # product_id -> cantidad elegida
+        self._rows_by_url = {}       # imagen_url -> filas que la muestran
+        self.images = get_image_loader()
+        self.images.image_ready.connect(self._on_image_ready)
+        self._next_cursor = None
+        self._exhausted = True
+        self._loading = False
+
+    # --- Carga de datos ---
+
+    def set_token(self, token: str):
+        self.api_token = token
+
+    def reload(self):
+        """Vuelve a pedir la primera página (el modelo se reemplaza al llegar la respuesta)."""
+        self._loading = False
+        if self.api_token:
+            self._request_page(first=True)
+
+    def is_loading(self) -> bool:
+        return self._loading
+
+    def has_more(self) -> bool:
+        return not self._exhausted
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return bool(self.api_token) and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self._request_page(first=False)
+
+    def _request_page(self, first: bool):
+        params = {"limit": self.page_size}
+        if not first and self._next_cursor is not None:
+            params["after"] = self._next_cursor
+        url = f"{API_URL}/api/products/page?{urllib.parse.urlencode(params)}"
+
+        self._set_loading(True)
+        # Mismo canal para reload() y fetchMore(): una recarga descarta la página en vuelo
+        request = submit(url, "GET_AUTH", token=self.api_token, conditional=first,
+                         channel=f"productos-{id(self)}")
+        request.success.connect(lambda page: self._on_page(page, first))
+        request.not_modified.connect(self._on_not_modified)
+        request.failure.connect(self._on_failure)
+
+    def _set_loading(self, loading: bool):
+        self._loading = loading
+        self.loading_changed.emit(loading)
+
+    def _on_page(self, page: dict, first: bool):
+        products = page.get("items", [])
+        self._next_cursor = page.get("next_cursor")
+        self._exhausted = self._next_cursor is None
+        if first:
+            self.beginResetModel()
+            self._products = list(products)
+            self._rows_by_url = {}
+            self._index_urls(0)
+            self.endResetModel()
+        elif products:
+            start = len(self._products)
+            self.beginInsertRows(QModelIndex(), start, start + len(products) - 1)
+            self._products.extend(products)
+            self._index_urls(start)
+            self.endInsertRows()
+        self._set_loading(False)
+
+    def _on_not_modified(self, page: dict):
+        """
+        Primera página sin cambios (304). El ETag solo cubre esa página: si
+        había más páginas cargadas se descartan (pueden tener productos
+        editados, borrados o con otro stock) y se vuelven a pedir al hacer scroll.
+        """
+        if not self._products or len(self._products) > len(page.get("items", [])):
+            self._on_page(page, first=True)
+            return
+        self._set_loading(False)
+
+    def _on_failure(self, message: str):
+        self._exhausted = True
+        self._set_loading(False)
+        self.load_failed.emit(message)
+
+    # --- Cantidad elegida en la tienda ---
+
+    def quantity(self, product: dict) -> int:
+        return self._quantities.get(product["id"], 1)
+
+    def change_quantity(self, index, delta: int):
+        product = self._products[index.row()]
+        maximum = max(1, min(10, available_stock(product)))  # Máximo 10 o el stock disponible
+        value = min(maximum, max(1, self.quantity(product) + delta))
+        if value != self.quantity(product):
+            self._quantities[product["id"]] = value
+            self.dataChanged.emit(index, index, [self.QuantityRole])
+
+    # --- Imágenes ---
+
+    def thumbnail(self, url: str):
+        """Miniatura del producto desde el ImageLoader (None mientras se descarga)."""
+        return self.images.pixmap(url, self.THUMB_WIDTH)
+
+    def _index_urls(self, start: int):
+        for row in range(start, len(self._products)):
+            url = self._products[row].get("imagen_url")
+            if url:
+                self._rows_by_url.setdefault(url, []).append(row)
+
+    def _on_image_ready(self, url: str):
+        """Llegó una imagen: se repintan las tarjetas que la usan (placeholder -> imagen)."""
+        for row in self._rows_by_url.get(url, []):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    # --- API de QAbstractListModel ---
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._products)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        product = self._products[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return product["nombre"]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return product.get("descripcion") or "Sin descripción"
+        if role == Qt.ItemDataRole.DecorationRole:
+            url = product.get("imagen_url")
+            return self.thumbnail(url) if url else None
+        if role == self.ProductRole:
+            return product
+        if role == self.QuantityRole:
+            return self.quantity(product)
+        return None
+
+
+class ProductCardDelegate(QStyledItemDelegate):
+    """
+    Pinta cada producto como una tarjeta (imagen, nombre, descripción, precio,
+    stock y botones) sin crear widgets: los botones se dibujan con QStyle y
+    los clics se resuelven en 'editorEvent'.
+
+    mode="store": [-] cantidad [+] y "Añadir al Carrito" -> emite action_triggered("add", producto, cantidad)
+    mode="admin": "Editar" y "Eliminar" -> emite action_triggered("edit"/"delete", producto, 0)
+    """
+    CARD_SIZE = QSize(230, 300)
+    IMAGE_HEIGHT = 110
+    BUTTON_HEIGHT = 28
+    PADDING = 8
+
+    action_triggered = pyqtSignal(str, dict, int)
+
+    def __init__(self, mode: str = "store", parent=None):
+        super().__init__(parent)
+        self.mode = mode
+
+    def sizeHint(self, option, index):
+        return self.CARD_SIZE
+
+    def _layout(self, rect: QRect) -> dict:
+        """Rectángulos de cada parte de la tarjeta (los usan paint y editorEvent)."""
+        card = rect.adjusted(4, 4, -4, -4)
+        inner = card.adjusted(self.PADDING, self.PADDING, -self.PADDING, -self.PADDING)
+        x, w = inner.x(), inner.width()
+        image = QRect(x, inner.y(), w, self.IMAGE_HEIGHT)
+        name = QRect(x, image.bottom() + 6, w, 20)
+        description = QRect(x, name.bottom() + 2, w, 34)
+        price = QRect(x, description.bottom() + 4, w, 18)
+        stock = QRect(x, price.bottom() + 2, w, 18)
+        buttons_top = inner.bottom() - self.BUTTON_HEIGHT + 1
+        parts = {"card": card, "image": image, "name": name, "description": description,
+                 "price": price, "stock": stock}
+        if self.mode == "store":
+            small = self.BUTTON_HEIGHT
+            parts["minus"] = QRect(x, buttons_top, small, small)
+            parts["quantity"] = QRect(x + small, buttons_top, 30, small)
+            parts["plus"] = QRect(x + small + 30, buttons_top, small, small)
+            add_x = parts["plus"].right() + 6
+            parts["add"] = QRect(add_x, buttons_top, inner.right() - add_x + 1, small)
+        else:
+            half = (w - 6) // 2
+            parts["edit"] = QRect(x, buttons_top, half, self.BUTTON_HEIGHT)
+            parts["delete"] = QRect(x + half + 6, buttons_top, w - half - 6, self.BUTTON_HEIGHT)
+        return parts
+
+    def _draw_button(self, painter, widget, rect: QRect, text: str, enabled: bool = True):
+        button = QStyleOptionButton()
+        button.rect = rect
+        button.text = text
+        button.state = QStyle.StateFlag.State_Raised
+        if enabled:
+            button.state |= QStyle.StateFlag.State_Enabled
+        style = widget.style() if widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, widget)
+
+    def paint(self, painter, option, index):
+        product = index.data(ProductListModel.ProductRole)
+        parts = self._layout(option.rect)
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+
+        # Tarjeta
+        painter.setPen(QColor("#ecf0f1"))
+        painter.setBrush(QColor("white"))
+        painter.drawRoundedRect(parts["card"], 8, 8)
+
+        # Imagen (o un recuadro gris si no hay)
+        pixmap = index.data(Qt.ItemDataRole.DecorationRole)
+        image_rect = parts["image"]
+        if pixmap:
+            # Se dibuja dentro del recuadro sin crear un pixmap nuevo en cada repintado
+            size = pixmap.size().scaled(image_rect.size(), Qt.AspectRatioMode.KeepAspectRatio)
+            if size.width() > pixmap.width():
+                size = pixmap.size()
+            x = image_rect.x() + (image_rect.width() - size.width()) // 2
+            painter.drawPixmap(QRect(x, image_rect.y(), size.width(), size.height()), pixmap)
+        else:
+            # Placeholder mientras el ImageLoader la descarga (o si no hay imagen)
+            url = product.get("imagen_url")
+            loading = bool(url) and not index.model().images.is_failed(url)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(QColor("#f4f6f7"))
+            painter.drawRoundedRect(image_rect, 6, 6)
+            painter.setPen(QColor("#95a5a6"))
+            painter.drawText(image_rect, Qt.AlignmentFlag.AlignCenter, "Cargando imagen..." if loading else "Sin imagen")
+
+        text_color = option.palette.text().color()
+        font = QFont(option.font)
+
+        font.setBold(True)
+        font.setPointSizeF(font.pointSizeF() + 1)
+        painter.setFont(font)
+        painter.setPen(text_color)
+        name = painter.fontMetrics().elidedText(product["nombre"], Qt.TextElideMode.ElideRight, parts["name"].width())
+        painter.drawText(parts["name"], Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, name)
+
+        font = QFont(option.font)
+        painter.setFont(font)
+        painter.setPen(QColor("#555555"))
+        painter.drawText(
+            parts["description"],
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop | Qt.TextFlag.TextWordWrap,
+            product.get("descripcion") or "Sin descripción",
+        )
+
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(text_color)
+        painter.drawText(parts["price"], Qt.AlignmentFlag.AlignLeft, f"Precio: ${product['precio']:.2f}")
+        font.setBold(False)
+        painter.setFont(font)
+        if self.mode == "admin":
+            stock = product.get("stock") or 0
+            reservado = product.get("reservado") or 0
+            stock_text = f"Stock: {stock}" + (f" ({reservado} en carritos)" if reservado else "")
+        else:
+            stock = available_stock(product)
+            stock_text = f"Stock disponible: {stock}"
+        painter.setPen(text_color if stock > 0 else QColor("#c0392b"))
+        painter.drawText(parts["stock"], Qt.AlignmentFlag.AlignLeft, stock_text)
+
+        widget = option.widget
+        if self.mode == "store":
+            in_stock = stock > 0
+            self._draw_button(painter, widget, parts["minus"], "-", in_stock)
+            painter.setPen(text_color)
+            painter.drawText(parts["quantity"], Qt.AlignmentFlag.AlignCenter, str(index.data(ProductListModel.QuantityRole)))
+            self._draw_button(painter, widget, parts["plus"], "+", in_stock)
+            self._draw_button(painter, widget, parts["add"], "🛒 Añadir" if in_stock else "Sin Stock", in_stock)
+        else:
+            self._draw_button(painter, widget, parts["edit"], "Editar")
+            self._draw_button(painter, widget, parts["delete"], "Eliminar")
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() != QEvent.Type.MouseButtonRelease or event.button() != Qt.MouseButton.LeftButton:
+            return False
+        product = index.data(ProductListModel.ProductRole)
+        parts = self._layout(option.rect)
+        pos = event.position().toPoint()
+        if self.mode == "store":
+            if available_stock(product) <= 0:
+                return False
+            if parts["minus"].contains(pos):
+                model.change_quantity(index, -1)
+                return True
+            if parts["plus"].contains(pos):
+                model.change_quantity(index, +1)
+                return True
+            if parts["add"].contains(pos):
+                self.action_triggered.emit("add", product, model.quantity(product))
+                return True
+        else:
+            for action in ("edit", "delete"):
+                if parts[action].contains(pos):
+                    self.action_triggered.emit(action, product, 0)
+                    return True
+        return False
+
+
+class ProductGridView(QListView):
+    """QListView en modo ícono configurado para la grilla de productos (celdas de tamaño fijo)."""
+
+    def __init__(self, model: ProductListModel, delegate: ProductCardDelegate, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(True)
+        # Todas las celdas miden lo mismo: la vista no le pregunta el tamaño a cada una
+        self.setUniformItemSizes(True)
+        self.setGridSize(ProductCardDelegate.CARD_SIZE)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setFrameShape(QListView.Shape.NoFrame)
+        self.setModel(model)
+        self.setItemDelegate(delegate)
@@ -0,0 +1,162 @@
+import itertools
+import os
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from network_worker import perform_request
+
+# Peticiones a la API que pueden correr a la vez (el resto espera en cola)
+REQUEST_WORKERS = int(os.getenv("REQUEST_WORKERS", "6"))
+
+
+class Priority:
+    """Prioridad en la cola del pool: los números más altos salen primero."""
+    BACKGROUND = 0   # refrescos que el usuario no pidió (resúmenes, prefetch)
+    NORMAL = 5       # cargar una pantalla, páginas al hacer scroll
+    USER = 10        # acciones del usuario: login, añadir al carrito, guardar...
+
+
+class RequestHandle(QObject):
+    """
+    Lo que devuelve RequestExecutor.submit(). Tiene las mismas señales que
+    NetworkWorker (success / failure / not_modified / finished), siempre
+    emitidas en el hilo de la UI. Después de cancel() no emite nada más.
+    """
+    success = pyqtSignal(object)
+    failure = pyqtSignal(str)
+    not_modified = pyqtSignal(object)
+    finished = pyqtSignal()
+
+    def __init__(self, channel: str | None = None):
+        super().__init__()
+        self.channel = channel
+        self.cancelled = False
+        self._job = None
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self._job is not None:
+            self._job.executor._handle_cancelled(self._job)
+
+
+class _JobSignals(QObject):
+    done = pyqtSignal(object, str, object)   # job, resultado, valor
+
+
+class _RequestJob(QRunnable):
+    """Una petición HTTP en el pool; la pueden estar esperando varios handles."""
+
+    def __init__(self, executor, key, url, method, data, token, conditional):
+        super().__init__()
+        self.setAutoDelete(False)  # la referencia la guarda el executor
+        self.executor = executor
+        self.key = key
+        self.url = url
+        self.method = method
+        self.data = data
+        self.token = token
+        self.conditional = conditional
+        self.handles = []
+
+    def run(self):
+        kind, value = perform_request(self.url, self.method, self.data, self.token, self.conditional)
+        self.executor._signals.done.emit(self, kind, value)
+
+
+class RequestExecutor(QObject):
+    """
+    Ejecutor de peticiones compartido por toda la app (reemplaza el
+    QThread + NetworkWorker que cada pantalla creaba por petición).
+
+    - Un QThreadPool con REQUEST_WORKERS hilos; las peticiones de más
+      esperan en cola ordenadas por prioridad (ver Priority).
+    - Coalescing: un GET igual (url + token + conditional) a otro que ya está
+      en curso no sale a la red, se engancha al resultado del primero.
+    - Canales: al enviar con channel="...", la petición anterior del mismo
+      canal se cancela. Si todavía estaba en cola se quita; si ya estaba en
+      vuelo su respuesta se descarta, así una respuesta vieja nunca pisa a
+      una más nueva.
+    """
+
+    def __init__(self, max_workers: int = REQUEST_WORKERS, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self._jobs = set()        # jobs en cola o en vuelo
+        self._inflight = {}       # clave de coalescing -> job
+        self._channels = {}       # canal -> último handle
+        self._signals = _JobSignals()
+        self._signals.done.connect(self._on_done)
+        self._ids = itertools.count()
+
+    def submit(self, url: str, method: str, data: dict = None, token: str = None,
+               conditional: bool = False, priority: int | None = None,
+               channel: str | None = None) -> RequestHandle:
+        """Encola una petición y devuelve su RequestHandle (conectar las señales enseguida)."""
+        if priority is None:
+            priority = Priority.NORMAL if method == "GET_AUTH" else Priority.USER
+
+        handle = RequestHandle(channel)
+        if channel is not None:
+            previous = self._channels.get(channel)
+            if previous is not None:
+                previous.cancel()
+            self._channels[channel] = handle
+
+        # Solo los GET se pueden juntar: repetir un POST/PUT/DELETE no es lo mismo que hacerlo una vez
+        key = (url, token, conditional) if method == "GET_AUTH" else ("unique", next(self._ids))
+        job = self._inflight.get(key)
+        if job is None:
+            job = _RequestJob(self, key, url, method, data, token, conditional)
+            self._inflight[key] = job
+            self._jobs.add(job)
+            self.pool.start(job, priority)
+        handle._job = job
+        job.handles.append(handle)
+        return handle
+
+    def _handle_cancelled(self, job: _RequestJob):
+        """Si nadie espera ya un job que sigue en cola, se saca del pool."""
+        if all(h.cancelled for h in job.handles) and self.pool.tryTake(job):
+            self._forget(job)
+            for handle in job.handles:
+                self._release_channel(handle)
+
+    def _forget(self, job: _RequestJob):
+        self._jobs.discard(job)
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+
+    def _release_channel(self, handle: RequestHandle):
+        if handle.channel is not None and self._channels.get(handle.channel) is handle:
+            del self._channels[handle.channel]
+
+    def _on_done(self, job: _RequestJob, kind: str, value):
+        self._forget(job)
+        for handle in job.handles:
+            self._release_channel(handle)
+            if handle.cancelled:
+                continue
+            getattr(handle, kind).emit(value)
+            handle.finished.emit()
+
+    def pending(self) -> int:
+        """Peticiones en cola o en vuelo (para depurar)."""
+        return len(self._jobs)
+
+
+_executor = None
+
+def get_executor() -> RequestExecutor:
+    """Instancia compartida (se crea al primer uso, con la QApplication ya creada)."""
+    global _executor
+    if _executor is None:
+        _executor = RequestExecutor()
+    return _executor
+
+
+def submit(url: str, method: str, data: dict = None, **kwargs) -> RequestHandle:
+    """Atajo: get_executor().submit(...)."""
+    return get_executor().submit(url, method, data, **kwargs)
@@ -0,0 +1,179 @@
+"""
+Reservas de stock con vencimiento para el carrito.
+
+Al añadir un producto al carrito se reservan sus unidades durante
+RESERVATION_TTL_MINUTES: la línea del carrito guarda hasta cuándo
+('cart_items.reservado_hasta') y el producto lleva la suma de lo reservado
+('products.reservado'). Lo que se puede vender es 'stock - reservado'
+(Product.disponible).
+
+Todas las reservas se hacen con UPDATEs condicionales (un CASE por
+producto), sin SELECT ... FOR UPDATE previo: si no alcanza el stock, el
+UPDATE no toca esa fila y se sabe por el rowcount.
+
+Las reservas vencidas las libera 'run_sweeper' (una tarea de fondo del
+lifespan de la API) en lotes de RESERVATION_SWEEP_BATCH líneas. La línea
+queda en el carrito sin reserva; si el usuario la vuelve a tocar o compra,
+se reserva otra vez contra el stock disponible en ese momento.
+
+Las reservas no invalidan el catálogo cacheado (cache.catalog_cache): su
+'disponible' se pone al día cuando vence la entrada (CATALOG_CACHE_TTL).
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from anyio import to_thread
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+RESERVATION_TTL_MINUTES = float(os.getenv("RESERVATION_TTL_MINUTES", "15"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))   # segundos
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+
+logger = logging.getLogger("tienda.reservas")
+
+
+def hold_until(now: datetime | None = None) -> datetime:
+    """Vencimiento de una reserva hecha (o renovada) ahora."""
+    return (now or datetime.now()) + timedelta(minutes=RESERVATION_TTL_MINUTES)
+
+
+def renew_holds(db: Session, user_id: int, now: datetime | None = None) -> int:
+    """
+    Renueva el vencimiento de las reservas vigentes del usuario (cualquier
+    cambio en el carrito cuenta como actividad). Va primero en cada mutación
+    del carrito: deja bloqueadas sus líneas reservadas hasta el commit, así
+    el barrido no las libera a mitad de camino.
+    """
+    return db.execute(
+        update(models.CartItem)
+        .where(models.CartItem.user_id == user_id, models.CartItem.reservado_hasta.isnot(None))
+        .values(reservado_hasta=hold_until(now))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def adjust_reservations(db: Session, deltas: dict) -> bool:
+    """
+    Aplica cambios de reserva por producto ({product_id: unidades}: positivo
+    reserva, negativo libera), con un UPDATE como mucho para cada signo.
+
+    Devuelve False si algún producto no tiene disponible lo que se pide
+    reservar. En ese caso puede haber quedado una reserva parcial en la
+    transacción: quien llama no debe hacer commit (las rutas del carrito
+    lanzan HTTPException y la sesión hace rollback al cerrarse).
+    """
+    take = {product_id: n for product_id, n in deltas.items() if n > 0}
+    give = {product_id: -n for product_id, n in deltas.items() if n < 0}
+    if take:
+        amount = case(take, value=models.Product.id)
+        result = db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(take), models.Product.stock - models.Product.reservado >= amount)
+            .values(reservado=models.Product.reservado + amount)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(take):
+            return False
+    if give:
+        amount = case(give, value=models.Product.id)
+        db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(give))
+            .values(reservado=models.Product.reservado - amount)
+            .execution_options(synchronize_session=False)
+        )
+    return True
+
+
+def reserve_for_add(db: Session, user_id: int, product_id: int, cantidad: int) -> bool:
+    """
+    Reserva 'cantidad' unidades más de un producto para la línea del carrito
+    del usuario, en un solo UPDATE condicional y sin leer la línea antes. Si
+    la línea existe pero su reserva venció, reserva también lo que ya tenía
+    (después del upsert la línea queda reservada entera).
+
+    Devuelve False si no alcanza lo disponible o el producto no existe.
+    """
+    unheld = (
+        select(models.CartItem.cantidad)
+        .where(
+            models.CartItem.user_id == user_id,
+            models.CartItem.product_id == product_id,
+            models.CartItem.reservado_hasta.is_(None),
+        )
+        .scalar_subquery()
+    )
+    amount = cantidad + func.coalesce(unheld, 0)
+    result = db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, models.Product.stock - models.Product.reservado >= amount)
+        .values(reservado=models.Product.reservado + amount)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def sweep_expired(db: Session, now: datetime | None = None, batch: int = RESERVATION_SWEEP_BATCH) -> int:
+    """
+    Libera UN lote de reservas vencidas y hace commit. Devuelve cuántas líneas liberó.
+
+    Las líneas se toman con FOR UPDATE SKIP LOCKED (en MySQL 8; SQLite lo
+    ignora): las de un carrito que se está modificando o comprando en ese
+    momento se saltan y quedan para la próxima pasada.
+    """
+    now = now or datetime.now()
+    lines = db.execute(
+        select(models.CartItem.id, models.CartItem.product_id, models.CartItem.cantidad)
+        .where(models.CartItem.reservado_hasta.isnot(None), models.CartItem.reservado_hasta < now)
+        .order_by(models.CartItem.reservado_hasta)
+        .limit(batch)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not lines:
+        db.rollback()
+        return 0
+
+    released = {}
+    for line in lines:
+        released[line.product_id] = released.get(line.product_id, 0) - line.cantidad
+    db.execute(
+        update(models.CartItem)
+        .where(models.CartItem.id.in_([line.id for line in lines]))
+        .values(reservado_hasta=None)
+        .execution_options(synchronize_session=False)
+    )
+    adjust_reservations(db, released)
+    db.commit()
+    return len(lines)
+
+
+def sweep_all(now: datetime | None = None, batch: int = RESERVATION_SWEEP_BATCH) -> int:
+    """Barre lote a lote hasta que no quedan reservas vencidas (cada lote es su propia transacción)."""
+    db = SessionLocal()
+    total = 0
+    try:
+        while True:
+            released = sweep_expired(db, now, batch)
+            total += released
+            if released < batch:
+                return total
+    finally:
+        db.close()
+
+
+async def run_sweeper(interval: float = RESERVATION_SWEEP_INTERVAL):
+    """Tarea de fondo: cada 'interval' segundos libera las reservas vencidas (en un hilo, no en el event loop)."""
+    while True:
+        try:
+            released = await to_thread.run_sync(sweep_all)
+            if released:
+                logger.info("%d reservas vencidas liberadas", released)
+        except Exception:
+            logger.exception("Error barriendo reservas")
+        await asyncio.sleep(interval)
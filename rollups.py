@@ -0,0 +1,209 @@
+"""
+Resúmenes diarios de ventas: 'ventas_diarias' (por día) y
+'ventas_diarias_productos' (por día y producto), con pedidos, unidades e
+ingresos.
+
+- checkout_cart los actualiza en la MISMA transacción que crea la venta
+  (record_sale), con upserts que suman en la base: o entran la venta y sus
+  resúmenes, o ninguno.
+- Los endpoints de estadísticas del admin leen solo estas tablas: el costo
+  depende de cuántos días abarca la consulta, no de cuántas ventas hay.
+- 'backfill' los reconstruye desde ventas/venta_items por tramos de días,
+  cada tramo en su transacción (borra el tramo y lo vuelve a agregar con
+  INSERT ... SELECT ... GROUP BY). La migración 0004 lo hace al crearlos:
+
+    python -m rollups backfill                          # todo el histórico
+    python -m rollups backfill --from 2025-01-01 --to 2025-02-01 --batch-days 7
+
+Reconstruir un tramo con ventas entrando no pierde ninguna: en MySQL el
+INSERT ... SELECT bloquea el rango de ventas que lee (un checkout de ese
+rango espera al commit del tramo) y en SQLite las escrituras van de a una.
+
+El resumen del día es una fila "caliente": cada checkout la actualiza y la
+deja bloqueada hasta su commit. Por eso record_sale va al final, justo
+antes del commit.
+"""
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import Date, bindparam, delete, func, insert, literal, select, text, update
+from sqlalchemy.orm import Session
+
+import models
+
+ROLLUP_BACKFILL_BATCH_DAYS = int(os.getenv("ROLLUP_BACKFILL_BATCH_DAYS", "31"))
+
+# Upserts en SQL literal (como el del carrito): se compilan una sola vez
+_UPSERTS = {
+    "sqlite": {
+        "dia": (
+            "INSERT INTO ventas_diarias (fecha, pedidos, unidades, ingresos) "
+            "VALUES (:fecha, :pedidos, :unidades, :ingresos) "
+            "ON CONFLICT (fecha) DO UPDATE SET "
+            "pedidos = ventas_diarias.pedidos + excluded.pedidos, "
+            "unidades = ventas_diarias.unidades + excluded.unidades, "
+            "ingresos = ventas_diarias.ingresos + excluded.ingresos"
+        ),
+        "producto": (
+            "INSERT INTO ventas_diarias_productos (fecha, product_id, pedidos, unidades, ingresos) "
+            "VALUES (:fecha, :product_id, :pedidos, :unidades, :ingresos) "
+            "ON CONFLICT (fecha, product_id) DO UPDATE SET "
+            "pedidos = ventas_diarias_productos.pedidos + excluded.pedidos, "
+            "unidades = ventas_diarias_productos.unidades + excluded.unidades, "
+            "ingresos = ventas_diarias_productos.ingresos + excluded.ingresos"
+        ),
+    },
+    "mysql": {
+        "dia": (
+            "INSERT INTO ventas_diarias (fecha, pedidos, unidades, ingresos) "
+            "VALUES (:fecha, :pedidos, :unidades, :ingresos) "
+            "ON DUPLICATE KEY UPDATE "
+            "pedidos = pedidos + VALUES(pedidos), unidades = unidades + VALUES(unidades), "
+            "ingresos = ingresos + VALUES(ingresos)"
+        ),
+        "producto": (
+            "INSERT INTO ventas_diarias_productos (fecha, product_id, pedidos, unidades, ingresos) "
+            "VALUES (:fecha, :product_id, :pedidos, :unidades, :ingresos) "
+            "ON DUPLICATE KEY UPDATE "
+            "pedidos = pedidos + VALUES(pedidos), unidades = unidades + VALUES(unidades), "
+            "ingresos = ingresos + VALUES(ingresos)"
+        ),
+    },
+}
+_UPSERTS = {
+    dialect: {name: text(sql).bindparams(bindparam("fecha", type_=Date())) for name, sql in statements.items()}
+    for dialect, statements in _UPSERTS.items()
+}
+
+
+def record_sale(db: Session, fecha: datetime, total: float, lines) -> None:
+    """
+    Suma una venta a los resúmenes de su día, sin commit (va en la
+    transacción del checkout). 'lines' son (product_id, cantidad,
+    precio_unitario); un producto repetido en varias líneas cuenta un pedido.
+    """
+    per_product = {}
+    for product_id, cantidad, precio_unitario in lines:
+        unidades, ingresos = per_product.get(product_id, (0, 0.0))
+        per_product[product_id] = (unidades + cantidad, ingresos + cantidad * precio_unitario)
+
+    day = fecha.date()
+    statements = _UPSERTS["sqlite" if db.get_bind().dialect.name == "sqlite" else "mysql"]
+    # Por product_id en orden (como el UPDATE de stock) y el día al final: es la fila más disputada
+    db.execute(statements["producto"], [
+        {"fecha": day, "product_id": product_id, "pedidos": 1, "unidades": unidades, "ingresos": ingresos}
+        for product_id, (unidades, ingresos) in sorted(per_product.items())
+    ])
+    db.execute(statements["dia"], {
+        "fecha": day, "pedidos": 1,
+        "unidades": sum(unidades for unidades, _ in per_product.values()),
+        "ingresos": total,
+    })
+
+
+# --- Reconstrucción desde el histórico ---
+
+def rebuild_days(conn, start: date, end: date) -> int:
+    """
+    Recalcula los resúmenes de los días [start, end) desde ventas/venta_items,
+    sin commit. Devuelve cuántos días con ventas quedaron.
+    """
+    Venta, VentaItem = models.Venta, models.VentaItem
+    Dia, Producto = models.VentaDiaria, models.VentaDiariaProducto
+    # El rango va sobre ventas.fecha (indexada) y no sobre date(fecha)
+    in_range = (Venta.fecha >= datetime.combine(start, datetime.min.time()),
+                Venta.fecha < datetime.combine(end, datetime.min.time()))
+    dia = func.date(Venta.fecha)
+
+    conn.execute(delete(Producto).where(Producto.fecha >= start, Producto.fecha < end))
+    conn.execute(delete(Dia).where(Dia.fecha >= start, Dia.fecha < end))
+    conn.execute(insert(Producto).from_select(
+        ["fecha", "product_id", "pedidos", "unidades", "ingresos"],
+        select(dia, VentaItem.product_id, func.count(func.distinct(Venta.id)),
+               func.sum(VentaItem.cantidad), func.sum(VentaItem.cantidad * VentaItem.precio_unitario))
+        .join(Venta, Venta.id == VentaItem.venta_id)
+        .where(*in_range, VentaItem.product_id.isnot(None))
+        .group_by(dia, VentaItem.product_id)
+    ))
+    days = conn.execute(insert(Dia).from_select(
+        ["fecha", "pedidos", "unidades", "ingresos"],
+        select(dia, func.count(), literal(0), func.sum(Venta.total)).where(*in_range).group_by(dia)
+    )).rowcount
+    # Las unidades del día salen de lo recién agregado por producto (sin otro join con venta_items)
+    conn.execute(
+        update(Dia)
+        .where(Dia.fecha >= start, Dia.fecha < end)
+        .values(unidades=select(func.coalesce(func.sum(Producto.unidades), 0))
+                .where(Producto.fecha == Dia.fecha)
+                .scalar_subquery())
+    )
+    return days
+
+
+def history_range(conn) -> tuple:
+    """Días [primero, último + 1) con ventas, o (None, None) si no hay ninguna."""
+    first, last = conn.execute(select(func.min(models.Venta.fecha), func.max(models.Venta.fecha))).one()
+    if first is None:
+        return None, None
+    return first.date(), last.date() + timedelta(days=1)
+
+
+def day_chunks(start: date, end: date, batch_days: int = ROLLUP_BACKFILL_BATCH_DAYS):
+    while start < end:
+        chunk_end = min(start + timedelta(days=batch_days), end)
+        yield start, chunk_end
+        start = chunk_end
+
+
+def rebuild(conn, date_from: date | None = None, date_to: date | None = None,
+            batch_days: int = ROLLUP_BACKFILL_BATCH_DAYS) -> int:
+    """Recalcula [date_from, date_to) (por defecto todo el histórico) en la transacción de 'conn'."""
+    first, last = history_range(conn)
+    start, end = date_from or first, date_to or last
+    if start is None or end is None:
+        return 0
+    return sum(rebuild_days(conn, chunk_start, chunk_end) for chunk_start, chunk_end in day_chunks(start, end, batch_days))
+
+
+def backfill(engine, date_from: date | None = None, date_to: date | None = None,
+             batch_days: int = ROLLUP_BACKFILL_BATCH_DAYS) -> int:
+    """Como rebuild, pero con un commit por tramo de 'batch_days' días (para bases con ventas entrando)."""
+    with engine.connect() as conn:
+        first, last = history_range(conn)
+    start, end = date_from or first, date_to or last
+    if start is None or end is None:
+        print("[rollups] No hay ventas que resumir.")
+        return 0
+    total = 0
+    for chunk_start, chunk_end in day_chunks(start, end, batch_days):
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            days = rebuild_days(conn, chunk_start, chunk_end)
+        total += days
+        print(f"[rollups] {chunk_start} .. {chunk_end - timedelta(days=1)}: "
+              f"{days} días con ventas ({time.perf_counter() - t0:.2f}s)")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                        help="Desde (incluido, AAAA-MM-DD); por defecto la primera venta")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                        help="Hasta (excluido, AAAA-MM-DD); por defecto el día después de la última venta")
+    parser.add_argument("--batch-days", type=int, default=ROLLUP_BACKFILL_BATCH_DAYS,
+                        help="Días por transacción")
+    args = parser.parse_args()
+
+    from database import engine
+
+    t0 = time.perf_counter()
+    days = backfill(engine, args.date_from, args.date_to, args.batch_days)
+    print(f"Resúmenes reconstruidos: {days} días con ventas en {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
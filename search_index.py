@@ -0,0 +1,260 @@
+"""
+Índice invertido en memoria para buscar productos por nombre y descripción.
+
+- Normaliza el texto: minúsculas y sin acentos ("Pantalón" -> "pantalon"),
+  quita palabras vacías ("de", "para", ...) y plurales simples
+  ("camisas" -> "camisa", "pantalones" -> "pantalon").
+- Ranking BM25 (con el nombre pesando más que la descripción). El aporte de
+  cada término a cada producto se calcula al indexar, así la consulta solo suma.
+- La última palabra de la consulta se toma como prefijo (búsqueda mientras
+  se escribe): "pant" encuentra "pantalon", "pantaloneta"...
+- Varias palabras: deben aparecer todas (AND).
+- Se actualiza producto a producto (add / remove) desde los endpoints de admin.
+
+El índice vive en el proceso: con varios workers de uvicorn cada uno tiene
+el suyo, y un cambio hecho en otro worker se ve cuando se reconstruye
+(SEARCH_INDEX_REFRESH en api_server.py).
+"""
+import bisect
+import heapq
+import math
+import os
+import re
+import threading
+import unicodedata
+
+# Cuánto pesa una aparición en el nombre frente a una en la descripción
+SEARCH_NAME_WEIGHT = float(os.getenv("SEARCH_NAME_WEIGHT", "3"))
+# Máximo de términos en los que se expande un prefijo (los más frecuentes)
+SEARCH_MAX_EXPANSIONS = int(os.getenv("SEARCH_MAX_EXPANSIONS", "64"))
+
+# Parámetros de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+SPANISH_STOPWORDS = frozenset("""
+a al algo ante con contra de del desde e el en entre es esta este esto hasta la las
+le lo los mas muy no o os para pero por que se sin sobre su sus te tu un una unas uno unos y ya
+""".split())
+
+
+def fold(text: str) -> str:
+    """Minúsculas y sin acentos/diéresis: 'Pantalón Ñandú' -> 'pantalon nandu'."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def stem(token: str) -> str:
+    """Plurales simples del español: 'camisas' -> 'camisa', 'pantalones' -> 'pantalon'."""
+    if len(token) > 4 and token.endswith("es") and token[-3] not in "aeiou":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and token[-2] in "aeiou":
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str | None) -> list:
+    """Términos normalizados de un texto (sin palabras vacías)."""
+    if not text:
+        return []
+    return [stem(t) for t in _TOKEN_RE.findall(fold(text)) if t not in SPANISH_STOPWORDS]
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido término -> {product_id: impacto BM25 sin idf}.
+
+    Para cada término se guarda además (a pedido) la lista de productos
+    ordenada por impacto: con una sola palabra, los k mejores salen de ahí
+    sin recorrer todos los productos que la contienen.
+    """
+
+    def __init__(self, name_weight: float = SEARCH_NAME_WEIGHT, max_expansions: int = SEARCH_MAX_EXPANSIONS):
+        self.name_weight = name_weight
+        self.max_expansions = max_expansions
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._postings = {}      # término -> {product_id: impacto}
+        self._ranked = {}        # término -> [(impacto, product_id)] ordenada (caché)
+        self._terms = []         # vocabulario ordenado (para prefijos con bisect)
+        self._doc_terms = {}     # product_id -> términos (para poder quitarlo)
+        self._doc_len = {}       # product_id -> largo ponderado
+        self._total_len = 0.0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    # --- Indexado ---
+
+    def _weighted_tf(self, nombre: str | None, descripcion: str | None):
+        tf = {}
+        name_tokens = tokenize(nombre)
+        desc_tokens = tokenize(descripcion)
+        for token in name_tokens:
+            tf[token] = tf.get(token, 0.0) + self.name_weight
+        for token in desc_tokens:
+            tf[token] = tf.get(token, 0.0) + 1.0
+        return tf, len(name_tokens) * self.name_weight + len(desc_tokens)
+
+    @staticmethod
+    def _impact(tf: float, length: float, avg_len: float) -> float:
+        return tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_len or 1.0)))
+
+    def _insert(self, product_id: int, tf: dict, length: float, avg_len: float):
+        self._doc_terms[product_id] = tuple(tf)
+        self._doc_len[product_id] = length
+        self._total_len += length
+        for term, freq in tf.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._terms, term)
+            postings[product_id] = self._impact(freq, length, avg_len)
+            self._ranked.pop(term, None)
+
+    def build(self, products):
+        """Reconstruye el índice desde cero con (id, nombre, descripcion) de todos los productos."""
+        docs = [(product_id, *self._weighted_tf(nombre, descripcion)) for product_id, nombre, descripcion in products]
+        avg_len = sum(length for _, _, length in docs) / len(docs) if docs else 1.0
+        with self._lock:
+            self._clear()
+            postings = self._postings
+            for product_id, tf, length in docs:
+                self._doc_terms[product_id] = tuple(tf)
+                self._doc_len[product_id] = length
+                self._total_len += length
+                for term, freq in tf.items():
+                    postings.setdefault(term, {})[product_id] = self._impact(freq, length, avg_len)
+            self._terms = sorted(postings)
+            self.ready = True
+
+    def add(self, product_id: int, nombre: str | None, descripcion: str | None):
+        """Indexa (o reindexa) un producto. Usa el largo promedio actual para su BM25."""
+        tf, length = self._weighted_tf(nombre, descripcion)
+        with self._lock:
+            self._remove(product_id)
+            count = len(self._doc_terms) + 1
+            self._insert(product_id, tf, length, (self._total_len + length) / count)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(product_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            self._ranked.pop(term, None)
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+
+    # --- Búsqueda ---
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings[term])
+        n = len(self._doc_terms)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _ranked_list(self, term: str) -> list:
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            ranked = sorted(((impact, pid) for pid, impact in self._postings[term].items()), reverse=True)
+            self._ranked[term] = ranked
+        return ranked
+
+    def _expand(self, prefix: str) -> list:
+        """Términos del vocabulario que empiezan con 'prefix' (los más frecuentes primero, con tope)."""
+        start = bisect.bisect_left(self._terms, prefix)
+        end = bisect.bisect_left(self._terms, prefix + "\uffff")
+        terms = self._terms[start:end]
+        if len(terms) > self.max_expansions:
+            terms = heapq.nlargest(self.max_expansions, terms, key=lambda t: len(self._postings[t]))
+        return terms
+
+    def _query_groups(self, query: str) -> list:
+        """
+        Una lista de términos por palabra de la consulta. La última palabra
+        (si el texto no termina en espacio) también vale como prefijo.
+        """
+        words = _TOKEN_RE.findall(fold(query))
+        prefix_last = bool(words) and not query[-1:].isspace()
+        groups = []
+        for position, word in enumerate(words):
+            is_last = position == len(words) - 1
+            if word in SPANISH_STOPWORDS and not (is_last and prefix_last):
+                continue
+            terms = {stem(word)} & self._postings.keys()
+            if is_last and prefix_last:
+                terms.update(self._expand(word))
+            groups.append(list(terms))
+        return groups
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """[(product_id, score)] de los 'limit' productos más relevantes."""
+        with self._lock:
+            groups = self._query_groups(query)
+            if not groups or not all(groups):
+                return []  # alguna palabra no aparece en ningún producto (AND)
+            if len(groups) == 1:
+                return self._top_single(groups[0], limit)
+            return self._top_and(groups, limit)
+
+    def _top_single(self, terms: list, limit: int) -> list:
+        """
+        Una sola palabra (con sus expansiones de prefijo): se mezclan las
+        listas ya ordenadas de cada término y se cortan los primeros
+        'limit' productos distintos. El puntaje de un producto es el de su
+        mejor término, que es el primero en salir de la mezcla.
+        """
+        streams = []
+        for term in terms:
+            idf = self._idf(term)
+            streams.append(((-impact * idf, pid) for impact, pid in self._ranked_list(term)))
+        results, seen = [], set()
+        for neg_score, pid in heapq.merge(*streams):
+            if pid in seen:
+                continue
+            seen.add(pid)
+            results.append((pid, -neg_score))
+            if len(results) == limit:
+                break
+        return results
+
+    def _top_and(self, groups: list, limit: int) -> list:
+        """Varias palabras: intersección de candidatos (empezando por la más rara) y suma de puntajes."""
+        weighted = []
+        for terms in groups:
+            weighted.append([(self._postings[t], self._idf(t)) for t in terms])
+        matches = []
+        for group in weighted:
+            if len(group) == 1:
+                matches.append(group[0][0].keys())
+            else:
+                matches.append(set().union(*(postings.keys() for postings, _ in group)))
+        matches.sort(key=len)
+        candidates = set(matches[0])
+        for keys in matches[1:]:
+            candidates &= keys
+            if not candidates:
+                return []
+
+        def score(pid):
+            total = 0.0
+            for group in weighted:
+                total += max(postings.get(pid, 0.0) * idf for postings, idf in group)
+            return total
+
+        return heapq.nlargest(limit, ((pid, score(pid)) for pid in candidates), key=lambda item: item[1])
+
+
+product_index = ProductSearchIndex()
@@ -1,10 +1,13 @@
 from passlib.context import CryptContext
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, security, status
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
+import asyncio
 import os
+import threading
 
 load_dotenv()
 
@@ -23,6 +26,47 @@ def get_password_hash(password: str) -> str:
     """Genera un hash para una contraseña plana."""
     return pwd_context.hash(password)
 
+# --- Pool dedicado para bcrypt ---
+# bcrypt tarda ~100-300 ms de CPU por llamada. Si se ejecuta dentro de un
+# endpoint 'async def' bloquea el event loop de uvicorn para TODAS las
+# peticiones. bcrypt libera el GIL mientras calcula, así que un pool de
+# hilos del tamaño de los núcleos escala igual que uno de procesos, sin el
+# costo de serializar argumentos entre procesos.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Cuántas tareas pueden esperar en cola además de las que se están ejecutando.
+# Si la cola se llena respondemos 503 en lugar de acumular logins sin límite.
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT)
+
+def submit_password_task(fn, *args) -> Future:
+    """
+    Encola 'fn(*args)' en el pool de bcrypt.
+    Lanza 503 si ya hay demasiadas tareas pendientes.
+    """
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, inténtalo de nuevo en unos segundos.",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = _password_executor.submit(fn, *args)
+    except BaseException:
+        _password_slots.release()
+        raise
+    future.add_done_callback(lambda _: _password_slots.release())
+    return future
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Igual que verify_password, pero sin bloquear el event loop."""
+    return await asyncio.wrap_future(submit_password_task(verify_password, plain_password, hashed_password))
+
+async def get_password_hash_async(password: str) -> str:
+    """Igual que get_password_hash, pero sin bloquear el event loop."""
+    return await asyncio.wrap_future(submit_password_task(get_password_hash, password))
+
 # --- ¡NUEVO! Funciones para crear y validar Tokens ---
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):